@@ -0,0 +1,418 @@
+"""
+权限检测流程基准测试
+
+离线运行，使用临时目录中的 SQLite 数据库，写入 N 个插件、M 个群组、K 个权限用户，
+随后以构造的 EventSession/matcher 依次执行 ban 钩子与 checker.auth，
+输出 每秒事件数、首个事件（冷加载）与单事件耗时分位数、每事件残留内存块、
+每事件临时内存峰值、每事件数据库查询次数 以及各阶段耗时分位数（需要 zxpm.metrics）。
+
+残留内存块为 tracemalloc 快照前后的差值，即执行后仍未释放的内存，不是分配次数。
+CPython 非调试版本无法统计分配次数，以单事件执行期间 tracemalloc 的内存峰值
+减去执行前的内存作为分配压力的替代指标，即单事件同时存活的临时内存。
+
+只依赖 ban 钩子与 checker.auth，可直接在改动前的提交上运行以对比
+
+使用:
+    python benchmarks/auth_pipeline.py --plugins 200 --groups 500 --users 2000
+    python benchmarks/auth_pipeline.py --output result.json
+
+结果为 json，包含当前提交，可用于不同提交之间的对比
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from contextlib import nullcontext
+from pathlib import Path
+from types import SimpleNamespace
+
+import nonebot
+
+ROOT = Path(__file__).resolve().parent.parent
+
+QUERY_METHODS = (
+    "execute_insert",
+    "execute_query",
+    "execute_query_dict",
+    "execute_many",
+    "execute_script",
+)
+"""统计查询次数时拦截的数据库连接方法"""
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="权限检测流程基准测试")
+    parser.add_argument("--plugins", type=int, default=100, help="插件数量")
+    parser.add_argument("--groups", type=int, default=200, help="群组数量")
+    parser.add_argument("--users", type=int, default=1000, help="权限用户数量")
+    parser.add_argument("--events", type=int, default=20000, help="事件数量")
+    parser.add_argument("--warmup", type=int, default=500, help="预热事件数量")
+    parser.add_argument("--ban-ratio", type=float, default=0.05, help="被ban用户比例")
+    parser.add_argument(
+        "--block-ratio", type=float, default=0.1, help="群组禁用插件比例"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子")
+    parser.add_argument("--output", type=Path, default=None, help="结果输出文件")
+    return parser.parse_args()
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def init_nonebot(work_dir: Path):
+    """初始化 nonebot 并加载插件，数据目录与数据库均位于临时目录"""
+    sys.path.insert(0, str(ROOT))
+    nonebot.init(
+        driver="~fastapi",
+        superusers=set(),
+        zxui_username="benchmark",
+        zxui_password="benchmark",
+        zxui_db_url=f"sqlite:{work_dir / 'zhenxun.db'}",
+        zxpm_notice_info_cd=0,
+        zxpm_ban_reply="",
+        localstore_cache_dir=str(work_dir / "cache"),
+        localstore_config_dir=str(work_dir / "config"),
+        localstore_data_dir=str(work_dir / "data"),
+        log_level="WARNING",
+    )
+    nonebot.load_plugin("nonebot_plugin_zxui")
+
+
+async def seed(args: argparse.Namespace, rnd: random.Random) -> dict:
+    """写入测试数据
+
+    返回:
+        dict: 插件模块、群组id、用户id
+    """
+    from zhenxun_utils.enum import LimitWatchType, PluginLimitType, PluginType
+
+    from nonebot_plugin_zxui.models.ban_console import BanConsole
+    from nonebot_plugin_zxui.models.bot_console import BotConsole
+    from nonebot_plugin_zxui.models.group_console import GroupConsole
+    from nonebot_plugin_zxui.models.level_user import LevelUser
+    from nonebot_plugin_zxui.models.plugin_info import PluginInfo
+    from nonebot_plugin_zxui.models.plugin_limit import PluginLimit
+
+    modules = [f"bench_plugin_{i}" for i in range(args.plugins)]
+    await PluginInfo.bulk_create(
+        [
+            PluginInfo(
+                module=module,
+                module_path=f"benchmark.{module}",
+                name=module,
+                level=rnd.randint(0, 5),
+                admin_level=rnd.choice([0, 0, 0, 5]),
+                plugin_type=PluginType.NORMAL,
+            )
+            for module in modules
+        ],
+        100,
+    )
+    plugin_list = await PluginInfo.filter(module__in=modules).all()
+    await PluginLimit.bulk_create(
+        [
+            PluginLimit(
+                module=plugin.module,
+                module_path=plugin.module_path,
+                plugin=plugin,
+                limit_type=PluginLimitType.CD,
+                watch_type=LimitWatchType.USER,
+                cd=1,
+            )
+            for plugin in plugin_list[: len(plugin_list) // 10]
+        ],
+        100,
+    )
+    group_ids = [str(100000 + i) for i in range(args.groups)]
+    block_size = int(len(modules) * args.block_ratio)
+    await GroupConsole.bulk_create(
+        [
+            GroupConsole(
+                group_id=group_id,
+                level=rnd.randint(-1, 9) if rnd.random() < 0.05 else 5,
+                status=rnd.random() > 0.02,
+                block_plugin="".join(
+                    f"<{module}," for module in rnd.sample(modules, block_size)
+                ),
+            )
+            for group_id in group_ids
+        ],
+        100,
+    )
+    if hasattr(GroupConsole, "build_block"):
+        await GroupConsole.build_block(group_ids)
+    await BotConsole.create(bot_id="benchmark", platform="qq", status=True)
+    user_ids = [str(200000 + i) for i in range(args.users)]
+    await LevelUser.bulk_create(
+        [
+            LevelUser(
+                user_id=user_id,
+                group_id=rnd.choice(group_ids),
+                user_level=rnd.randint(0, 9),
+            )
+            for user_id in user_ids
+        ],
+        100,
+    )
+    now = int(time.time())
+    await BanConsole.bulk_create(
+        [
+            BanConsole(
+                user_id=user_id,
+                group_id=rnd.choice([None, rnd.choice(group_ids)]),
+                ban_level=9,
+                ban_time=now,
+                duration=rnd.choice([-1, 3600]),
+                operator="benchmark",
+            )
+            for user_id in rnd.sample(user_ids, int(len(user_ids) * args.ban_ratio))
+        ],
+        100,
+    )
+    return {"modules": modules, "group_ids": group_ids, "user_ids": user_ids}
+
+
+class QueryCounter:
+    """拦截默认数据库连接，统计执行的查询"""
+
+    def __init__(self):
+        self.count = 0
+
+    def install(self):
+        from tortoise import Tortoise
+
+        connection = Tortoise.get_connection("default")
+        for name in QUERY_METHODS:
+            setattr(connection, name, self.__wrap(getattr(connection, name)))
+
+    def __wrap(self, func):
+        async def wrapper(*args, **kwargs):
+            self.count += 1
+            return await func(*args, **kwargs)
+
+        return wrapper
+
+
+def build_events(data: dict, count: int, rnd: random.Random) -> list[tuple]:
+    """构造 (matcher, event, session, message)"""
+    from nonebot_plugin_alconna import UniMessage
+    from nonebot_plugin_session import Session, SessionLevel
+
+    matchers = [
+        SimpleNamespace(
+            type="message",
+            plugin=SimpleNamespace(
+                name=module, module_name=f"benchmark.{module}", metadata=None
+            ),
+        )
+        for module in data["modules"]
+    ]
+    message = UniMessage("benchmark")
+    events = []
+    for _ in range(count):
+        is_group = rnd.random() < 0.8
+        session = Session(
+            bot_id="benchmark",
+            bot_type="benchmark",
+            platform="qq",
+            level=SessionLevel.LEVEL2 if is_group else SessionLevel.LEVEL1,
+            id1=rnd.choice(data["user_ids"]),
+            id2=rnd.choice(data["group_ids"]) if is_group else None,
+        )
+        events.append((rnd.choice(matchers), SimpleNamespace(), session, message))
+    return events
+
+
+def build_runner(bot) -> Callable[..., Awaitable[None]]:
+    """构造单个事件的执行函数，与 ban 钩子及权限钩子的执行顺序一致
+
+    ban 检测优先使用事件内缓存的 _check_ban，不存在时直接调用 ban 钩子
+    """
+    from nonebot.exception import IgnoredException
+
+    from nonebot_plugin_zxui.zxpm.commands.zxpm_hooks import zxpm_ban_hook
+    from nonebot_plugin_zxui.zxpm.commands.zxpm_hooks._auth_checker import checker
+
+    try:
+        from nonebot_plugin_zxui.zxpm.cache import event_memo
+    except ImportError:
+        event_memo = None
+    try:
+        from nonebot_plugin_zxui.zxpm.metrics import metrics
+    except ImportError:
+        metrics = None
+
+    check_ban = getattr(zxpm_ban_hook, "_check_ban", None)
+
+    async def run_ban(matcher, event, session):
+        if not check_ban:
+            await zxpm_ban_hook._(matcher, bot, event, {}, session)
+        elif event_memo:
+            await event_memo.run(event, ("ban",), lambda: check_ban(bot, session))
+        else:
+            await check_ban(bot, session)
+
+    async def run_event(matcher, event, session, message, reasons: Counter):
+        try:
+            with metrics.timer("ban") if metrics else nullcontext():
+                await run_ban(matcher, event, session)
+            await checker.auth(matcher, event, bot, session, message)
+            reasons["allow"] += 1
+        except IgnoredException as e:
+            reasons[str(e.reason)] += 1
+        finally:
+            if event_memo:
+                event_memo.discard(event)
+
+    return run_event
+
+
+def percentile(data: list[float], q: float) -> float:
+    """计算分位数，data 需已排序
+
+    参数:
+        data: 数据
+        q: 分位，0-1
+
+    返回:
+        float: 分位数
+    """
+    if not data:
+        return 0.0
+    return data[min(len(data) - 1, int(len(data) * q))]
+
+
+async def run(args: argparse.Namespace) -> dict:
+    from tortoise import Tortoise
+    from zhenxun_db_client import client_db
+
+    from nonebot_plugin_zxui.config import config
+
+    try:
+        from nonebot_plugin_zxui.zxpm.metrics import metrics
+    except ImportError:
+        metrics = None
+
+    rnd = random.Random(args.seed)
+    await client_db(config.zxui_db_url)
+    seed_start = time.perf_counter()
+    data = await seed(args, rnd)
+    seed_time = time.perf_counter() - seed_start
+
+    bot = SimpleNamespace(self_id="benchmark", config=SimpleNamespace(superusers=set()))
+    run_event = build_runner(bot)
+    counter = QueryCounter()
+    counter.install()
+    reasons = Counter()
+
+    warmup_queries = counter.count
+    warmup_events = build_events(data, args.warmup + 1, rnd)
+    first_start = time.perf_counter()
+    await run_event(*warmup_events[0], reasons)
+    first_event = (time.perf_counter() - first_start) * 1000
+    for item in warmup_events[1:]:
+        await run_event(*item, reasons)
+    warmup_queries = counter.count - warmup_queries
+
+    if metrics:
+        metrics.reset()
+    reasons.clear()
+    events = build_events(data, args.events, rnd)
+    latency = []
+    query_start = counter.count
+    start = time.perf_counter()
+    for item in events:
+        event_start = time.perf_counter()
+        await run_event(*item, reasons)
+        latency.append((time.perf_counter() - event_start) * 1000)
+    elapsed = time.perf_counter() - start
+    queries = counter.count - query_start
+    latency.sort()
+
+    sample = events[: min(len(events), 2000)]
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    transient = []
+    for item in sample:
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        await run_event(*item, Counter())
+        transient.append(tracemalloc.get_traced_memory()[1] - current)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    transient.sort()
+    diff = after.compare_to(before, "filename")
+    retained_blocks = sum(stat.count_diff for stat in diff)
+    retained_bytes = sum(stat.size_diff for stat in diff)
+    await Tortoise.close_connections()
+
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "params": {
+            key: str(value) if isinstance(value, Path) else value
+            for key, value in vars(args).items()
+        },
+        "seed_seconds": round(seed_time, 3),
+        "events": args.events,
+        "elapsed_seconds": round(elapsed, 4),
+        "events_per_second": round(args.events / elapsed, 1),
+        "latency_ms": {
+            "mean": round(sum(latency) / len(latency), 4) if latency else 0,
+            "p50": round(percentile(latency, 0.5), 4),
+            "p90": round(percentile(latency, 0.9), 4),
+            "p99": round(percentile(latency, 0.99), 4),
+            "p99.9": round(percentile(latency, 0.999), 4),
+        },
+        "first_event_ms": round(first_event, 3),
+        "queries_per_event": queries / args.events,
+        "warmup_queries": warmup_queries,
+        "memory": {
+            "sample_events": len(sample),
+            "retained_blocks_per_event": retained_blocks / len(sample),
+            "retained_bytes_per_event": retained_bytes / len(sample),
+            "transient_bytes_per_event": {
+                "mean": round(sum(transient) / len(transient), 1) if transient else 0,
+                "p50": percentile(transient, 0.5),
+                "p99": percentile(transient, 0.99),
+            },
+            "peak_bytes": peak,
+        },
+        "result": dict(reasons.most_common()),
+        "stages": [stats.dict() for stats in metrics.stats()] if metrics else [],
+    }
+
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory(prefix="zxui_bench_") as work_dir:
+        init_nonebot(Path(work_dir))
+        result = asyncio.run(run(args))
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.write_text(text, encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
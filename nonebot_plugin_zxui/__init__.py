@@ -13,6 +13,8 @@ from zhenxun_utils.enum import PluginType
 
 from .config import Config
 from .config import config as PluginConfig
+from .models.chat_search import chat_search
+from .models.db_index import IndexManage
 from .stat import *  # noqa: F403
 from .web_ui import *  # noqa: F403
 from .zxpm import *  # noqa: F403
@@ -23,6 +25,8 @@ driver = nonebot.get_driver()
 @driver.on_startup
 async def _():
     await client_db(PluginConfig.zxui_db_url)
+    await IndexManage.apply()
+    await chat_search.init()
 
 
 __plugin_meta__ = PluginMetadata(
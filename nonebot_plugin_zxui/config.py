@@ -21,6 +21,28 @@ class Config(BaseModel):
     zxui_enable_call_history: bool = True
     """是否开启调用记录存储"""
 
+    zxui_chat_flush_size: int = 1000
+    """消息存储达到该数量时写入数据库"""
+    zxui_chat_flush_interval: int = 10
+    """消息存储写入数据库的最大间隔秒数"""
+    zxui_chat_max_size: int = 20000
+    """消息存储队列最大数量"""
+    zxui_chat_overflow_policy: str = "DROP"
+    """消息存储队列已满时的处理策略，DROP: 丢弃，SAMPLE: 采样，BLOCK: 等待写入"""
+    zxui_chat_retention_days: int = 0
+    """消息存储保留天数，超出的消息归档至本地文件后删除，为0时不清理"""
+    zxui_chat_retention_bot: dict[str, int] = {}
+    """按bot_id设置消息存储保留天数，为0时不清理"""
+    zxui_chat_retention_group: dict[str, int] = {}
+    """按群组id设置消息存储保留天数，优先于bot设置，为0时不清理"""
+
+    zxui_call_flush_size: int = 500
+    """调用记录存储达到该数量时写入数据库"""
+    zxui_call_flush_interval: int = 60
+    """调用记录存储写入数据库的最大间隔秒数"""
+    zxui_call_max_size: int = 20000
+    """调用记录存储队列最大数量，已满时丢弃"""
+
     zxpm_notice_info_cd: int = 300
     """群/用户权限检测等各种检测提示信息cd，为0时不提醒"""
     zxpm_ban_reply: str = "才不会给你发消息."
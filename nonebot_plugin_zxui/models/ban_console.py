@@ -26,6 +26,7 @@ class BanConsole(Model):
     class Meta:  # type: ignore
         table = "ban_console"
         table_description = "封禁人员/群组数据表"
+        indexes = (("user_id", "group_id"),)
 
     @classmethod
     async def _get_data(cls, user_id: str | None, group_id: str | None) -> Self | None:
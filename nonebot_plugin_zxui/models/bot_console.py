@@ -1,8 +1,17 @@
 from typing import Literal, overload
 
 from tortoise import fields
+from tortoise.signals import post_delete, post_save
 from zhenxun_db_client import Model
 
+from ..models.plugin_block import BlockKind, BlockTarget, PluginBlock
+
+BLOCK_FIELDS: dict[str, BlockKind] = {
+    "block_plugins": BlockKind.PLUGIN,
+    "block_tasks": BlockKind.TASK,
+}
+"""禁用字段与关系表禁用类型的对应"""
+
 
 class BotConsole(Model):
     id = fields.IntField(pk=True, generated=True, auto_increment=True)
@@ -409,8 +418,9 @@ class BotConsole(Model):
         返回:
             bool: 是否被禁用
         """
-        bot_data, _ = await cls.get_or_create(bot_id=bot_id)
-        return cls.format(plugin_name) in bot_data.block_plugins
+        return await PluginBlock.is_block(
+            BlockTarget.BOT, bot_id, plugin_name, [BlockKind.PLUGIN]
+        )
 
     @classmethod
     async def is_block_task(cls, bot_id: str, task_name: str) -> bool:
@@ -424,9 +434,48 @@ class BotConsole(Model):
         返回:
             bool: 是否被禁用
         """
-        bot_data, _ = await cls.get_or_create(bot_id=bot_id)
-        return cls.format(task_name) in bot_data.block_tasks
+        return await PluginBlock.is_block(
+            BlockTarget.BOT, bot_id, task_name, [BlockKind.TASK]
+        )
+
+    @classmethod
+    async def build_block(cls):
+        """根据禁用字段写入禁用关系表，用于旧数据迁移"""
+        create_list = [
+            PluginBlock(
+                target_type=BlockTarget.BOT,
+                target_id=data["bot_id"],
+                block_type=kind,
+                module=module,
+            )
+            for data in await cls.all().values("bot_id", *BLOCK_FIELDS)
+            for field, kind in BLOCK_FIELDS.items()
+            for module in set(cls.convert_module_format(data[field] or ""))
+        ]
+        if create_list:
+            await PluginBlock.bulk_create(create_list, 100, ignore_conflicts=True)
 
     @classmethod
     async def _run_script(cls):
         return []
+
+
+@post_save(BotConsole)
+async def _(sender, instance: BotConsole, created, using_db, update_fields):
+    """同步禁用关系表"""
+    await PluginBlock.sync(
+        BlockTarget.BOT,
+        instance.bot_id,
+        None,
+        {
+            kind: BotConsole.convert_module_format(getattr(instance, field))
+            for field, kind in BLOCK_FIELDS.items()
+            if not update_fields or field in update_fields
+        },
+    )
+
+
+@post_delete(BotConsole)
+async def _(sender, instance: BotConsole, using_db):
+    """删除禁用关系表数据"""
+    await PluginBlock.clear(BlockTarget.BOT, instance.bot_id, None)
@@ -0,0 +1,164 @@
+import gzip
+from collections.abc import Callable, Iterator
+from datetime import date, datetime
+from pathlib import Path
+
+import ujson as json
+from zhenxun_utils.log import logger
+
+from ..config import DATA_PATH
+
+ARCHIVE_PATH = DATA_PATH / "archive" / "chat_history"
+
+ARCHIVE_SUFFIX = ".ndjson.gz"
+
+FIELDS = (
+    "id",
+    "user_id",
+    "group_id",
+    "text",
+    "plain_text",
+    "create_time",
+    "bot_id",
+    "platform",
+)
+"""归档的字段"""
+
+
+def to_local(time: datetime) -> datetime:
+    """转换为本地时间并去除时区"""
+    return time.astimezone().replace(tzinfo=None) if time.tzinfo else time
+
+
+class ChatArchive:
+    """
+    聊天记录归档文件
+
+    每天一个 gzip 压缩的 ndjson 文件，每次写入追加一个 gzip 成员，
+    plain_text 与 text 相同时不保存，读取时按 id 去重
+    """
+
+    @classmethod
+    def get_file(cls, day: date) -> Path:
+        """获取某天的归档文件
+
+        参数:
+            day: 日期
+
+        返回:
+            Path: 文件路径
+        """
+        return ARCHIVE_PATH / f"{day.isoformat()}{ARCHIVE_SUFFIX}"
+
+    @classmethod
+    def get_days(cls) -> list[date]:
+        """获取已归档的日期
+
+        返回:
+            list[date]: 日期，升序
+        """
+        if not ARCHIVE_PATH.exists():
+            return []
+        day_list = []
+        for file in ARCHIVE_PATH.glob(f"*{ARCHIVE_SUFFIX}"):
+            try:
+                day_list.append(date.fromisoformat(file.name[: -len(ARCHIVE_SUFFIX)]))
+            except ValueError:
+                continue
+        return sorted(day_list)
+
+    @classmethod
+    def write(cls, data_list: list[dict]):
+        """按天追加写入归档文件
+
+        参数:
+            data_list: ChatHistory 的字段数据
+        """
+        ARCHIVE_PATH.mkdir(parents=True, exist_ok=True)
+        day2lines: dict[date, list[str]] = {}
+        for data in data_list:
+            data = {field: data.get(field) for field in FIELDS}
+            create_time = to_local(data["create_time"])
+            data["create_time"] = create_time.isoformat()
+            if data["plain_text"] == data["text"]:
+                del data["plain_text"]
+            day2lines.setdefault(create_time.date(), []).append(
+                json.dumps(data, ensure_ascii=False)
+            )
+        for day, lines in day2lines.items():
+            with gzip.open(cls.get_file(day), "at", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+
+    @classmethod
+    def iter_day(cls, day: date) -> Iterator[dict]:
+        """逐条读取某天的归档数据
+
+        参数:
+            day: 日期
+
+        返回:
+            Iterator[dict]: ChatHistory 的字段数据
+        """
+        file = cls.get_file(day)
+        if not file.exists():
+            return
+        id_set = set()
+        try:
+            with gzip.open(file, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    data = json.loads(line)
+                    if data["id"] in id_set:
+                        continue
+                    id_set.add(data["id"])
+                    data.setdefault("plain_text", data["text"])
+                    data["create_time"] = datetime.fromisoformat(data["create_time"])
+                    yield data
+        except (OSError, EOFError, ValueError) as e:
+            logger.warning(f"读取归档文件 {file.name} 失败", "ChatArchive", e=e)
+
+    @classmethod
+    def read(cls, day: date) -> list[dict]:
+        """读取某天的归档数据
+
+        参数:
+            day: 日期
+
+        返回:
+            list[dict]: ChatHistory 的字段数据
+        """
+        return list(cls.iter_day(day))
+
+    @classmethod
+    def load(
+        cls,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        match: Callable[[dict], bool] | None = None,
+    ) -> list[dict]:
+        """读取时间范围内的归档数据
+
+        参数:
+            start: 开始时间，为空时不限制
+            end: 结束时间，为空时不限制
+            match: 过滤条件，读取时逐条过滤，为空时不过滤
+
+        返回:
+            list[dict]: ChatHistory 的字段数据，按时间升序
+        """
+        start = to_local(start) if start else None
+        end = to_local(end) if end else None
+        data_list = []
+        for day in cls.get_days():
+            if (start and day < start.date()) or (end and day > end.date()):
+                continue
+            data_list.extend(
+                data
+                for data in cls.iter_day(day)
+                if (not start or data["create_time"] >= start)
+                and (not end or data["create_time"] <= end)
+                and (not match or match(data))
+            )
+        data_list.sort(key=lambda data: data["create_time"])
+        return data_list
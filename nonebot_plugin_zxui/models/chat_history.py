@@ -1,3 +1,4 @@
+import asyncio
 from datetime import datetime, timedelta
 from typing import Literal
 from typing_extensions import Self
@@ -6,6 +7,9 @@ from tortoise import fields
 from tortoise.functions import Count
 from zhenxun_db_client import Model
 
+from ..config import config
+from .chat_archive import ChatArchive, to_local
+
 
 class ChatHistory(Model):
     id = fields.IntField(pk=True, generated=True, auto_increment=True)
@@ -28,6 +32,7 @@ class ChatHistory(Model):
     class Meta:  # type: ignore
         table = "chat_history"
         table_description = "聊天记录数据表"
+        indexes = (("bot_id", "create_time"), ("group_id", "create_time"), ("user_id",))
 
     @classmethod
     async def get_group_msg_rank(
@@ -74,6 +79,31 @@ class ChatHistory(Model):
             message = await cls.all().order_by("create_time").first()
         return message.create_time if message else None
 
+    @classmethod
+    def is_single_retention(
+        cls,
+        type_: Literal["user", "group"],
+        gid: str | None,
+        msg_type: Literal["private", "group"] | None = None,
+    ) -> bool:
+        """查询范围内的消息是否只适用同一个保留天数设置
+
+        参数:
+            type_: 类型，私聊或群聊
+            gid: 群聊id
+            msg_type: 消息类型，用户或群聊
+
+        返回:
+            bool: 是否只适用同一个设置
+        """
+        if type_ == "group" and gid in config.zxui_chat_retention_group:
+            return True
+        if config.zxui_chat_retention_bot:
+            return False
+        if type_ == "group" or msg_type == "private":
+            return True
+        return not config.zxui_chat_retention_group
+
     @classmethod
     async def get_message(
         cls,
@@ -83,7 +113,7 @@ class ChatHistory(Model):
         msg_type: Literal["private", "group"] | None = None,
         days: int | tuple[datetime, datetime] | None = None,
     ) -> list[Self]:
-        """获取消息查询query
+        """获取消息查询query，时间范围包含已归档的日期时一并读取归档文件
 
         参数:
             uid: 用户id
@@ -102,14 +132,39 @@ class ChatHistory(Model):
             query = cls.filter(group_id=gid)
             if uid:
                 query = query.filter(user_id=uid)
+        start = end = None
         if days:
             if isinstance(days, int):
-                query = query.filter(
-                    create_time__gte=datetime.now() - timedelta(days=days)
-                )
+                start = datetime.now() - timedelta(days=days)
+                query = query.filter(create_time__gte=start)
             elif isinstance(days, tuple):
+                start, end = days
                 query = query.filter(create_time__range=days)
-        return await query.all()  # type: ignore
+        result = await query.all()
+        if result and cls.is_single_retention(type_, gid, msg_type):
+            """同一保留天数下归档的消息均早于数据库中保留的消息"""
+            oldest = to_local(min(r.create_time for r in result))
+            if start and to_local(start) >= oldest:
+                return result
+            end = min(to_local(end), oldest) if end else oldest
+
+        def match(data: dict) -> bool:
+            if type_ == "user":
+                if data["user_id"] != uid:
+                    return False
+                if msg_type == "private":
+                    return data["group_id"] is None
+                if msg_type == "group":
+                    return data["group_id"] is not None
+                return True
+            return data["group_id"] == gid and (not uid or data["user_id"] == uid)
+
+        if archive_list := await asyncio.to_thread(ChatArchive.load, start, end, match):
+            id_set = {r.id for r in result}
+            result = [
+                cls(**data) for data in archive_list if data["id"] not in id_set
+            ] + result
+        return result  # type: ignore
 
     @classmethod
     async def _run_script(cls):
@@ -0,0 +1,327 @@
+import asyncio
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+
+from tortoise import Tortoise
+from zhenxun_utils.log import logger
+
+from ..config import SQL_TYPE
+from .chat_history import ChatHistory
+from .db_utils import fetch_sql
+
+SCAN_SIZE = 500
+"""每次从索引中获取的候选记录数量"""
+MAX_SCAN_ROUND = 20
+"""单次搜索最多获取候选记录的次数，超出时返回当前结果与游标"""
+SYNC_SIZE = 5000
+"""内存索引每次读取的记录数量，同时为单个分段的最大记录数量"""
+MAX_SEGMENT = 8
+"""内存索引分段数量超出时合并"""
+
+FTS_TABLE = "chat_history_fts"
+
+CREATE_FTS_SQLITE_SQL = f"""
+CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+    plain_text, content='chat_history', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON chat_history BEGIN
+    INSERT INTO {FTS_TABLE}(rowid, plain_text) VALUES (new.id, new.plain_text);
+END;
+CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON chat_history BEGIN
+    INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, plain_text)
+        VALUES ('delete', old.id, old.plain_text);
+END;
+CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON chat_history BEGIN
+    INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, plain_text)
+        VALUES ('delete', old.id, old.plain_text);
+    INSERT INTO {FTS_TABLE}(rowid, plain_text) VALUES (new.id, new.plain_text);
+END;
+INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild');
+"""
+
+CREATE_FTS_PSQL_SQL = """
+CREATE INDEX IF NOT EXISTS idx_chat_history_plain_text_tsv ON chat_history
+USING GIN (to_tsvector('simple', COALESCE(plain_text, '')));
+"""
+
+TSVECTOR_PSQL = "to_tsvector('simple', COALESCE(plain_text, ''))"
+
+
+def _tokenize(text: str) -> set[str]:
+    text = "".join(text.lower().split())
+    return {text[i : i + 2] for i in range(len(text) - 1)}
+
+
+class BaseSearchIndex(ABC):
+    """
+    聊天记录全文索引
+    """
+
+    verify: bool = False
+    """候选记录是否可能误匹配，为True时搜索时再以包含关系过滤"""
+
+    async def init(self) -> bool:
+        """初始化索引
+
+        返回:
+            bool: 当前数据库是否可用
+        """
+        return True
+
+    async def sync(self):
+        """同步新写入的记录，由聊天记录写入任务调用"""
+
+    @abstractmethod
+    async def match(self, keyword: str, before: int | None, limit: int) -> list[int]:
+        """获取匹配的记录id
+
+        参数:
+            keyword: 关键词
+            before: 只获取小于该id的记录，为空时不限制
+            limit: 数量
+
+        返回:
+            list[int]: 记录id，降序
+        """
+
+
+class SqliteSearchIndex(BaseSearchIndex):
+    """
+    SQLite FTS5 外部内容表，trigram 分词支持中文子串搜索，
+    由 chat_history 上的触发器在写入与删除时同步
+    """
+
+    async def init(self) -> bool:
+        if await fetch_sql(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name=?", [FTS_TABLE]
+        ):
+            return True
+        try:
+            await Tortoise.get_connection("default").execute_script(
+                CREATE_FTS_SQLITE_SQL
+            )
+        except Exception as e:
+            logger.warning(
+                "当前SQLite不支持FTS5 trigram，使用内存索引", "消息搜索", e=e
+            )
+            return False
+        return True
+
+    async def match(self, keyword: str, before: int | None, limit: int) -> list[int]:
+        if len(keyword) >= 3:
+            table = FTS_TABLE
+            where = f"{FTS_TABLE} MATCH ?"
+            values: list = ['"' + keyword.replace('"', '""') + '"']
+        else:
+            """trigram 无法匹配少于3个字符的关键词，按id倒序扫描原表"""
+            table = "chat_history"
+            where = "plain_text LIKE ?"
+            values = [f"%{keyword}%"]
+        if before is not None:
+            where += " AND rowid < ?"
+            values.append(before)
+        values.append(limit)
+        data_list = await fetch_sql(
+            f"SELECT rowid AS id FROM {table} WHERE {where}"
+            " ORDER BY rowid DESC LIMIT ?",
+            values,
+        )
+        return [data["id"] for data in data_list]
+
+
+class PostgresSearchIndex(BaseSearchIndex):
+    """
+    postgres tsvector 表达式 GIN 索引，由数据库维护
+    """
+
+    async def init(self) -> bool:
+        await Tortoise.get_connection("default").execute_script(CREATE_FTS_PSQL_SQL)
+        return True
+
+    async def match(self, keyword: str, before: int | None, limit: int) -> list[int]:
+        where = f"{TSVECTOR_PSQL} @@ plainto_tsquery('simple', ?)"
+        values: list = [keyword]
+        if before is not None:
+            where += " AND id < ?"
+            values.append(before)
+        values.append(limit)
+        data_list = await fetch_sql(
+            f"SELECT id FROM chat_history WHERE {where} ORDER BY id DESC LIMIT ?",
+            values,
+        )
+        return [data["id"] for data in data_list]
+
+
+class MemorySearchIndex(BaseSearchIndex):
+    """
+    进程内二元分词倒排索引
+
+    按id顺序分段，每次同步读取新记录生成分段，分段过多时合并，
+    二元分词可能误匹配，搜索时需再以包含关系过滤
+    """
+
+    verify = True
+
+    def __init__(self):
+        self._segments: list[dict[str, array]] = []
+        self._last_id = 0
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        """初始同步任务，保留引用避免被回收"""
+
+    async def init(self) -> bool:
+        self._task = asyncio.create_task(self.sync())
+        return True
+
+    async def sync(self):
+        async with self._lock:
+            while True:
+                data_list = (
+                    await ChatHistory.filter(id__gt=self._last_id)
+                    .order_by("id")
+                    .limit(SYNC_SIZE)
+                    .values_list("id", "plain_text")
+                )
+                if not data_list:
+                    break
+                segment: dict[str, array] = {}
+                for id_, plain_text in data_list:
+                    for token in _tokenize(plain_text or ""):
+                        if token not in segment:
+                            segment[token] = array("q")
+                        segment[token].append(id_)
+                self._segments.append(segment)
+                self._last_id = data_list[-1][0]
+                if len(self._segments) > MAX_SEGMENT:
+                    self.__merge()
+                await asyncio.sleep(0)
+
+    def __merge(self):
+        merged: dict[str, array] = {}
+        for segment in self._segments:
+            for token, id_list in segment.items():
+                if token not in merged:
+                    merged[token] = array("q")
+                merged[token].extend(id_list)
+        self._segments = [merged]
+
+    async def match(self, keyword: str, before: int | None, limit: int) -> list[int]:
+        tokens = _tokenize(keyword)
+        if not tokens:
+            query = ChatHistory.filter(plain_text__contains=keyword)
+            if before is not None:
+                query = query.filter(id__lt=before)
+            return list(
+                await query.order_by("-id").limit(limit).values_list("id", flat=True)
+            )
+        result = []
+        for segment in reversed(self._segments):
+            posting_list = [segment.get(token) for token in tokens]
+            if not all(posting_list):
+                continue
+            posting_list.sort(key=len)
+            first, *others = posting_list
+            end = bisect_left(first, before) if before is not None else len(first)
+            for i in range(end - 1, -1, -1):
+                id_ = first[i]
+                if all(self.__contains(p, id_) for p in others):
+                    result.append(id_)
+                    if len(result) >= limit:
+                        return result
+        return result
+
+    @staticmethod
+    def __contains(id_list: array, id_: int) -> bool:
+        index = bisect_left(id_list, id_)
+        return index < len(id_list) and id_list[index] == id_
+
+
+class ChatSearch:
+    """
+    聊天记录搜索
+
+    sqlite 使用 FTS5，postgres 使用 tsvector/GIN，其他数据库或不支持时使用内存索引
+    """
+
+    def __init__(self):
+        self.index: BaseSearchIndex = MemorySearchIndex()
+
+    async def init(self):
+        """根据数据库类型初始化索引"""
+        index: BaseSearchIndex = MemorySearchIndex()
+        try:
+            if SQL_TYPE == "sqlite":
+                index = SqliteSearchIndex()
+            elif SQL_TYPE == "postgres":
+                index = PostgresSearchIndex()
+            if not await index.init():
+                index = MemorySearchIndex()
+                await index.init()
+        except Exception as e:
+            logger.error("初始化消息搜索索引失败，使用内存索引", "消息搜索", e=e)
+            index = MemorySearchIndex()
+            await index.init()
+        self.index = index
+
+    async def sync(self):
+        """同步新写入的记录"""
+        await self.index.sync()
+
+    async def search(
+        self,
+        keyword: str,
+        group_id: str | None = None,
+        user_id: str | None = None,
+        bot_id: str | None = None,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        cursor: int | None = None,
+        size: int = 20,
+    ) -> tuple[list[ChatHistory], int | None]:
+        """搜索聊天记录，按id降序
+
+        参数:
+            keyword: 关键词
+            group_id: 群组id
+            user_id: 用户id
+            bot_id: bot id
+            start: 开始时间
+            end: 结束时间
+            cursor: 游标，上一页返回的游标
+            size: 每页数量
+
+        返回:
+            tuple[list[ChatHistory], int | None]: 记录与下一页游标，没有更多时游标为None
+        """
+        result = []
+        before = cursor
+        for _ in range(MAX_SCAN_ROUND):
+            id_list = await self.index.match(keyword, before, SCAN_SIZE)
+            if not id_list:
+                return result, None
+            query = ChatHistory.filter(id__in=id_list)
+            if group_id:
+                query = query.filter(group_id=group_id)
+            if user_id:
+                query = query.filter(user_id=user_id)
+            if bot_id:
+                query = query.filter(bot_id=bot_id)
+            if start:
+                query = query.filter(create_time__gte=start)
+            if end:
+                query = query.filter(create_time__lte=end)
+            if self.index.verify:
+                query = query.filter(plain_text__contains=keyword)
+            for message in await query.order_by("-id"):
+                result.append(message)
+                if len(result) >= size:
+                    return result, message.id
+            if len(id_list) < SCAN_SIZE:
+                return result, None
+            before = id_list[-1]
+        return result, before
+
+
+chat_search = ChatSearch()
@@ -0,0 +1,241 @@
+from pydantic import BaseModel
+from tortoise import Tortoise
+from zhenxun_utils.log import logger
+
+from ..config import SQL_TYPE
+
+SELECT_INDEX_SQLITE_SQL = """
+SELECT m.name AS table_name, il.name AS name, il."unique" AS is_unique,
+    ii.seqno AS seq, ii.name AS column_name
+FROM sqlite_master m, pragma_index_list(m.name) il, pragma_index_info(il.name) ii
+WHERE m.type = 'table';
+"""
+
+SELECT_INDEX_MYSQL_SQL = """
+SELECT table_name AS table_name, index_name AS name, non_unique = 0 AS is_unique,
+    seq_in_index AS seq, column_name AS column_name
+FROM information_schema.statistics
+WHERE table_schema = DATABASE();
+"""
+
+SELECT_INDEX_PSQL_SQL = """
+SELECT t.relname AS table_name, i.relname AS name, ix.indisunique AS is_unique,
+    k.seq AS seq, a.attname AS column_name
+FROM pg_index ix
+    JOIN pg_class t ON t.oid = ix.indrelid
+    JOIN pg_class i ON i.oid = ix.indexrelid
+    JOIN pg_namespace n ON n.oid = t.relnamespace
+    CROSS JOIN LATERAL unnest(ix.indkey) WITH ORDINALITY AS k(attnum, seq)
+    JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+WHERE n.nspname = current_schema();
+"""
+
+SELECT_TABLE_NAME_SQLITE_SQL = """
+SELECT name AS table_name FROM sqlite_master WHERE type = 'table';
+"""
+
+SELECT_TABLE_NAME_MYSQL_SQL = """
+SELECT table_name AS table_name FROM information_schema.tables
+WHERE table_schema = DATABASE();
+"""
+
+SELECT_TABLE_NAME_PSQL_SQL = """
+SELECT tablename AS table_name FROM pg_tables WHERE schemaname = current_schema();
+"""
+
+SELECT_INDEX_SCAN_MYSQL_SQL = """
+SELECT object_name AS table_name, index_name AS name, count_star AS scan
+FROM performance_schema.table_io_waits_summary_by_index_usage
+WHERE object_schema = DATABASE() AND index_name IS NOT NULL;
+"""
+
+SELECT_INDEX_SCAN_PSQL_SQL = """
+SELECT relname AS table_name, indexrelname AS name, idx_scan AS scan
+FROM pg_stat_user_indexes
+WHERE schemaname = current_schema();
+"""
+
+type2sql_index = {
+    "mysql": SELECT_INDEX_MYSQL_SQL,
+    "sqlite": SELECT_INDEX_SQLITE_SQL,
+    "postgres": SELECT_INDEX_PSQL_SQL,
+}
+
+type2sql_table_name = {
+    "mysql": SELECT_TABLE_NAME_MYSQL_SQL,
+    "sqlite": SELECT_TABLE_NAME_SQLITE_SQL,
+    "postgres": SELECT_TABLE_NAME_PSQL_SQL,
+}
+
+type2sql_index_scan = {
+    "mysql": SELECT_INDEX_SCAN_MYSQL_SQL,
+    "postgres": SELECT_INDEX_SCAN_PSQL_SQL,
+}
+"""sqlite 不记录索引使用次数"""
+
+MAX_NAME_LENGTH = 60
+"""索引名称最大长度，mysql 为64，postgres 为63"""
+
+
+class TableIndex(BaseModel):
+    """
+    数据库中已存在的索引
+    """
+
+    table_name: str
+    """表名"""
+    name: str
+    """索引名称"""
+    columns: tuple[str, ...]
+    """索引列，按索引顺序"""
+    unique: bool
+    """是否唯一索引"""
+
+
+class IndexManage:
+    """
+    模型索引管理
+
+    模型在 Meta.indexes 中声明索引，generate_schemas 只在建表时创建索引(mysql)，
+    已存在的表在启动时由 apply 补齐缺失的索引，已存在前缀相同的索引时视为已覆盖
+    """
+
+    @classmethod
+    def get_declared(cls) -> dict[str, list[tuple[str, ...]]]:
+        """获取模型声明的索引
+
+        返回:
+            dict[str, list[tuple[str, ...]]]: 表名与索引列
+        """
+        data: dict[str, list[tuple[str, ...]]] = {}
+        for model in Tortoise.apps.get("models", {}).values():
+            meta = model._meta
+            for index in meta.indexes:
+                if not isinstance(index, list | tuple):
+                    continue
+                data.setdefault(meta.db_table, []).append(
+                    tuple(meta.fields_db_projection.get(f, f) for f in index)
+                )
+        return data
+
+    @classmethod
+    async def get_tables(cls) -> set[str]:
+        """获取数据库中已存在的表
+
+        返回:
+            set[str]: 表名
+        """
+        db = Tortoise.get_connection("default")
+        query = await db.execute_query_dict(type2sql_table_name[SQL_TYPE])
+        return {row["table_name"] for row in query}
+
+    @classmethod
+    async def get_indexes(cls) -> dict[str, list[TableIndex]]:
+        """获取数据库中已存在的索引
+
+        返回:
+            dict[str, list[TableIndex]]: 表名与索引
+        """
+        db = Tortoise.get_connection("default")
+        query = await db.execute_query_dict(type2sql_index[SQL_TYPE])
+        columns: dict[tuple[str, str], list[tuple[int, str]]] = {}
+        unique: dict[tuple[str, str], bool] = {}
+        for row in query:
+            key = (row["table_name"], row["name"])
+            columns.setdefault(key, []).append((int(row["seq"]), row["column_name"]))
+            unique[key] = bool(row["is_unique"])
+        data: dict[str, list[TableIndex]] = {}
+        for (table_name, name), column_list in columns.items():
+            data.setdefault(table_name, []).append(
+                TableIndex(
+                    table_name=table_name,
+                    name=name,
+                    columns=tuple(c for _, c in sorted(column_list)),
+                    unique=unique[(table_name, name)],
+                )
+            )
+        return data
+
+    @classmethod
+    async def get_scan_count(cls) -> dict[tuple[str, str], int] | None:
+        """获取索引自数据库统计重置后的使用次数
+
+        返回:
+            dict[tuple[str, str], int] | None: (表名, 索引名称) 与次数，不支持时为None
+        """
+        if not (sql := type2sql_index_scan.get(SQL_TYPE)):
+            return None
+        try:
+            query = await Tortoise.get_connection("default").execute_query_dict(sql)
+        except Exception as e:
+            logger.warning("获取索引使用次数失败", "IndexManage", e=e)
+            return None
+        return {(r["table_name"], r["name"]): int(r["scan"] or 0) for r in query}
+
+    @classmethod
+    def find_cover(
+        cls, columns: tuple[str, ...], index_list: list[TableIndex]
+    ) -> TableIndex | None:
+        """获取覆盖声明索引的已有索引
+
+        参数:
+            columns: 声明的索引列
+            index_list: 表中已存在的索引
+
+        返回:
+            TableIndex | None: 已有索引，列相同的优先
+        """
+        cover = [i for i in index_list if i.columns[: len(columns)] == columns]
+        return min(cover, key=lambda i: len(i.columns), default=None)
+
+    @classmethod
+    def get_name(cls, table_name: str, columns: tuple[str, ...]) -> str:
+        """生成索引名称
+
+        参数:
+            table_name: 表名
+            columns: 索引列
+
+        返回:
+            str: 索引名称
+        """
+        return f"idx_{table_name}_{'_'.join(columns)}"[:MAX_NAME_LENGTH]
+
+    @classmethod
+    def quote(cls, name: str) -> str:
+        return f"`{name}`" if SQL_TYPE == "mysql" else f'"{name}"'
+
+    @classmethod
+    async def apply(cls) -> list[str]:
+        """创建缺失的声明索引，可重复执行
+
+        返回:
+            list[str]: 创建的索引名称
+        """
+        db = Tortoise.get_connection("default")
+        try:
+            tables = await cls.get_tables()
+            exists = await cls.get_indexes()
+        except Exception as e:
+            logger.error("获取数据库索引失败", "IndexManage", e=e)
+            return []
+        create_list = []
+        for table_name, index_list in cls.get_declared().items():
+            if table_name not in tables:
+                """表不存在"""
+                continue
+            for columns in index_list:
+                if cls.find_cover(columns, exists.get(table_name, [])):
+                    continue
+                name = cls.get_name(table_name, columns)
+                sql = (
+                    f"CREATE INDEX {cls.quote(name)} ON {cls.quote(table_name)} "
+                    f"({', '.join(cls.quote(c) for c in columns)})"
+                )
+                try:
+                    await db.execute_script(sql)
+                    create_list.append(name)
+                    logger.info(f"创建索引 {name}", "IndexManage")
+                except Exception as e:
+                    logger.error(f"创建索引 {name} 失败", "IndexManage", e=e)
+        return create_list
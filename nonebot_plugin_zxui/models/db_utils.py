@@ -0,0 +1,66 @@
+from datetime import datetime
+from typing import Any
+
+from tortoise import Tortoise
+from zhenxun_db_client import Model
+
+from ..config import SQL_TYPE
+
+
+def format_sql(sql: str) -> str:
+    """将sql中的 `?` 转换为对应数据库的占位符
+
+    参数:
+        sql: sql语句
+
+    返回:
+        str: sql语句
+    """
+    if SQL_TYPE == "postgres":
+        parts = sql.split("?")
+        sql = parts[0] + "".join(f"${i}{part}" for i, part in enumerate(parts[1:], 1))
+    elif SQL_TYPE == "mysql":
+        sql = sql.replace("?", "%s")
+    return sql
+
+
+async def execute_sql(sql: str, values: list):
+    """执行带参数的sql，`?` 会转换为对应数据库的占位符
+
+    参数:
+        sql: sql语句
+        values: 参数
+    """
+    await Tortoise.get_connection("default").execute_query(format_sql(sql), values)
+
+
+async def fetch_sql(sql: str, values: list) -> list[dict]:
+    """执行带参数的查询sql，`?` 会转换为对应数据库的占位符
+
+    参数:
+        sql: sql语句
+        values: 参数
+
+    返回:
+        list[dict]: 查询结果
+    """
+    return await Tortoise.get_connection("default").execute_query_dict(
+        format_sql(sql), values
+    )
+
+
+def to_db_value(model: type[Model], column: str, value: Any) -> Any:
+    """转换为原生sql的参数值
+
+    参数:
+        model: 模型
+        column: 字段
+        value: 值
+
+    返回:
+        Any: 参数值
+    """
+    value = model._meta.fields_map[column].to_db_value(value, model)
+    if SQL_TYPE == "sqlite" and isinstance(value, datetime):
+        value = str(value)
+    return value
@@ -3,12 +3,24 @@ from typing_extensions import Self
 
 from tortoise import fields
 from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.signals import post_delete, post_save
 from zhenxun_db_client import Model
 from zhenxun_utils.common_utils import CommonUtils
 from zhenxun_utils.enum import PluginType
 
+from ..config import SQL_TYPE
+from ..models.db_utils import execute_sql
+from ..models.plugin_block import BlockKind, BlockTarget, PluginBlock
 from ..models.plugin_info import PluginInfo
 
+BLOCK_FIELDS: dict[str, BlockKind] = {
+    "block_plugin": BlockKind.PLUGIN,
+    "superuser_block_plugin": BlockKind.SUPERUSER_PLUGIN,
+    "block_task": BlockKind.TASK,
+    "superuser_block_task": BlockKind.SUPERUSER_TASK,
+}
+"""禁用字段与关系表禁用类型的对应"""
+
 
 class GroupConsole(Model):
     id = fields.IntField(pk=True, generated=True, auto_increment=True)
@@ -143,9 +155,12 @@ class GroupConsole(Model):
         返回:
             bool: 是否禁用被动
         """
-        return await cls.exists(
-            group_id=group_id,
-            superuser_block_plugin__contains=f"<{module},",
+        return await PluginBlock.is_block(
+            BlockTarget.GROUP,
+            group_id,
+            module,
+            [BlockKind.SUPERUSER_PLUGIN],
+            any_channel=True,
         )
 
     @classmethod
@@ -159,10 +174,12 @@ class GroupConsole(Model):
         返回:
             bool: 是否禁用插件
         """
-        return await cls.exists(
-            group_id=group_id, block_plugin__contains=f"<{module},"
-        ) or await cls.exists(
-            group_id=group_id, superuser_block_plugin__contains=f"<{module},"
+        return await PluginBlock.is_block(
+            BlockTarget.GROUP,
+            group_id,
+            module,
+            [BlockKind.PLUGIN, BlockKind.SUPERUSER_PLUGIN],
+            any_channel=True,
         )
 
     @classmethod
@@ -233,10 +250,8 @@ class GroupConsole(Model):
         返回:
             bool: 是否禁用被动
         """
-        return await cls.exists(
-            group_id=group_id,
-            channel_id=channel_id,
-            block_plugin__contains=f"<{module},",
+        return await PluginBlock.is_block(
+            BlockTarget.GROUP, group_id, module, [BlockKind.PLUGIN], channel_id
         )
 
     @classmethod
@@ -250,9 +265,12 @@ class GroupConsole(Model):
         返回:
             bool: 是否禁用被动
         """
-        return await cls.exists(
-            group_id=group_id,
-            superuser_block_task__contains=f"<{task},",
+        return await PluginBlock.is_block(
+            BlockTarget.GROUP,
+            group_id,
+            task,
+            [BlockKind.SUPERUSER_TASK],
+            any_channel=True,
         )
 
     @classmethod
@@ -270,21 +288,16 @@ class GroupConsole(Model):
             bool: 是否禁用被动
         """
         if not channel_id:
-            return await cls.exists(
-                group_id=group_id,
-                channel_id__isnull=True,
-                block_task__contains=f"<{task},",
-            ) or await cls.exists(
-                group_id=group_id,
-                channel_id__isnull=True,
-                superuser_block_task__contains=f"<{task},",
+            return await PluginBlock.is_block(
+                BlockTarget.GROUP,
+                group_id,
+                task,
+                [BlockKind.TASK, BlockKind.SUPERUSER_TASK],
             )
-        return await cls.exists(
-            group_id=group_id, channel_id=channel_id, block_task__contains=f"<{task},"
-        ) or await cls.exists(
-            group_id=group_id,
-            channel_id__isnull=True,
-            superuser_block_task__contains=f"<{task},",
+        return await PluginBlock.is_block(
+            BlockTarget.GROUP, group_id, task, [BlockKind.TASK], channel_id
+        ) or await PluginBlock.is_block(
+            BlockTarget.GROUP, group_id, task, [BlockKind.SUPERUSER_TASK]
         )
 
     @classmethod
@@ -341,6 +354,94 @@ class GroupConsole(Model):
             group.block_task = group.block_task.replace(f"<{task},", "")
         await group.save(update_fields=["block_task", "superuser_block_task"])
 
+    @classmethod
+    async def set_block_plugin_all(cls, module: str, is_superuser: bool = False):
+        """对所有群组禁用插件，禁用字段与关系表各一条语句完成
+
+        不会触发 post_save，调用后需刷新权限快照
+
+        参数:
+            module: 模块名
+            is_superuser: 是否为超级用户
+        """
+        column = "superuser_block_plugin" if is_superuser else "block_plugin"
+        value = f"<{module},"
+        if SQL_TYPE == "mysql":
+            update = f"CONCAT(REPLACE({column}, ?, ''), ?)"
+        else:
+            update = f"REPLACE({column}, ?, '') || ?"
+        await execute_sql(
+            f"UPDATE {cls._meta.db_table} SET {column} = {update}", [value, value]
+        )
+        await PluginBlock.block_all(
+            BlockTarget.GROUP,
+            BLOCK_FIELDS[column],
+            module,
+            cls._meta.db_table,
+            "group_id",
+        )
+
+    @classmethod
+    async def set_unblock_plugin_all(cls, module: str, is_superuser: bool = False):
+        """对所有群组解除禁用插件，禁用字段与关系表各一条语句完成
+
+        不会触发 post_save，调用后需刷新权限快照
+
+        参数:
+            module: 模块名
+            is_superuser: 是否为超级用户
+        """
+        column = "superuser_block_plugin" if is_superuser else "block_plugin"
+        await execute_sql(
+            f"UPDATE {cls._meta.db_table} SET {column} = REPLACE({column}, ?, '')",
+            [f"<{module},"],
+        )
+        await PluginBlock.unblock_all(BlockTarget.GROUP, BLOCK_FIELDS[column], module)
+
+    @classmethod
+    async def build_block(cls, group_ids: list[str] | None = None):
+        """根据禁用字段写入禁用关系表，用于旧数据迁移与批量创建的群组
+
+        参数:
+            group_ids: 指定群组id，为空时为全部群组
+        """
+        query = cls.filter(group_id__in=group_ids) if group_ids else cls.all()
+        create_list = [
+            PluginBlock(
+                target_type=BlockTarget.GROUP,
+                target_id=data["group_id"],
+                channel_id=data["channel_id"] or "",
+                block_type=kind,
+                module=module,
+            )
+            for data in await query.values("group_id", "channel_id", *BLOCK_FIELDS)
+            for field, kind in BLOCK_FIELDS.items()
+            for module in set(CommonUtils.convert_module_format(data[field] or ""))
+        ]
+        if create_list:
+            await PluginBlock.bulk_create(create_list, 100, ignore_conflicts=True)
+
     @classmethod
     def _run_script(cls):
         return []
+
+
+@post_save(GroupConsole)
+async def _(sender, instance: GroupConsole, created, using_db, update_fields):
+    """同步禁用关系表"""
+    await PluginBlock.sync(
+        BlockTarget.GROUP,
+        instance.group_id,
+        instance.channel_id,
+        {
+            kind: CommonUtils.convert_module_format(getattr(instance, field))
+            for field, kind in BLOCK_FIELDS.items()
+            if not update_fields or field in update_fields
+        },
+    )
+
+
+@post_delete(GroupConsole)
+async def _(sender, instance: GroupConsole, using_db):
+    """删除禁用关系表数据"""
+    await PluginBlock.clear(BlockTarget.GROUP, instance.group_id, instance.channel_id)
@@ -0,0 +1,24 @@
+from tortoise import fields
+from zhenxun_db_client import Model
+
+
+class LimitCount(Model):
+    id = fields.IntField(pk=True, generated=True, auto_increment=True)
+    """自增id"""
+    module = fields.CharField(255, description="模块名")
+    """模块名"""
+    key = fields.CharField(255, description="限制对象id")
+    """限制对象id，用户id或群组id"""
+    day = fields.DateField(description="日期")
+    """日期"""
+    count = fields.IntField(default=0, description="调用次数")
+    """调用次数"""
+
+    class Meta:  # type: ignore
+        table = "limit_count"
+        table_description = "插件每日次数限制计数"
+        unique_together = ("module", "key", "day")
+
+    @classmethod
+    async def _run_script(cls):
+        return []
@@ -0,0 +1,188 @@
+from strenum import StrEnum
+from tortoise import fields
+from zhenxun_db_client import Model
+
+from .db_utils import execute_sql
+
+
+class BlockTarget(StrEnum):
+    """禁用对象"""
+
+    GROUP = "GROUP"
+    """群组"""
+    BOT = "BOT"
+    """Bot"""
+
+
+class BlockKind(StrEnum):
+    """禁用类型"""
+
+    PLUGIN = "PLUGIN"
+    """插件"""
+    SUPERUSER_PLUGIN = "SUPERUSER_PLUGIN"
+    """超级用户禁用插件"""
+    TASK = "TASK"
+    """被动技能"""
+    SUPERUSER_TASK = "SUPERUSER_TASK"
+    """超级用户禁用被动"""
+
+
+class PluginBlock(Model):
+    id = fields.IntField(pk=True, generated=True, auto_increment=True)
+    """自增id"""
+    target_type = fields.CharEnumField(BlockTarget, description="禁用对象")
+    """禁用对象"""
+    target_id = fields.CharField(64, description="群组id/bot_id")
+    """群组id/bot_id"""
+    channel_id = fields.CharField(64, default="", description="频道id")
+    """频道id，为空字符串时表示群组本身"""
+    block_type = fields.CharEnumField(BlockKind, description="禁用类型")
+    """禁用类型"""
+    module = fields.CharField(128, description="模块名")
+    """模块名"""
+
+    class Meta:  # type: ignore
+        table = "plugin_block"
+        table_description = "插件禁用关系表"
+        unique_together = (
+            "target_type",
+            "target_id",
+            "channel_id",
+            "block_type",
+            "module",
+        )
+        """唯一索引总长度需小于 mysql utf8mb4 下 InnoDB 的 3072 字节限制"""
+        indexes = (("target_type", "block_type", "module"),)
+
+    @classmethod
+    async def is_block(
+        cls,
+        target: BlockTarget,
+        target_id: str,
+        module: str,
+        kinds: list[BlockKind],
+        channel_id: str | None = None,
+        any_channel: bool = False,
+    ) -> bool:
+        """是否禁用模块
+
+        参数:
+            target: 禁用对象
+            target_id: 群组id/bot_id
+            module: 模块名
+            kinds: 禁用类型，满足其一即可
+            channel_id: 频道id
+            any_channel: 是否忽略频道，任一频道禁用即可
+
+        返回:
+            bool: 是否禁用
+        """
+        query = cls.filter(
+            target_type=target,
+            target_id=target_id,
+            block_type__in=kinds,
+            module=module,
+        )
+        if not any_channel:
+            query = query.filter(channel_id=channel_id or "")
+        return await query.exists()
+
+    @classmethod
+    async def sync(
+        cls,
+        target: BlockTarget,
+        target_id: str,
+        channel_id: str | None,
+        data: dict[BlockKind, list[str]],
+    ):
+        """将禁用列表同步至关系表，只写入差异部分
+
+        参数:
+            target: 禁用对象
+            target_id: 群组id/bot_id
+            channel_id: 频道id
+            data: 禁用类型与模块列表
+        """
+        if not data:
+            return
+        channel_id = channel_id or ""
+        current = {
+            (kind, module): _id
+            for _id, kind, module in await cls.filter(
+                target_type=target,
+                target_id=target_id,
+                channel_id=channel_id,
+                block_type__in=list(data),
+            ).values_list("id", "block_type", "module")
+        }
+        expect = {
+            (kind, module) for kind, modules in data.items() for module in modules
+        }
+        if delete_ids := [_id for key, _id in current.items() if key not in expect]:
+            await cls.filter(id__in=delete_ids).delete()
+        if create_list := [
+            cls(
+                target_type=target,
+                target_id=target_id,
+                channel_id=channel_id,
+                block_type=kind,
+                module=module,
+            )
+            for kind, module in expect
+            if (kind, module) not in current
+        ]:
+            await cls.bulk_create(create_list, 100, ignore_conflicts=True)
+
+    @classmethod
+    async def block_all(
+        cls, target: BlockTarget, kind: BlockKind, module: str, table: str, column: str
+    ):
+        """对所有对象禁用模块，单条语句完成
+
+        参数:
+            target: 禁用对象
+            kind: 禁用类型
+            module: 模块名
+            table: 对象所在表名
+            column: 对象id字段名
+        """
+        channel = "COALESCE(t.channel_id, '')" if target == BlockTarget.GROUP else "''"
+        sql = (
+            f"INSERT INTO {cls._meta.db_table}"
+            " (target_type, target_id, channel_id, block_type, module)"
+            f" SELECT ?, t.{column}, {channel}, ?, ? FROM {table} t"
+            f" WHERE NOT EXISTS (SELECT 1 FROM {cls._meta.db_table} b"
+            f" WHERE b.target_type = ? AND b.target_id = t.{column}"
+            f" AND b.channel_id = {channel} AND b.block_type = ? AND b.module = ?)"
+        )
+        await execute_sql(
+            sql, [str(target), str(kind), module, str(target), str(kind), module]
+        )
+
+    @classmethod
+    async def unblock_all(cls, target: BlockTarget, kind: BlockKind, module: str):
+        """对所有对象解除禁用模块，单条语句完成
+
+        参数:
+            target: 禁用对象
+            kind: 禁用类型
+            module: 模块名
+        """
+        await cls.filter(target_type=target, block_type=kind, module=module).delete()
+
+    @classmethod
+    async def clear(cls, target: BlockTarget, target_id: str, channel_id: str | None):
+        """删除对象的全部禁用数据
+
+        参数:
+            target: 禁用对象
+            target_id: 群组id/bot_id
+            channel_id: 频道id
+        """
+        await cls.filter(
+            target_type=target, target_id=target_id, channel_id=channel_id or ""
+        ).delete()
+
+    @classmethod
+    async def _run_script(cls):
+        return []
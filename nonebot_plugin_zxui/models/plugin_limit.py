@@ -33,7 +33,20 @@ class PluginLimit(Model):
     """cd"""
     max_count = fields.IntField(null=True, description="最大调用次数")
     """最大调用次数"""
+    count_backend = fields.CharField(
+        255, default="MEMORY", description="次数限制存储方式"
+    )
+    """次数限制存储方式"""
 
     class Meta:  # type: ignore
         table = "plugin_limit"
         table_description = "插件限制"
+
+    @classmethod
+    async def _run_script(cls):
+        return [
+            (
+                "ALTER TABLE plugin_limit ADD COLUMN count_backend VARCHAR(255)"
+                " NOT NULL DEFAULT 'MEMORY';"
+            ),
+        ]
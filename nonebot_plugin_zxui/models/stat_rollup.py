@@ -0,0 +1,214 @@
+from datetime import datetime
+
+from strenum import StrEnum
+from tortoise import fields
+from tortoise.functions import Sum
+from zhenxun_db_client import Model
+
+from ..config import SQL_TYPE
+from .db_utils import execute_sql
+
+ROLLUP_KEYS = ("kind", "period", "bucket", "bot_id", "group_id", "plugin_name")
+
+
+class RollupKind(StrEnum):
+    """汇总数据来源"""
+
+    CHAT = "CHAT"
+    """聊天记录"""
+    CALL = "CALL"
+    """调用记录"""
+
+
+class RollupPeriod(StrEnum):
+    """汇总时间粒度"""
+
+    HOUR = "HOUR"
+    """小时"""
+    DAY = "DAY"
+    """天"""
+
+
+class StatRollup(Model):
+    id = fields.IntField(pk=True, generated=True, auto_increment=True)
+    """自增id"""
+    kind = fields.CharEnumField(RollupKind, description="数据来源")
+    """数据来源"""
+    period = fields.CharEnumField(RollupPeriod, description="时间粒度")
+    """时间粒度"""
+    bucket = fields.BigIntField(description="时间段开始时间戳")
+    """时间段开始时间戳，本地时间的整点或零点"""
+    bot_id = fields.CharField(64, default="", description="bot_id")
+    """bot_id"""
+    group_id = fields.CharField(64, default="", description="群组id")
+    """群组id，私聊为空字符串"""
+    plugin_name = fields.CharField(128, default="", description="插件名称")
+    """插件名称，聊天记录为空字符串"""
+    count = fields.BigIntField(default=0, description="数量")
+    """数量"""
+
+    class Meta:  # type: ignore
+        table = "stat_rollup"
+        table_description = "聊天/调用记录汇总表"
+        unique_together = ROLLUP_KEYS
+        """唯一索引总长度需小于 mysql utf8mb4 下 InnoDB 的 3072 字节限制"""
+        indexes = (("kind", "period", "bucket"),)
+
+    @classmethod
+    def bucket_of(cls, period: RollupPeriod, time: datetime) -> int:
+        """获取时间所在时间段的开始时间戳
+
+        参数:
+            period: 时间粒度
+            time: 时间
+
+        返回:
+            int: 时间戳
+        """
+        if time.tzinfo:
+            time = time.astimezone().replace(tzinfo=None)
+        time = time.replace(minute=0, second=0, microsecond=0)
+        if period == RollupPeriod.DAY:
+            time = time.replace(hour=0)
+        return int(time.timestamp())
+
+    @classmethod
+    def aggregate(
+        cls, data_list: list[tuple[datetime | None, str | None, str | None, str | None]]
+    ) -> dict[tuple[RollupPeriod, int, str, str, str], int]:
+        """按时间段统计记录数量
+
+        参数:
+            data_list: (创建时间, bot_id, 群组id, 插件名称) 列表
+
+        返回:
+            dict[tuple[RollupPeriod, int, str, str, str], int]: 汇总key与数量
+        """
+        data: dict[tuple[RollupPeriod, int, str, str, str], int] = {}
+        now = datetime.now()
+        for create_time, bot_id, group_id, plugin_name in data_list:
+            for period in RollupPeriod:
+                key = (
+                    period,
+                    cls.bucket_of(period, create_time or now),
+                    (bot_id or "")[:64],
+                    (group_id or "")[:64],
+                    (plugin_name or "")[:128],
+                )
+                data[key] = data.get(key, 0) + 1
+        return data
+
+    @classmethod
+    async def add(cls, kind: RollupKind, item_list: list):
+        """累加已写入的记录
+
+        参数:
+            kind: 数据来源
+            item_list: ChatHistory 或 Statistics 列表
+        """
+        await cls.increase(
+            kind,
+            cls.aggregate(
+                [
+                    (
+                        item.create_time,
+                        item.bot_id,
+                        item.group_id,
+                        getattr(item, "plugin_name", None),
+                    )
+                    for item in item_list
+                ]
+            ),
+        )
+
+    @classmethod
+    async def increase(
+        cls,
+        kind: RollupKind,
+        data: dict[tuple[RollupPeriod, int, str, str, str], int],
+        chunk_size: int = 100,
+    ):
+        """累加汇总数量，不存在时创建
+
+        参数:
+            kind: 数据来源
+            data: (时间粒度, 时间段, bot_id, 群组id, 插件名称) 与数量
+            chunk_size: 单条语句的数据量
+        """
+        table = cls._meta.db_table
+        if SQL_TYPE == "mysql":
+            conflict = " ON DUPLICATE KEY UPDATE count = count + VALUES(count)"
+        else:
+            conflict = (
+                f" ON CONFLICT ({', '.join(ROLLUP_KEYS)})"
+                f" DO UPDATE SET count = {table}.count + excluded.count"
+            )
+        items = list(data.items())
+        for i in range(0, len(items), chunk_size):
+            chunk = items[i : i + chunk_size]
+            values = []
+            for (period, bucket, bot_id, group_id, plugin_name), count in chunk:
+                values.extend(
+                    [str(kind), str(period), bucket, bot_id, group_id, plugin_name]
+                )
+                values.append(count)
+            sql = (
+                f"INSERT INTO {table} ({', '.join(ROLLUP_KEYS)}, count) VALUES "
+                + ", ".join(["(?, ?, ?, ?, ?, ?, ?)"] * len(chunk))
+                + conflict
+            )
+            await execute_sql(sql, values)
+
+    @classmethod
+    def query(
+        cls,
+        kind: RollupKind,
+        period: RollupPeriod,
+        start: datetime | None = None,
+        bot_id: str | None = None,
+    ):
+        """构建汇总查询
+
+        参数:
+            kind: 数据来源
+            period: 时间粒度
+            start: 开始时间，为空时不限制
+            bot_id: bot_id，为空时不限制
+        """
+        query = cls.filter(kind=kind, period=period)
+        if start:
+            query = query.filter(bucket__gte=cls.bucket_of(period, start))
+        if bot_id:
+            query = query.filter(bot_id=bot_id)
+        return query
+
+    @classmethod
+    async def get_bucket_count(
+        cls,
+        kind: RollupKind,
+        period: RollupPeriod,
+        start: datetime,
+        bot_id: str | None = None,
+    ) -> dict[int, int]:
+        """获取开始时间之后每个时间段的数量
+
+        参数:
+            kind: 数据来源
+            period: 时间粒度
+            start: 开始时间
+            bot_id: bot_id，为空时为全部
+
+        返回:
+            dict[int, int]: 时间段开始时间戳与数量
+        """
+        data_list = (
+            await cls.query(kind, period, start, bot_id)
+            .annotate(total=Sum("count"))
+            .group_by("bucket")
+            .values_list("bucket", "total")
+        )
+        return {bucket: int(total or 0) for bucket, total in data_list}
+
+    @classmethod
+    async def _run_script(cls):
+        return []
@@ -19,6 +19,7 @@ class Statistics(Model):
     class Meta:  # type: ignore
         table = "statistics"
         table_description = "插件调用统计数据库"
+        indexes = (("user_id",), ("group_id", "plugin_name"))
 
     @classmethod
     async def _run_script(cls):
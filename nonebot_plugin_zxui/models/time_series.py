@@ -0,0 +1,291 @@
+from datetime import datetime
+from typing import Any
+
+from strenum import StrEnum
+from tortoise import timezone
+from zhenxun_db_client import Model
+
+from ..config import SQL_TYPE
+from .bot_connect_log import BotConnectLog
+from .chat_history import ChatHistory
+from .db_utils import fetch_sql, to_db_value
+from .statistics import Statistics
+
+MAX_POINTS = 2000
+"""单条序列最大时间段数量"""
+
+
+class SeriesSource(StrEnum):
+    """时间序列数据来源"""
+
+    CHAT = "CHAT"
+    """聊天记录"""
+    CALL = "CALL"
+    """调用记录"""
+    CONNECT = "CONNECT"
+    """bot连接记录"""
+
+
+class Granularity(StrEnum):
+    """时间序列粒度"""
+
+    MINUTE = "MINUTE"
+    """分钟"""
+    HOUR = "HOUR"
+    """小时"""
+    DAY = "DAY"
+    """天"""
+    WEEK = "WEEK"
+    """周，从周一开始"""
+
+
+class Dimension(StrEnum):
+    """时间序列分组维度"""
+
+    BOT = "BOT"
+    """bot"""
+    GROUP = "GROUP"
+    """群组"""
+    PLUGIN = "PLUGIN"
+    """插件"""
+
+
+source2model: dict[SeriesSource, tuple[type[Model], str]] = {
+    SeriesSource.CHAT: (ChatHistory, "create_time"),
+    SeriesSource.CALL: (Statistics, "create_time"),
+    SeriesSource.CONNECT: (BotConnectLog, "connect_time"),
+}
+"""数据来源与 (模型, 时间字段)"""
+
+LOCAL_TIME_SOURCE = {SeriesSource.CONNECT}
+"""时间字段写入时为无时区本地时间的数据来源，其余为 auto_now_add 写入的当前时间"""
+
+granularity2seconds = {
+    Granularity.MINUTE: 60,
+    Granularity.HOUR: 3600,
+    Granularity.DAY: 86400,
+    Granularity.WEEK: 604800,
+}
+
+dimension2field = {
+    Dimension.BOT: "bot_id",
+    Dimension.GROUP: "group_id",
+    Dimension.PLUGIN: "plugin_name",
+}
+
+WEEK_SHIFT = 259200
+"""1970-01-01 为周四，偏移3天使周从周一开始"""
+
+type2sql_epoch = {
+    "sqlite": "CAST(strftime('%s', {column}) AS INTEGER)",
+    "mysql": "TIMESTAMPDIFF(SECOND, '1970-01-01 00:00:00', {column})",
+    "postgres": "CAST(EXTRACT(EPOCH FROM {column}) AS BIGINT)",
+}
+"""时间字段转换为时间戳，sqlite 与 postgres 按保存的时区解析，mysql 按 UTC 解析"""
+
+type2sql_div = {
+    "sqlite": "({value}) / {step}",
+    "mysql": "({value}) DIV {step}",
+    "postgres": "({value}) / {step}",
+}
+"""整数除法，时间戳均为正数，截断即向下取整"""
+
+
+class TimeSeries:
+    """
+    时间序列查询
+
+    在数据库中按时间段分组计数，时间段以本地时间对齐，
+    时区偏移在查询时固定，夏令时切换当天的时间段可能偏移一小时
+    """
+
+    @classmethod
+    def get_offset(cls, time: datetime) -> int:
+        """获取带时区时间的 UTC 偏移
+
+        参数:
+            time: 时间
+
+        返回:
+            int: 偏移秒数
+        """
+        offset = time.utcoffset()
+        return int(offset.total_seconds()) if offset else 0
+
+    @classmethod
+    def get_shift(cls, granularity: Granularity) -> int:
+        """获取时间段对齐到本地时间所需的时间戳偏移
+
+        参数:
+            granularity: 时间粒度
+
+        返回:
+            int: 偏移秒数
+        """
+        shift = cls.get_offset(datetime.now().astimezone())
+        if granularity == Granularity.WEEK:
+            shift += WEEK_SHIFT
+        return shift
+
+    @classmethod
+    def get_storage_offset(cls, source: SeriesSource) -> int:
+        """获取数据库中时间字段转换的时间戳相对真实时间戳的偏移
+
+        tortoise 保存为默认时区的带时区时间，无时区的本地时间保留时钟读数，
+        mysql 保存时丢弃时区，时钟读数按 UTC 解析
+
+        参数:
+            source: 数据来源
+
+        返回:
+            int: 偏移秒数
+        """
+        label = cls.get_offset(timezone.now())
+        clock = (
+            cls.get_offset(datetime.now().astimezone())
+            if source in LOCAL_TIME_SOURCE
+            else label
+        )
+        return clock if SQL_TYPE == "mysql" else clock - label
+
+    @classmethod
+    def to_storage(cls, source: SeriesSource, time: datetime) -> datetime:
+        """转换为时间字段保存的形式，sqlite 中按文本比较，需与保存的时区一致
+
+        参数:
+            source: 数据来源
+            time: 时间，无时区时视为本地时间
+
+        返回:
+            datetime: tortoise 默认时区的时间
+        """
+        if source in LOCAL_TIME_SOURCE:
+            return timezone.make_aware(time.astimezone().replace(tzinfo=None))
+        return time.astimezone(timezone.get_default_timezone())
+
+    @classmethod
+    def bucket_of(cls, granularity: Granularity, time: datetime) -> int:
+        """获取时间所在时间段的开始时间戳
+
+        参数:
+            granularity: 时间粒度
+            time: 时间
+
+        返回:
+            int: 时间戳
+        """
+        step = granularity2seconds[granularity]
+        shift = cls.get_shift(granularity)
+        return (int(time.timestamp()) + shift) // step * step - shift
+
+    @classmethod
+    def get_buckets(
+        cls, granularity: Granularity, start: datetime, end: datetime
+    ) -> list[int]:
+        """获取时间范围内全部时间段的开始时间戳
+
+        参数:
+            granularity: 时间粒度
+            start: 开始时间
+            end: 结束时间，不包含
+
+        返回:
+            list[int]: 时间戳，升序
+        """
+        step = granularity2seconds[granularity]
+        first = cls.bucket_of(granularity, start)
+        end_ts = int(end.timestamp())
+        if end_ts <= first:
+            return []
+        size = (end_ts - first + step - 1) // step
+        if size > MAX_POINTS:
+            raise ValueError(f"时间段数量 {size} 超出上限 {MAX_POINTS}")
+        return list(range(first, first + size * step, step))
+
+    @classmethod
+    def fill(cls, bucket2count: dict[int, int], buckets: list[int]) -> list[int]:
+        """按时间段填充数量，不存在的时间段为0
+
+        参数:
+            bucket2count: 时间段与数量
+            buckets: 时间段
+
+        返回:
+            list[int]: 数量，与 buckets 顺序一致
+        """
+        return [bucket2count.get(bucket, 0) for bucket in buckets]
+
+    @classmethod
+    async def query(
+        cls,
+        source: SeriesSource,
+        granularity: Granularity,
+        start: datetime,
+        end: datetime,
+        dimension: Dimension | None = None,
+        filters: dict[str, Any] | None = None,
+        limit: int = 10,
+    ) -> tuple[list[int], dict[str, list[int]]]:
+        """查询时间序列
+
+        参数:
+            source: 数据来源
+            granularity: 时间粒度
+            start: 开始时间
+            end: 结束时间，不包含
+            dimension: 分组维度，为空时只返回总数序列 total
+            filters: 等值过滤条件，值为None时忽略该条件
+            limit: 分组时返回总数最多的序列数量
+
+        返回:
+            tuple[list[int], dict[str, list[int]]]: 时间段与 分组值-数量序列
+        """
+        model, column = source2model[source]
+        projection = model._meta.fields_db_projection
+        buckets = cls.get_buckets(granularity, start, end)
+        step = granularity2seconds[granularity]
+        shift = cls.get_shift(granularity)
+        epoch_sql = type2sql_epoch[SQL_TYPE].format(column=projection[column])
+        bucket_sql = type2sql_div[SQL_TYPE].format(
+            value=f"{epoch_sql} + {shift - cls.get_storage_offset(source)}",
+            step=step,
+        )
+        select_list = [f"{bucket_sql} AS bucket"]
+        group_list = [bucket_sql]
+        if dimension:
+            field = dimension2field[dimension]
+            if field not in projection:
+                raise ValueError(f"{source} 不支持按 {dimension} 分组")
+            select_list.append(f"{projection[field]} AS dim")
+            group_list.append(projection[field])
+        where_list = [f"{projection[column]} >= ?", f"{projection[column]} < ?"]
+        values = [
+            to_db_value(model, column, cls.to_storage(source, start)),
+            to_db_value(model, column, cls.to_storage(source, end)),
+        ]
+        for key, v in (filters or {}).items():
+            if v is not None:
+                where_list.append(f"{projection[key]} = ?")
+                values.append(to_db_value(model, key, v))
+        data_list = await fetch_sql(
+            f"SELECT {', '.join(select_list)}, COUNT(*) AS count"
+            f" FROM {model._meta.db_table} WHERE {' AND '.join(where_list)}"
+            f" GROUP BY {', '.join(group_list)}",
+            values,
+        )
+        offset = (buckets[0] + shift) // step if buckets else 0
+        series: dict[str, list[int]] = (
+            {} if dimension else {"total": [0] * len(buckets)}
+        )
+        for data in data_list:
+            index = int(data["bucket"]) - offset
+            if not 0 <= index < len(buckets):
+                continue
+            key = str(data["dim"] or "") if dimension else "total"
+            if key not in series:
+                series[key] = [0] * len(buckets)
+            series[key][index] += int(data["count"] or 0)
+        if dimension and len(series) > limit:
+            key_list = sorted(series, key=lambda k: sum(series[k]), reverse=True)
+            series = {key: series[key] for key in key_list[:limit]}
+        return buckets, series
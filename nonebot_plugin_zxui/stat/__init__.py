@@ -38,6 +38,7 @@ async def _(bot: Bot):
 
 
 from .chat_history import *  # noqa: F403
+from .rollup import *  # noqa: F403
 from .statistics import *  # noqa: F403
 
 with contextlib.suppress(ImportError):
@@ -1 +1,2 @@
 from .chat_message import *  # noqa: F403
+from .chat_retention import *  # noqa: F403
@@ -1,14 +1,20 @@
+import nonebot
 from nonebot import on_message
 from nonebot.plugin import PluginMetadata
 from nonebot_plugin_alconna import UniMsg
 from nonebot_plugin_apscheduler import scheduler
 from nonebot_plugin_uninfo import Uninfo
 from zhenxun_utils.enum import PluginType
-from zhenxun_utils.log import logger
 
 from ...config import config
 from ...models.chat_history import ChatHistory
+from ...models.chat_search import chat_search
+from ...models.stat_rollup import RollupKind, StatRollup
 from ...zxpm.extra import PluginExtraData
+from ...zxpm.metrics import metrics
+from ..live_counter import live_counter
+from ..spool import Spool
+from ..writer import BatchWriter, OverflowPolicy
 
 __plugin_meta__ = PluginMetadata(
     name="功能调用统计",
@@ -24,40 +30,64 @@ def rule(message: UniMsg) -> bool:
     return config.zxui_enable_chat_history and bool(message)
 
 
+driver = nonebot.get_driver()
+
 chat_history = on_message(rule=rule, priority=1, block=False)
 
 
-TEMP_LIST = []
+async def _on_write(chunk: list[ChatHistory]):
+    """维护聊天记录汇总与搜索索引"""
+    await StatRollup.add(RollupKind.CHAT, chunk)
+    await chat_search.sync()
+
+
+chat_writer = BatchWriter(
+    "聊天记录",
+    ChatHistory,
+    config.zxui_chat_flush_size,
+    config.zxui_chat_flush_interval,
+    config.zxui_chat_max_size,
+    OverflowPolicy.parse(config.zxui_chat_overflow_policy),
+    spool=Spool("chat_history", ChatHistory),
+    on_write=_on_write,
+)
+
+live_counter.register(RollupKind.CHAT, chat_writer)
 
 
 @chat_history.handle()
 async def _(message: UniMsg, session: Uninfo):
-    group_id = session.group.id if session.group else None
-    TEMP_LIST.append(
-        ChatHistory(
-            user_id=session.user.id,
-            group_id=group_id,
-            text=str(message),
-            plain_text=message.extract_plain_text(),
-            bot_id=session.self_id,
-            platform=session.platform,
-        )
-    )
+    with metrics.timer("stat.chat_history"):
+        group_id = session.group.id if session.group else None
+        if await chat_writer.put(
+            ChatHistory(
+                user_id=session.user.id,
+                group_id=group_id,
+                text=str(message),
+                plain_text=message.extract_plain_text(),
+                bot_id=session.self_id,
+                platform=session.platform,
+            )
+        ):
+            live_counter.incr(RollupKind.CHAT, session.self_id)
 
 
 @scheduler.scheduled_job(
     "interval",
-    minutes=1,
+    seconds=1,
 )
 async def _():
-    try:
-        message_list = TEMP_LIST.copy()
-        TEMP_LIST.clear()
-        if message_list:
-            await ChatHistory.bulk_create(message_list)
-        logger.debug(f"批量添加聊天记录 {len(message_list)} 条", "定时任务")
-    except Exception as e:
-        logger.error("定时批量添加聊天记录", "定时任务", e=e)
+    await chat_writer.tick()
+
+
+@driver.on_startup
+async def _():
+    chat_writer.replay()
+
+
+@driver.on_shutdown
+async def _():
+    await chat_writer.flush(force=True)
 
 
 # @test.handle()
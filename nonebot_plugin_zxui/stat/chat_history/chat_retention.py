@@ -0,0 +1,95 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from nonebot_plugin_apscheduler import scheduler
+from zhenxun_utils.log import logger
+
+from ...config import config
+from ...models.chat_archive import FIELDS, ChatArchive, to_local
+from ...models.chat_history import ChatHistory
+
+ARCHIVE_SIZE = 1000
+"""每次归档的记录数量"""
+
+archive_lock = asyncio.Lock()
+"""归档锁，归档期间聊天记录会被删除，重建统计汇总时需持有"""
+
+
+def get_retention_days(bot_id: str | None, group_id: str | None) -> int:
+    """获取消息保留天数，群组设置优先于bot设置
+
+    参数:
+        bot_id: bot_id
+        group_id: 群组id
+
+    返回:
+        int: 保留天数，为0时不清理
+    """
+    if group_id and group_id in config.zxui_chat_retention_group:
+        return config.zxui_chat_retention_group[group_id]
+    if bot_id and bot_id in config.zxui_chat_retention_bot:
+        return config.zxui_chat_retention_bot[bot_id]
+    return config.zxui_chat_retention_days
+
+
+async def archive_chat_history() -> int:
+    """将超出保留天数的聊天记录分块写入归档文件后删除
+
+    保留天数以自然日计算，先写入归档文件再删除，删除前中断时归档中可能重复，读取时去重
+
+    返回:
+        int: 归档的记录数量
+    """
+    day_list = [
+        days
+        for days in (
+            config.zxui_chat_retention_days,
+            *config.zxui_chat_retention_bot.values(),
+            *config.zxui_chat_retention_group.values(),
+        )
+        if days > 0
+    ]
+    if not day_list:
+        return 0
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    async with archive_lock:
+        last_id = 0
+        total = 0
+        while True:
+            data_list = (
+                await ChatHistory.filter(
+                    id__gt=last_id,
+                    create_time__lt=today - timedelta(days=min(day_list)),
+                )
+                .order_by("id")
+                .limit(ARCHIVE_SIZE)
+                .values(*FIELDS)
+            )
+            if not data_list:
+                break
+            last_id = data_list[-1]["id"]
+            archive_list = []
+            for data in data_list:
+                days = get_retention_days(data["bot_id"], data["group_id"])
+                cutoff = today - timedelta(days=days)
+                if days > 0 and to_local(data["create_time"]) < cutoff:
+                    archive_list.append(data)
+            if not archive_list:
+                continue
+            await asyncio.to_thread(ChatArchive.write, archive_list)
+            await ChatHistory.filter(id__in=[d["id"] for d in archive_list]).delete()
+            total += len(archive_list)
+        return total
+
+
+@scheduler.scheduled_job(
+    "cron",
+    hour=4,
+    minute=0,
+)
+async def _():
+    try:
+        if total := await archive_chat_history():
+            logger.info(f"归档聊天记录 {total} 条", "聊天记录归档")
+    except Exception as e:
+        logger.error("归档聊天记录失败", "聊天记录归档", e=e)
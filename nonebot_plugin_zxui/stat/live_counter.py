@@ -0,0 +1,111 @@
+from datetime import datetime
+
+from nonebot_plugin_apscheduler import scheduler
+from tortoise.functions import Sum
+from zhenxun_utils.log import logger
+
+from ..models.stat_rollup import RollupKind, RollupPeriod, StatRollup
+from .writer import BatchWriter
+
+RECONCILE_INTERVAL = 300
+"""校准间隔秒数"""
+
+
+class LiveCounter:
+    """
+    今日聊天/调用次数实时计数
+
+    由聊天记录与调用记录钩子累加，按bot区分，跨天时清零，
+    首次读取时与定时以 当日汇总数据 + 写入队列中的当日数据 校准
+    """
+
+    def __init__(self):
+        self._day = 0
+        """当前计数所在日期的零点时间戳"""
+        self._data: dict[RollupKind, dict[str, int]] = {kind: {} for kind in RollupKind}
+        self._writers: dict[RollupKind, BatchWriter] = {}
+        self.loaded = False
+        """是否已校准"""
+
+    def register(self, kind: RollupKind, writer: BatchWriter):
+        """注册数据来源的写入队列，校准时读取其中未写入的数据
+
+        参数:
+            kind: 数据来源
+            writer: 写入队列
+        """
+        self._writers[kind] = writer
+
+    def __check_day(self) -> int:
+        day = StatRollup.bucket_of(RollupPeriod.DAY, datetime.now())
+        if day != self._day:
+            self._day = day
+            self._data = {kind: {} for kind in RollupKind}
+        return day
+
+    def incr(self, kind: RollupKind, bot_id: str | None):
+        """计数加一
+
+        参数:
+            kind: 数据来源
+            bot_id: bot id
+        """
+        self.__check_day()
+        data = self._data[kind]
+        data[bot_id or ""] = data.get(bot_id or "", 0) + 1
+
+    async def get(self, kind: RollupKind, bot_id: str | None = None) -> int:
+        """获取今日数量
+
+        参数:
+            kind: 数据来源
+            bot_id: bot id，为空时为全部
+
+        返回:
+            int: 数量
+        """
+        if not self.loaded:
+            await self.reconcile()
+        self.__check_day()
+        data = self._data[kind]
+        return data.get(bot_id, 0) if bot_id else sum(data.values())
+
+    async def reconcile(self):
+        """以数据库与写入队列中的当日数据校准计数"""
+        for kind in RollupKind:
+            if writer := self._writers.get(kind):
+                async with writer.lock:
+                    await self.__reconcile(kind, writer)
+            else:
+                await self.__reconcile(kind, None)
+        self.loaded = True
+
+    async def __reconcile(self, kind: RollupKind, writer: BatchWriter | None):
+        day = self.__check_day()
+        data_list = (
+            await StatRollup.filter(kind=kind, period=RollupPeriod.DAY, bucket=day)
+            .annotate(total=Sum("count"))
+            .group_by("bot_id")
+            .values_list("bot_id", "total")
+        )
+        data = {bot_id: int(total or 0) for bot_id, total in data_list}
+        for item in writer.items() if writer else []:
+            create_time = item.create_time or datetime.now()
+            if StatRollup.bucket_of(RollupPeriod.DAY, create_time) == day:
+                data[item.bot_id or ""] = data.get(item.bot_id or "", 0) + 1
+        if day == self.__check_day():
+            self._data[kind] = data
+
+
+live_counter = LiveCounter()
+
+
+@scheduler.scheduled_job(
+    "interval",
+    seconds=RECONCILE_INTERVAL,
+)
+async def _():
+    try:
+        await live_counter.reconcile()
+    except Exception as e:
+        logger.error("校准今日聊天/调用次数失败", "实时计数", e=e)
@@ -0,0 +1,157 @@
+import asyncio
+
+import nonebot
+from nonebot.permission import SUPERUSER
+from nonebot.plugin import PluginMetadata
+from nonebot_plugin_alconna import Alconna, on_alconna
+from zhenxun_utils.enum import PluginType
+from zhenxun_utils.log import logger
+from zhenxun_utils.message import MessageUtils
+
+from ..models.chat_archive import ChatArchive
+from ..models.chat_history import ChatHistory
+from ..models.stat_rollup import RollupKind, StatRollup
+from ..models.statistics import Statistics
+from ..zxpm.extra import PluginExtraData
+from .chat_history.chat_message import chat_writer
+from .chat_history.chat_retention import archive_lock
+from .statistics.statistics_hook import call_writer
+from .writer import BatchWriter
+
+__plugin_meta__ = PluginMetadata(
+    name="重建统计汇总",
+    description="由聊天/调用记录重建统计汇总数据",
+    usage="""
+    聊天/调用次数统计读取汇总表，汇总表由写入任务增量维护
+    汇总数据与原始记录不一致时可手动重建
+    指令:
+        重建统计汇总
+    """.strip(),
+    extra=PluginExtraData(
+        author="HibiKier",
+        version="0.1",
+        plugin_type=PluginType.SUPERUSER,
+    ).dict(),
+)
+
+BACKFILL_SIZE = 5000
+"""重建时每次读取的记录数量"""
+
+driver = nonebot.get_driver()
+
+_lock = asyncio.Lock()
+
+_background: set[asyncio.Task] = set()
+"""后台任务引用，防止任务未完成时被回收"""
+
+
+def _get_source(kind: RollupKind) -> tuple[type[ChatHistory | Statistics], BatchWriter]:
+    if kind == RollupKind.CHAT:
+        return ChatHistory, chat_writer
+    return Statistics, call_writer
+
+
+async def backfill(kind: RollupKind) -> int:
+    """由原始记录重建汇总数据，聊天记录包含已归档的数据
+
+    重建开始时持有写入锁删除旧汇总并记录最大id，之后写入的记录由写入任务累加
+
+    参数:
+        kind: 数据来源
+
+    返回:
+        int: 处理的记录数量
+    """
+    model, writer = _get_source(kind)
+    fields = ["id", "create_time", "bot_id", "group_id"]
+    if kind == RollupKind.CALL:
+        fields.append("plugin_name")
+    async with writer.lock:
+        id_list = (
+            await model.all().order_by("-id").limit(1).values_list("id", flat=True)
+        )
+        max_id = id_list[0] if id_list else 0
+        await StatRollup.filter(kind=kind).delete()
+    last_id = 0
+    total = 0
+    while last_id < max_id:
+        data_list = (
+            await model.filter(id__gt=last_id, id__lte=max_id)
+            .order_by("id")
+            .limit(BACKFILL_SIZE)
+            .values_list(*fields)
+        )
+        if not data_list:
+            break
+        last_id = data_list[-1][0]
+        total += len(data_list)
+        row_list = [data[1:] for data in data_list]
+        if kind == RollupKind.CHAT:
+            row_list = [(*row, None) for row in row_list]
+        await StatRollup.increase(kind, StatRollup.aggregate(row_list))
+    if kind == RollupKind.CHAT:
+        for day in ChatArchive.get_days():
+            data_list = await asyncio.to_thread(ChatArchive.read, day)
+            total += len(data_list)
+            row_list = [
+                (data["create_time"], data["bot_id"], data["group_id"], None)
+                for data in data_list
+            ]
+            await StatRollup.increase(kind, StatRollup.aggregate(row_list))
+    return total
+
+
+async def backfill_all() -> dict[RollupKind, int]:
+    """重建全部汇总数据
+
+    返回:
+        dict[RollupKind, int]: 数据来源与处理的记录数量
+    """
+    async with _lock, archive_lock:
+        result = {}
+        for kind in RollupKind:
+            result[kind] = await backfill(kind)
+            logger.info(f"重建 {kind} 统计汇总完成，共 {result[kind]} 条", "统计汇总")
+        return result
+
+
+_matcher = on_alconna(
+    Alconna("重建统计汇总"),
+    permission=SUPERUSER,
+    priority=1,
+    block=True,
+)
+
+
+@_matcher.handle()
+async def _():
+    if _lock.locked():
+        await MessageUtils.build_message("统计汇总正在重建中...").finish(reply_to=True)
+    await MessageUtils.build_message("开始重建统计汇总...").send(reply_to=True)
+    result = await backfill_all()
+    await MessageUtils.build_message(
+        f"重建统计汇总完成，聊天记录 {result[RollupKind.CHAT]} 条，"
+        f"调用记录 {result[RollupKind.CALL]} 条"
+    ).send(reply_to=True)
+
+
+async def _init_backfill():
+    try:
+        if await StatRollup.exists():
+            return
+        if (
+            await ChatHistory.exists()
+            or await Statistics.exists()
+            or ChatArchive.get_days()
+        ):
+            logger.info("统计汇总为空，开始由原始记录重建...", "统计汇总")
+            await backfill_all()
+    except Exception as e:
+        logger.error("重建统计汇总失败", "统计汇总", e=e)
+
+
+@driver.on_startup
+async def _():
+    task = asyncio.create_task(_init_backfill())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
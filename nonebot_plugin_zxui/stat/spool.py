@@ -0,0 +1,167 @@
+import struct
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO
+
+import ujson as json
+from tortoise import fields, timezone
+from zhenxun_db_client import Model
+from zhenxun_utils.log import logger
+
+from ..config import DATA_PATH
+
+SPOOL_PATH = DATA_PATH / "spool"
+
+HEADER = struct.Struct(">I")
+"""记录长度前缀，4字节大端"""
+
+SEGMENT_SUFFIX = ".seg"
+FAILED_SUFFIX = ".failed"
+"""超出重试次数的分段，下次启动时重放"""
+
+
+class Spool:
+    """
+    写入数据库前的本地暂存文件
+
+    数据以 长度前缀+json 编码后先缓存在内存中，由 flush 批量追加写入当前分段文件，
+    写入数据库时切换分段，写入成功后删除已切换的分段，
+    进程崩溃或被杀后在启动时重放未删除的分段
+
+    BatchWriter 在每次 tick 与切换分段时调用 flush，进程崩溃时最多丢失
+    上次 tick 之后加入的数据（定时间隔1秒），
+    写入时未调用 fsync，系统崩溃时还可能丢失系统缓存中的数据
+    """
+
+    def __init__(self, name: str, model: type[Model]):
+        """
+        参数:
+            name: 暂存目录名称
+            model: 暂存的模型
+        """
+        self.path = SPOOL_PATH / name
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.model = model
+        meta = model._meta
+        self._fields = [
+            field for field in meta.fields_db_projection if field != meta.pk_attr
+        ]
+        self._datetime_fields = {
+            name
+            for name, field in meta.fields_map.items()
+            if isinstance(field, fields.DatetimeField)
+        }
+        self._seq = max((int(file.stem) for file in self.__files()), default=0)
+        self._file: BinaryIO | None = None
+        self._buffer: list[bytes] = []
+        """未写入文件的数据"""
+
+    def __files(self) -> list[Path]:
+        return sorted(
+            [
+                *self.path.glob(f"*{SEGMENT_SUFFIX}"),
+                *self.path.glob(f"*{FAILED_SUFFIX}"),
+            ],
+            key=lambda file: int(file.stem),
+        )
+
+    def append(self, item: Model):
+        """追加一条数据到缓存，未赋值的时间字段会设置为当前时间，与 auto_now_add 一致
+
+        参数:
+            item: 数据
+        """
+        data = {}
+        for field in self._fields:
+            value = getattr(item, field)
+            if field in self._datetime_fields:
+                if value is None:
+                    value = timezone.now()
+                    setattr(item, field, value)
+                value = value.isoformat()
+            data[field] = value
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self._buffer.append(HEADER.pack(len(body)) + body)
+
+    def flush(self):
+        """将缓存的数据写入当前分段文件"""
+        if not self._buffer:
+            return
+        if not self._file:
+            self._seq += 1
+            self._file = (self.path / f"{self._seq}{SEGMENT_SUFFIX}").open("ab")
+        content = b"".join(self._buffer)
+        self._buffer = []
+        self._file.write(content)
+        self._file.flush()
+
+    def rotate(self) -> list[Path]:
+        """关闭当前分段，之后的数据写入新分段
+
+        返回:
+            list[Path]: 已关闭且未确认的分段，与内存中待写入的数据对应
+        """
+        self.flush()
+        if self._file:
+            self._file.close()
+            self._file = None
+        return [file for file in self.__files() if file.suffix == SEGMENT_SUFFIX]
+
+    def ack(self, files: list[Path]):
+        """数据已写入数据库，删除分段
+
+        参数:
+            files: 分段文件
+        """
+        for file in files:
+            file.unlink(missing_ok=True)
+
+    def reject(self, files: list[Path]):
+        """数据超出重试次数，标记分段留待下次启动时重放
+
+        参数:
+            files: 分段文件
+        """
+        for file in files:
+            if file.exists():
+                file.rename(file.with_suffix(FAILED_SUFFIX))
+
+    def load(self) -> list[Model]:
+        """读取上次运行未确认的全部分段，读取后分段视为待写入
+
+        返回:
+            list[Model]: 数据
+        """
+        if self._file or self._buffer:
+            return []
+        item_list = []
+        for file in self.__files():
+            if file.suffix == FAILED_SUFFIX:
+                file = file.rename(file.with_suffix(SEGMENT_SUFFIX))
+            item_list.extend(self.__read(file))
+        return item_list
+
+    def __read(self, file: Path) -> list[Model]:
+        item_list = []
+        content = file.read_bytes()
+        offset = 0
+        while offset + HEADER.size <= len(content):
+            (size,) = HEADER.unpack_from(content, offset)
+            body = content[offset + HEADER.size : offset + HEADER.size + size]
+            if len(body) < size:
+                break
+            offset += HEADER.size + size
+            try:
+                data = json.loads(body)
+                for field in self._datetime_fields:
+                    if data.get(field):
+                        data[field] = datetime.fromisoformat(data[field])
+                item_list.append(self.model(**data))
+            except Exception as e:
+                logger.warning(f"暂存文件 {file.name} 存在无法解析的数据", "Spool", e=e)
+        if offset < len(content):
+            logger.warning(
+                f"暂存文件 {file.name} 末尾存在不完整的数据 {len(content) - offset} 字节",
+                "Spool",
+            )
+        return item_list
@@ -1,5 +1,6 @@
 from datetime import datetime
 
+import nonebot
 from nonebot.adapters import Bot, Event
 from nonebot.matcher import Matcher
 from nonebot.message import run_postprocessor
@@ -10,11 +11,28 @@ from zhenxun_utils.enum import PluginType
 from zhenxun_utils.log import logger
 
 from ...config import config
-from ...models.plugin_info import PluginInfo
+from ...models.stat_rollup import RollupKind, StatRollup
 from ...models.statistics import Statistics
+from ...zxpm.cache import auth_snapshot
 from ...zxpm.extra import PluginExtraData
+from ...zxpm.metrics import metrics
+from ..live_counter import live_counter
+from ..spool import Spool
+from ..writer import BatchWriter
 
-TEMP_LIST = []
+driver = nonebot.get_driver()
+
+call_writer = BatchWriter(
+    "调用记录",
+    Statistics,
+    config.zxui_call_flush_size,
+    config.zxui_call_flush_interval,
+    config.zxui_call_max_size,
+    spool=Spool("statistics", Statistics),
+    on_write=lambda chunk: StatRollup.add(RollupKind.CALL, chunk),
+)
+
+live_counter.register(RollupKind.CALL, call_writer)
 
 __plugin_meta__ = PluginMetadata(
     name="功能调用统计",
@@ -39,31 +57,41 @@ async def _(
     if not config.zxui_enable_call_history:
         return
     if matcher.plugin:
-        plugin = await PluginInfo.get_plugin(module_path=matcher.plugin.module_name)
-        plugin_type = plugin.plugin_type if plugin else None
-        if plugin_type == PluginType.NORMAL:
-            logger.debug(f"提交调用记录: {matcher.plugin_name}...", session=session)
-            TEMP_LIST.append(
-                Statistics(
-                    user_id=session.user.id,
-                    group_id=session.group.id if session.group else None,
-                    plugin_name=matcher.plugin_name,
-                    create_time=datetime.now(),
-                    bot_id=bot.self_id,
-                )
-            )
+        with metrics.timer("stat.statistics"):
+            if not auth_snapshot.loaded:
+                await auth_snapshot.load()
+            plugin = auth_snapshot.get_plugin(matcher.plugin.module_name)
+            if (
+                plugin
+                and plugin.load_status
+                and plugin.plugin_type == PluginType.NORMAL
+            ):
+                logger.debug(f"提交调用记录: {matcher.plugin_name}...", session=session)
+                if await call_writer.put(
+                    Statistics(
+                        user_id=session.user.id,
+                        group_id=session.group.id if session.group else None,
+                        plugin_name=matcher.plugin_name,
+                        create_time=datetime.now(),
+                        bot_id=bot.self_id,
+                    )
+                ):
+                    live_counter.incr(RollupKind.CALL, bot.self_id)
 
 
 @scheduler.scheduled_job(
     "interval",
-    minutes=1,
+    seconds=1,
 )
 async def _():
-    try:
-        call_list = TEMP_LIST.copy()
-        TEMP_LIST.clear()
-        if call_list:
-            await Statistics.bulk_create(call_list)
-        logger.debug(f"批量添加调用记录 {len(call_list)} 条", "定时任务")
-    except Exception as e:
-        logger.error("定时批量添加调用记录", "定时任务", e=e)
+    await call_writer.tick()
+
+
+@driver.on_startup
+async def _():
+    call_writer.replay()
+
+
+@driver.on_shutdown
+async def _():
+    await call_writer.flush(force=True)
@@ -0,0 +1,266 @@
+import asyncio
+import random
+import time
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
+from strenum import StrEnum
+from zhenxun_db_client import Model
+from zhenxun_utils.log import logger
+
+from .spool import Spool
+
+RETRY_DELAY = 5
+"""首次重试等待秒数，之后每次翻倍"""
+MAX_RETRY_DELAY = 300
+"""最大重试等待秒数"""
+
+
+class OverflowPolicy(StrEnum):
+    """队列已满时的处理策略"""
+
+    DROP = "DROP"
+    """丢弃新数据"""
+    SAMPLE = "SAMPLE"
+    """蓄水池采样，新数据随机替换队列中的数据"""
+    BLOCK = "BLOCK"
+    """等待队列写入后再加入"""
+
+    @classmethod
+    def parse(cls, value: str) -> "OverflowPolicy":
+        """解析配置中的处理策略，无效时使用 DROP
+
+        参数:
+            value: 配置值
+
+        返回:
+            OverflowPolicy: 处理策略
+        """
+        try:
+            return cls(value.upper())
+        except ValueError:
+            logger.warning(
+                f"无效的队列处理策略 {value}，可选值: {', '.join(cls)}，使用 DROP",
+                "BatchWriter",
+            )
+            return cls.DROP
+
+
+class BatchWriter:
+    """
+    批量写入队列
+
+    数据达到 flush_size 条或距上次写入超过 flush_interval 秒时分块写入数据库，
+    写入失败的数据按指数退避重试，队列总量不超过 max_size，超出时按 policy 处理
+
+    设置 spool 时加入队列的数据会先写入本地暂存文件，写入数据库成功后删除，
+    启动时通过 replay 重放，数据至少写入一次，部分写入后崩溃时可能重复；
+    采样替换的数据不写入暂存文件，重放时得到的是被替换前的数据，数量与队列一致
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model: type[Model],
+        flush_size: int,
+        flush_interval: int,
+        max_size: int,
+        policy: OverflowPolicy = OverflowPolicy.DROP,
+        chunk_size: int = 200,
+        max_retry: int = 5,
+        spool: Spool | None = None,
+        on_write: Callable[[list[Model]], Awaitable[None]] | None = None,
+    ):
+        """
+        参数:
+            name: 名称，用于日志
+            model: 写入的模型
+            flush_size: 达到该数量时写入
+            flush_interval: 距上次写入超过该秒数时写入
+            max_size: 队列最大数量，包含等待重试的数据
+            policy: 队列已满时的处理策略
+            chunk_size: 单条插入语句的数据量
+            max_retry: 最大重试次数，超出后丢弃该批数据
+            spool: 本地暂存文件
+            on_write: 每块数据写入成功后调用，用于维护汇总等派生数据
+        """
+        self.name = name
+        self.model = model
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self.policy = policy
+        self.chunk_size = chunk_size
+        self.max_retry = max_retry
+        self.spool = spool
+        self.on_write = on_write
+        self.written = 0
+        """已写入数量"""
+        self.dropped = 0
+        """队列已满时丢弃的数量"""
+        self.failed = 0
+        """超出重试次数丢弃的数量"""
+        self._data: list[Model] = []
+        self._pending: list[Model] = []
+        """写入失败等待重试的数据"""
+        self._arrived = 0
+        """上次写入后到达的数量，用于采样"""
+        self._retry_count = 0
+        self._retry_at = 0.0
+        self._last_flush = time.time()
+        self.lock = asyncio.Lock()
+        """写入锁，持有期间不会写入数据库"""
+        self._space = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._data) + len(self._pending)
+
+    async def put(self, item: Model) -> bool:
+        """加入队列
+
+        参数:
+            item: 数据
+
+        返回:
+            bool: 待写入数量是否增加，丢弃或采样替换时为 False
+        """
+        self._arrived += 1
+        if len(self) >= self.max_size:
+            if self.policy == OverflowPolicy.BLOCK:
+                while len(self) >= self.max_size:
+                    self._space.clear()
+                    self.__trigger()
+                    await self._space.wait()
+            else:
+                self.dropped += 1
+                if self.policy == OverflowPolicy.SAMPLE:
+                    index = random.randrange(self._arrived)
+                    if index < len(self._data):
+                        # 被替换的数据仍在暂存文件中，不再追加以免重放时重复
+                        self._data[index] = item
+                return False
+        self.__spool(item)
+        self._data.append(item)
+        if len(self._data) >= self.flush_size:
+            self.__trigger()
+        return True
+
+    def __spool(self, item: Model):
+        if self.spool:
+            try:
+                self.spool.append(item)
+            except Exception as e:
+                logger.error(f"写入{self.name}暂存文件失败", "BatchWriter", e=e)
+
+    def replay(self):
+        """读取上次运行未写入数据库的暂存数据，在下次写入时一并写入"""
+        if not self.spool:
+            return
+        if item_list := self.spool.load():
+            self._data[:0] = item_list
+            logger.info(f"重放{self.name}暂存数据 {len(item_list)} 条", "BatchWriter")
+
+    def __trigger(self):
+        if not self._task or self._task.done():
+            self._task = asyncio.create_task(self.flush())
+
+    async def tick(self):
+        """定时检测，将暂存数据写入文件，超过写入间隔或到达重试时间时写入数据库"""
+        if self.spool:
+            try:
+                self.spool.flush()
+            except Exception as e:
+                logger.error(f"写入{self.name}暂存文件失败", "BatchWriter", e=e)
+        now = time.time()
+        if (self._pending and now >= self._retry_at) or (
+            self._data and now - self._last_flush >= self.flush_interval
+        ):
+            self.__trigger()
+
+    async def flush(self, force: bool = False):
+        """写入队列中的数据
+
+        参数:
+            force: 是否忽略重试等待时间，关闭时使用
+        """
+        async with self.lock:
+            if self._pending and not force and time.time() < self._retry_at:
+                return
+            files = self.spool.rotate() if self.spool else []
+            batch = self._pending + self._data
+            self._pending = []
+            self._data = []
+            self._arrived = 0
+            self._last_flush = time.time()
+            index = 0
+            try:
+                while index < len(batch):
+                    chunk = batch[index : index + self.chunk_size]
+                    await self.model.bulk_create(chunk)
+                    index += self.chunk_size
+                    await self.__on_write(chunk)
+                    await asyncio.sleep(0)
+            except Exception as e:
+                self.__on_failed(batch[index:], files, e)
+            else:
+                self._retry_count = 0
+                if self.spool:
+                    self.spool.ack(files)
+            self.written += min(index, len(batch))
+            if batch:
+                logger.debug(
+                    f"批量添加{self.name} {min(index, len(batch))} 条", "BatchWriter"
+                )
+            self._space.set()
+
+    async def __on_write(self, chunk: list[Model]):
+        if self.on_write:
+            try:
+                await self.on_write(chunk)
+            except Exception as e:
+                logger.error(f"{self.name}写入后处理失败", "BatchWriter", e=e)
+
+    def __on_failed(self, rest: list[Model], files: list[Path], e: Exception):
+        self._retry_count += 1
+        if self._retry_count > self.max_retry:
+            self.failed += len(rest)
+            self._retry_count = 0
+            if self.spool:
+                self.spool.reject(files)
+            logger.error(
+                f"批量添加{self.name}失败次数过多，丢弃 {len(rest)} 条",
+                "BatchWriter",
+                e=e,
+            )
+            return
+        delay = min(RETRY_DELAY * 2 ** (self._retry_count - 1), MAX_RETRY_DELAY)
+        self._pending = rest
+        self._retry_at = time.time() + delay
+        logger.warning(
+            f"批量添加{self.name}失败，{delay} 秒后重试 {len(rest)} 条",
+            "BatchWriter",
+            e=e,
+        )
+
+    def items(self) -> list[Model]:
+        """队列中未写入数据库的数据，包含等待重试的数据，持有写入锁时与数据库一致
+
+        返回:
+            list[Model]: 数据
+        """
+        return self._pending + self._data
+
+    def stats(self) -> dict[str, int]:
+        """队列统计
+
+        返回:
+            dict[str, int]: 统计数据
+        """
+        return {
+            "size": len(self._data),
+            "pending": len(self._pending),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
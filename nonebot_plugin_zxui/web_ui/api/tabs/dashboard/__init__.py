@@ -1,13 +1,22 @@
+from datetime import datetime
+
 from fastapi import APIRouter
 from fastapi.responses import JSONResponse
 import nonebot
 from nonebot import logger
 from nonebot.config import Config
 
+from .....models.time_series import Dimension, Granularity, SeriesSource
 from ....base_model import BaseResultModel, QueryModel, Result
 from ....utils import authentication
 from .data_source import ApiDataSource
-from .model import AllChatAndCallCount, BotInfo, ChatCallMonthCount, QueryChatCallCount
+from .model import (
+    AllChatAndCallCount,
+    BotInfo,
+    ChatCallMonthCount,
+    QueryChatCallCount,
+    TimeSeriesChart,
+)
 
 router = APIRouter(prefix="/dashboard")
 
@@ -86,6 +95,44 @@ async def _(bot_id: str | None = None) -> Result[ChatCallMonthCount]:
         return Result.fail(f"发生了一点错误捏 {type(e)}: {e}")
 
 
+@router.get(
+    "/get_time_series",
+    dependencies=[authentication()],
+    response_model=Result[TimeSeriesChart],
+    response_class=JSONResponse,
+    description="获取聊天/调用/连接记录的时间序列",
+)
+async def _(
+    source: SeriesSource,
+    granularity: Granularity = Granularity.DAY,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    dimension: Dimension | None = None,
+    bot_id: str | None = None,
+    group_id: str | None = None,
+    plugin_name: str | None = None,
+    limit: int = 10,
+) -> Result[TimeSeriesChart]:
+    try:
+        return Result.ok(
+            await ApiDataSource.get_time_series(
+                source,
+                granularity,
+                start,
+                end,
+                dimension,
+                bot_id,
+                group_id,
+                plugin_name,
+                limit,
+            ),
+            "拿到信息啦!",
+        )
+    except Exception as e:
+        logger.error(f"WebUi {router.prefix}/get_time_series 调用错误 {type(e)}:{e}")
+        return Result.fail(f"发生了一点错误捏 {type(e)}: {e}")
+
+
 @router.post(
     "/get_connect_log",
     dependencies=[authentication()],
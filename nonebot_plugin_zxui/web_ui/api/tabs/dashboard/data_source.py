@@ -1,24 +1,33 @@
+import asyncio
 import time
 from datetime import datetime, timedelta
 
 import nonebot
 from nonebot.adapters import Bot
 from nonebot.drivers import Driver
-from tortoise.expressions import RawSQL
-from tortoise.functions import Count
 from zhenxun_utils.platform import PlatformUtils
 
 from .....models.bot_connect_log import BotConnectLog
-from .....models.chat_history import ChatHistory
-from .....models.statistics import Statistics
+from .....models.stat_rollup import RollupKind, RollupPeriod, StatRollup
+from .....models.time_series import (
+    Dimension,
+    Granularity,
+    SeriesSource,
+    TimeSeries,
+)
+from .....stat.live_counter import live_counter
 from ....base_model import BaseResultModel, QueryModel
-from ..main.data_source import bot_live
+from ....bot_cache import bot_cache, gather_limited
+from ....cache import response_cache
+from ..main.data_source import bot_live, count_rollup_windows, get_count_windows
 from .model import (
     AllChatAndCallCount,
     BotConnectLogInfo,
     BotInfo,
     ChatCallMonthCount,
     QueryChatCallCount,
+    TimeSeriesChart,
+    TimeSeriesItem,
 )
 
 driver: Driver = nonebot.get_driver()
@@ -26,6 +35,14 @@ driver: Driver = nonebot.get_driver()
 
 CONNECT_TIME = 0
 
+granularity2default_range = {
+    Granularity.MINUTE: timedelta(hours=1),
+    Granularity.HOUR: timedelta(days=1),
+    Granularity.DAY: timedelta(days=30),
+    Granularity.WEEK: timedelta(weeks=12),
+}
+"""未指定开始时间时的默认时间范围"""
+
 
 @driver.on_startup
 async def _():
@@ -44,30 +61,26 @@ class ApiDataSource:
         返回:
             BotInfo: Bot信息
         """
-        now = datetime.now()
         platform = PlatformUtils.get_platform(bot) or ""
+        profile, day_call, received_messages = await asyncio.gather(
+            bot_cache.get(bot),
+            live_counter.get(RollupKind.CALL, bot.self_id),
+            live_counter.get(RollupKind.CHAT, bot.self_id),
+        )
         if platform == "qq":
-            login_info = await bot.get_login_info()
-            nickname = login_info["nickname"]
             ava_url = PlatformUtils.get_user_avatar_url(bot.self_id, "qq") or ""
         else:
-            nickname = bot.self_id
             ava_url = ""
         bot_info = BotInfo(
-            self_id=bot.self_id, nickname=nickname, ava_url=ava_url, platform=platform
+            self_id=bot.self_id,
+            nickname=profile.nickname or bot.self_id,
+            ava_url=ava_url,
+            platform=platform,
         )
-        group_list, _ = await PlatformUtils.get_group_list(bot, True)
-        friend_list, _ = await PlatformUtils.get_friend_list(bot)
-        bot_info.group_count = len(group_list)
-        bot_info.friend_count = len(friend_list)
-        bot_info.day_call = await Statistics.filter(
-            create_time__gte=now - timedelta(hours=now.hour, minutes=now.minute),
-            bot_id=bot.self_id,
-        ).count()
-        bot_info.received_messages = await ChatHistory.filter(
-            bot_id=bot_info.self_id,
-            create_time__gte=now - timedelta(hours=now.hour, minutes=now.minute),
-        ).count()
+        bot_info.group_count = profile.group_count
+        bot_info.friend_count = profile.friend_count
+        bot_info.day_call = day_call
+        bot_info.received_messages = received_messages
         bot_info.connect_time = bot_live.get(bot.self_id) or 0
         if bot_info.connect_time:
             connect_date = datetime.fromtimestamp(CONNECT_TIME)
@@ -81,12 +94,12 @@ class ApiDataSource:
         返回:
             list[BotInfo]: Bot列表
         """
-        bot_list: list[BotInfo] = []
-        for _, bot in nonebot.get_bots().items():
-            bot_list.append(await cls.__build_bot_info(bot))
-        return bot_list
+        return await gather_limited(
+            cls.__build_bot_info, list(nonebot.get_bots().values())
+        )
 
     @classmethod
+    @response_cache.cached("dashboard/get_chat_and_call_count", ttl=30, stale=300)
     async def get_chat_and_call_count(cls, bot_id: str | None) -> QueryChatCallCount:
         """获取今日聊天和调用次数
 
@@ -96,29 +109,18 @@ class ApiDataSource:
         返回:
             QueryChatCallCount: 数据内容
         """
-        now = datetime.now()
-        query = ChatHistory
-        if bot_id:
-            query = query.filter(bot_id=bot_id)
-        chat_all_count = await query.annotate().count()
-        chat_day_count = await query.filter(
-            create_time__gte=now - timedelta(hours=now.hour, minutes=now.minute)
-        ).count()
-        query = Statistics
-        if bot_id:
-            query = query.filter(bot_id=bot_id)
-        call_all_count = await query.annotate().count()
-        call_day_count = await query.filter(
-            create_time__gte=now - timedelta(hours=now.hour, minutes=now.minute)
-        ).count()
+        windows = get_count_windows("num")
+        chat = await count_rollup_windows(RollupKind.CHAT, windows, bot_id)
+        call = await count_rollup_windows(RollupKind.CALL, windows, bot_id)
         return QueryChatCallCount(
-            chat_num=chat_all_count,
-            chat_day=chat_day_count,
-            call_num=call_all_count,
-            call_day=call_day_count,
+            chat_num=chat["num"],
+            chat_day=await live_counter.get(RollupKind.CHAT, bot_id),
+            call_num=call["num"],
+            call_day=await live_counter.get(RollupKind.CALL, bot_id),
         )
 
     @classmethod
+    @response_cache.cached("dashboard/get_all_chat_and_call_count", ttl=60, stale=600)
     async def get_all_chat_and_call_count(
         cls, bot_id: str | None
     ) -> AllChatAndCallCount:
@@ -130,45 +132,20 @@ class ApiDataSource:
         返回:
             AllChatAndCallCount: 数据内容
         """
-        now = datetime.now()
-        query = ChatHistory
-        if bot_id:
-            query = query.filter(bot_id=bot_id)
-        chat_week_count = await query.filter(
-            create_time__gte=now - timedelta(days=7, hours=now.hour, minutes=now.minute)
-        ).count()
-        chat_month_count = await query.filter(
-            create_time__gte=now
-            - timedelta(days=30, hours=now.hour, minutes=now.minute)
-        ).count()
-        chat_year_count = await query.filter(
-            create_time__gte=now
-            - timedelta(days=365, hours=now.hour, minutes=now.minute)
-        ).count()
-        query = Statistics
-        if bot_id:
-            query = query.filter(bot_id=bot_id)
-        call_week_count = await query.filter(
-            create_time__gte=now - timedelta(days=7, hours=now.hour, minutes=now.minute)
-        ).count()
-        call_month_count = await query.filter(
-            create_time__gte=now
-            - timedelta(days=30, hours=now.hour, minutes=now.minute)
-        ).count()
-        call_year_count = await query.filter(
-            create_time__gte=now
-            - timedelta(days=365, hours=now.hour, minutes=now.minute)
-        ).count()
+        windows = get_count_windows("week", "month", "year")
+        chat = await count_rollup_windows(RollupKind.CHAT, windows, bot_id)
+        call = await count_rollup_windows(RollupKind.CALL, windows, bot_id)
         return AllChatAndCallCount(
-            chat_week=chat_week_count,
-            chat_month=chat_month_count,
-            chat_year=chat_year_count,
-            call_week=call_week_count,
-            call_month=call_month_count,
-            call_year=call_year_count,
+            chat_week=chat["week"],
+            chat_month=chat["month"],
+            chat_year=chat["year"],
+            call_week=call["week"],
+            call_month=call["month"],
+            call_year=call["year"],
         )
 
     @classmethod
+    @response_cache.cached("dashboard/get_chat_and_call_month", ttl=300, stale=3600)
     async def get_chat_and_call_month(cls, bot_id: str | None) -> ChatCallMonthCount:
         """获取一个月内的调用/消息记录次数，并根据日期对数据填充0
 
@@ -179,46 +156,74 @@ class ApiDataSource:
             ChatCallMonthCount: 数据内容
         """
         now = datetime.now()
-        filter_date = now - timedelta(days=30, hours=now.hour, minutes=now.minute)
-        chat_query = ChatHistory
-        call_query = Statistics
-        if bot_id:
-            chat_query = chat_query.filter(bot_id=bot_id)
-            call_query = call_query.filter(bot_id=bot_id)
-        chat_date_list = (
-            await chat_query.filter(create_time__gte=filter_date)
-            .annotate(date=RawSQL("DATE(create_time)"), count=Count("id"))
-            .group_by("date")
-            .values("date", "count")
+        buckets = TimeSeries.get_buckets(Granularity.DAY, now - timedelta(days=29), now)
+        start = datetime.fromtimestamp(buckets[0])
+        chat_bucket2cnt = await StatRollup.get_bucket_count(
+            RollupKind.CHAT, RollupPeriod.DAY, start, bot_id
         )
-        call_date_list = (
-            await call_query.filter(create_time__gte=filter_date)
-            .annotate(date=RawSQL("DATE(create_time)"), count=Count("id"))
-            .group_by("date")
-            .values("date", "count")
+        call_bucket2cnt = await StatRollup.get_bucket_count(
+            RollupKind.CALL, RollupPeriod.DAY, start, bot_id
         )
-        date_list = []
-        chat_count_list = []
-        call_count_list = []
-        chat_date2cnt = {str(date["date"]): date["count"] for date in chat_date_list}
-        call_date2cnt = {str(date["date"]): date["count"] for date in call_date_list}
-        date = now.date()
-        for _ in range(30):
-            if str(date) in chat_date2cnt:
-                chat_count_list.append(chat_date2cnt[str(date)])
-            else:
-                chat_count_list.append(0)
-            if str(date) in call_date2cnt:
-                call_count_list.append(call_date2cnt[str(date)])
-            else:
-                call_count_list.append(0)
-            date_list.append(str(date)[5:])
-            date -= timedelta(days=1)
-        chat_count_list.reverse()
-        call_count_list.reverse()
-        date_list.reverse()
         return ChatCallMonthCount(
-            chat=chat_count_list, call=call_count_list, date=date_list
+            chat=TimeSeries.fill(chat_bucket2cnt, buckets),
+            call=TimeSeries.fill(call_bucket2cnt, buckets),
+            date=[datetime.fromtimestamp(b).strftime("%m-%d") for b in buckets],
+        )
+
+    @classmethod
+    @response_cache.cached("dashboard/get_time_series", ttl=30, stale=300)
+    async def get_time_series(
+        cls,
+        source: SeriesSource,
+        granularity: Granularity,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        dimension: Dimension | None = None,
+        bot_id: str | None = None,
+        group_id: str | None = None,
+        plugin_name: str | None = None,
+        limit: int = 10,
+    ) -> TimeSeriesChart:
+        """获取时间序列图表数据
+
+        参数:
+            source: 数据来源
+            granularity: 时间粒度
+            start: 开始时间，为空时按粒度取默认范围
+            end: 结束时间，为空时为当前时间
+            dimension: 分组维度
+            bot_id: bot id
+            group_id: 群组id
+            plugin_name: 插件名称
+            limit: 分组时返回的序列数量
+
+        返回:
+            TimeSeriesChart: 数据内容
+        """
+        end = end or datetime.now()
+        start = start or end - granularity2default_range[granularity]
+        filters = {"bot_id": bot_id}
+        if group_id:
+            filters["group_id"] = group_id
+        if plugin_name:
+            filters["plugin_name"] = plugin_name
+        buckets, series = await TimeSeries.query(
+            source, granularity, start, end, dimension, filters, limit
+        )
+        item_list = [
+            TimeSeriesItem(name=name, data=data, total=sum(data))
+            for name, data in series.items()
+        ]
+        item_list.sort(key=lambda item: item.total, reverse=True)
+        date_format = (
+            "%Y-%m-%d"
+            if granularity in (Granularity.DAY, Granularity.WEEK)
+            else "%m-%d %H:%M"
+        )
+        return TimeSeriesChart(
+            bucket=buckets,
+            date=[datetime.fromtimestamp(b).strftime(date_format) for b in buckets],
+            series=item_list,
         )
 
     @classmethod
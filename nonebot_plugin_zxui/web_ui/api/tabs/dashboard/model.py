@@ -80,3 +80,29 @@ class AllChatAndCallCount(BaseModel):
     """一月内调用次数"""
     call_year: int
     """一年内调用次数"""
+
+
+class TimeSeriesItem(BaseModel):
+    """
+    时间序列
+    """
+
+    name: str
+    """分组值，不分组时为 total"""
+    data: list[int]
+    """各时间段数量"""
+    total: int
+    """总数"""
+
+
+class TimeSeriesChart(BaseModel):
+    """
+    时间序列图表
+    """
+
+    bucket: list[int]
+    """各时间段开始时间戳"""
+    date: list[str]
+    """各时间段开始时间"""
+    series: list[TimeSeriesItem]
+    """序列，按总数降序"""
@@ -1,16 +1,26 @@
+from datetime import datetime
+
 from fastapi import APIRouter, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import nonebot
 from nonebot import logger
 from nonebot.drivers import Driver
 from tortoise import Tortoise
 
 from .....config import SQL_TYPE
+from .....models.db_index import IndexManage
 from .....models.plugin_info import PluginInfo
+from .....zxpm.cache import auth_snapshot, ban_registry, limit_table
 from ....base_model import BaseResultModel, QueryModel, Result
 from ....utils import authentication
-from .data_source import ApiDataSource, type2sql
-from .models.model import Column, SqlLogInfo, SqlText
+from .data_source import (
+    EXPORT_MEDIA_TYPE,
+    ApiDataSource,
+    ExportFormat,
+    ExportTable,
+    type2sql,
+)
+from .models.model import Column, IndexInfo, SqlLogInfo, SqlText
 from .models.sql_log import SqlLog
 
 router = APIRouter(prefix="/database")
@@ -65,6 +75,36 @@ async def _(table_name: str) -> Result[list[Column]]:
         return Result.fail(f"发生了一点错误捏 {type(e)}: {e}")
 
 
+@router.get(
+    "/get_index_list",
+    dependencies=[authentication()],
+    response_model=Result[list[IndexInfo]],
+    response_class=JSONResponse,
+    description="获取索引状态",
+)
+async def _() -> Result[list[IndexInfo]]:
+    try:
+        return Result.ok(await ApiDataSource.get_index_list(), "拿到信息啦!")
+    except Exception as e:
+        logger.error(f"WebUi {router.prefix}/get_index_list 调用错误 {type(e)}:{e}")
+        return Result.fail(f"发生了一点错误捏 {type(e)}: {e}")
+
+
+@router.post(
+    "/apply_index",
+    dependencies=[authentication()],
+    response_model=Result[list[str]],
+    response_class=JSONResponse,
+    description="创建缺失的索引",
+)
+async def _() -> Result[list[str]]:
+    try:
+        return Result.ok(await IndexManage.apply(), "创建成功啦!")
+    except Exception as e:
+        logger.error(f"WebUi {router.prefix}/apply_index 调用错误 {type(e)}:{e}")
+        return Result.fail(f"发生了一点错误捏 {type(e)}: {e}")
+
+
 @router.post(
     "/exec_sql",
     dependencies=[authentication()],
@@ -83,6 +123,10 @@ async def _(sql: SqlText, request: Request) -> Result[list[dict]]:
         else:
             result = await PluginInfo.raw(sql.sql)
             await SqlLog.add(ip or "0.0.0.0", sql.sql, str(result))
+            # 直接执行的sql可能修改了权限相关数据
+            await auth_snapshot.load()
+            await ban_registry.load()
+            await limit_table.load()
             return Result.ok(info="执行成功啦!")
     except Exception as e:
         logger.error(f"WebUi {router.prefix}/exec_sql 调用错误 {type(e)}:{e}")
@@ -113,3 +157,31 @@ async def _(query: QueryModel) -> Result[BaseResultModel]:
     except Exception as e:
         logger.error(f"WebUi {router.prefix}/get_sql_log 调用错误 {type(e)}:{e}")
         return Result.fail(f"发生了一点错误捏 {type(e)}: {e}")
+
+
+@router.get(
+    "/export",
+    dependencies=[authentication()],
+    response_class=StreamingResponse,
+    description="流式导出聊天/调用记录",
+)
+async def _(
+    table_name: ExportTable,
+    format: ExportFormat = "ndjson",
+    compress: bool = False,
+    group_id: str | None = None,
+    user_id: str | None = None,
+    bot_id: str | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> StreamingResponse:
+    filename = f"{table_name}_{datetime.now().strftime('%Y%m%d%H%M%S')}.{format}"
+    if compress:
+        filename += ".gz"
+    return StreamingResponse(
+        ApiDataSource.iter_export(
+            table_name, format, compress, group_id, user_id, bot_id, start, end
+        ),
+        media_type="application/gzip" if compress else EXPORT_MEDIA_TYPE[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
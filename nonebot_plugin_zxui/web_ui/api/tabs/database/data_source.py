@@ -1,7 +1,19 @@
+import csv
+import io
+import zlib
+from collections.abc import AsyncIterator
+from datetime import datetime
+from typing import Literal
+
+import ujson as json
 from tortoise import Tortoise
+from zhenxun_db_client import Model
 
 from .....config import SQL_TYPE
-from .models.model import Column
+from .....models.chat_history import ChatHistory
+from .....models.db_index import IndexManage
+from .....models.statistics import Statistics
+from .models.model import Column, IndexInfo
 
 SELECT_TABLE_MYSQL_SQL = """
 SELECT table_name AS name, table_comment AS `desc`
@@ -45,6 +57,21 @@ type2sql_column = {
     "postgres": SELECT_TABLE_COLUMN_PSQL_SQL,
 }
 
+EXPORT_CHUNK_SIZE = 1000
+"""导出时每次读取的记录数量"""
+
+EXPORT_MODEL: dict[str, type[Model]] = {
+    "chat_history": ChatHistory,
+    "statistics": Statistics,
+}
+"""可导出的表"""
+
+ExportTable = Literal["chat_history", "statistics"]
+
+ExportFormat = Literal["ndjson", "csv"]
+
+EXPORT_MEDIA_TYPE = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
 
 class ApiDataSource:
     SQL_DICT = {}  # noqa: RUF012
@@ -86,3 +113,134 @@ class ApiDataSource:
         else:
             result_list.extend(Column(**result) for result in query)
         return result_list
+
+    @classmethod
+    async def get_index_list(cls) -> list[IndexInfo]:
+        """获取索引状态，缺失与未使用的索引排在前面
+
+        返回:
+            list[IndexInfo]: 索引数据
+        """
+        declared = IndexManage.get_declared()
+        tables = await IndexManage.get_tables()
+        exists = await IndexManage.get_indexes()
+        scan = await IndexManage.get_scan_count()
+        result_list = []
+        cover_names = set()
+        for table_name, index_list in declared.items():
+            if table_name not in tables:
+                continue
+            for columns in index_list:
+                table_index = exists.get(table_name, [])
+                if cover := IndexManage.find_cover(columns, table_index):
+                    cover_names.add((table_name, cover.name))
+                    continue
+                result_list.append(
+                    IndexInfo(
+                        table_name=table_name,
+                        name=IndexManage.get_name(table_name, columns),
+                        columns=list(columns),
+                        unique=False,
+                        declared=True,
+                        scan=None,
+                        status="MISSING",
+                    )
+                )
+        for table_name, index_list in exists.items():
+            for index in index_list:
+                count = None if scan is None else scan.get((table_name, index.name))
+                unused = count == 0 and not index.unique
+                result_list.append(
+                    IndexInfo(
+                        table_name=table_name,
+                        name=index.name,
+                        columns=list(index.columns),
+                        unique=index.unique,
+                        declared=(table_name, index.name) in cover_names,
+                        scan=count,
+                        status="UNUSED" if unused else "NORMAL",
+                    )
+                )
+        order = {"MISSING": 0, "UNUSED": 1, "NORMAL": 2}
+        result_list.sort(key=lambda i: (order[i.status], i.table_name, i.name))
+        return result_list
+
+    @classmethod
+    async def iter_export(
+        cls,
+        table_name: ExportTable,
+        format_: ExportFormat,
+        compress: bool = False,
+        group_id: str | None = None,
+        user_id: str | None = None,
+        bot_id: str | None = None,
+        start: datetime | None = None,
+        end: datetime | None = None,
+    ) -> AsyncIterator[bytes]:
+        """按id分块读取并逐块输出导出数据，内存占用与总数据量无关
+
+        参数:
+            table_name: 表名
+            format_: 导出格式
+            compress: 是否gzip压缩
+            group_id: 群组id
+            user_id: 用户id
+            bot_id: bot id
+            start: 开始时间
+            end: 结束时间
+
+        返回:
+            AsyncIterator[bytes]: 导出数据
+        """
+        model = EXPORT_MODEL[table_name]
+        fields = list(model._meta.fields_db_projection)
+        query = model.all()
+        if group_id:
+            query = query.filter(group_id=group_id)
+        if user_id:
+            query = query.filter(user_id=user_id)
+        if bot_id:
+            query = query.filter(bot_id=bot_id)
+        if start:
+            query = query.filter(create_time__gte=start)
+        if end:
+            query = query.filter(create_time__lte=end)
+        compressor = zlib.compressobj(wbits=31) if compress else None
+
+        def encode(text: str) -> bytes:
+            data = text.encode("utf-8")
+            return compressor.compress(data) if compressor else data
+
+        if format_ == "csv":
+            yield encode(cls.__to_csv([fields]))
+        last_id = 0
+        while True:
+            data_list = (
+                await query.filter(id__gt=last_id)
+                .order_by("id")
+                .limit(EXPORT_CHUNK_SIZE)
+                .values(*fields)
+            )
+            if not data_list:
+                break
+            last_id = data_list[-1]["id"]
+            for data in data_list:
+                for key, value in data.items():
+                    if isinstance(value, datetime):
+                        data[key] = value.isoformat()
+            if format_ == "csv":
+                text = cls.__to_csv([list(data.values()) for data in data_list])
+            else:
+                text = "".join(
+                    json.dumps(data, ensure_ascii=False) + "\n" for data in data_list
+                )
+            if chunk := encode(text):
+                yield chunk
+        if compressor:
+            yield compressor.flush()
+
+    @classmethod
+    def __to_csv(cls, rows: list[list]) -> str:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue()
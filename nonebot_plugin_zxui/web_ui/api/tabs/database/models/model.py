@@ -14,6 +14,27 @@ class SqlText(BaseModel):
     sql: str
 
 
+class IndexInfo(BaseModel):
+    """
+    索引
+    """
+
+    table_name: str
+    """表名"""
+    name: str
+    """索引名称，缺失时为将要创建的名称"""
+    columns: list[str]
+    """索引列"""
+    unique: bool
+    """是否唯一索引"""
+    declared: bool
+    """是否为模型声明的索引"""
+    scan: int | None
+    """使用次数，数据库不支持统计时为None"""
+    status: str
+    """状态，NORMAL: 正常，MISSING: 缺失，UNUSED: 未使用"""
+
+
 class Column(BaseModel):
     """
     列
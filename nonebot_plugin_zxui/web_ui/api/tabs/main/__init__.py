@@ -10,10 +10,11 @@ from nonebot.config import Config
 from starlette.websockets import WebSocket, WebSocketDisconnect, WebSocketState
 from websockets.exceptions import ConnectionClosedError, ConnectionClosedOK
 from zhenxun_utils.common_utils import CommonUtils
-from zhenxun_utils.platform import PlatformUtils
 
 from .....models.bot_console import BotConsole
+from .....zxpm.cache import auth_snapshot
 from ....base_model import Result
+from ....bot_cache import bot_cache
 from ....config import QueryDateType
 from ....utils import authentication, get_system_status
 from .data_source import ApiDataSource
@@ -100,10 +101,10 @@ async def _(bot_id: str | None = None) -> Result[QueryCount]:
 )
 async def _(bot_id: str) -> Result[dict[str, int]]:
     try:
-        bot = nonebot.get_bot(bot_id)
+        profile = await bot_cache.get(nonebot.get_bot(bot_id))
         data = {
-            "friend_count": len(await PlatformUtils.get_friend_list(bot)),
-            "group_count": len(await PlatformUtils.get_group_list(bot)),
+            "friend_count": profile.friend_count,
+            "group_count": profile.group_count,
         }
         return Result.ok(data, "拿到信息啦!")
     except (ValueError, KeyError):
@@ -196,6 +197,7 @@ async def _(
 async def _(param: BotStatusParam):
     try:
         await BotConsole.set_bot_status(param.status, param.bot_id)
+        await auth_snapshot.refresh_bots()
         return Result.ok(info="修改bot全局开关成功！")
     except (ValueError, KeyError):
         return Result.fail("Bot未初始化...")
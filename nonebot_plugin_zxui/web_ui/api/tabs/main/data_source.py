@@ -1,22 +1,29 @@
+import asyncio
 from datetime import datetime, timedelta
 from pathlib import Path
 import time
+from typing import Any
 
 import nonebot
-from nonebot import logger
 from nonebot.adapters import Bot
 from nonebot.drivers import Driver
 from tortoise.functions import Count
+from zhenxun_db_client import Model
 from zhenxun_utils.common_utils import CommonUtils
 from zhenxun_utils.enum import PluginType
-from zhenxun_utils.platform import PlatformUtils
 
 from .....models.bot_connect_log import BotConnectLog
 from .....models.bot_console import BotConsole
 from .....models.chat_history import ChatHistory
+from .....models.db_utils import fetch_sql, to_db_value
 from .....models.group_console import GroupConsole
 from .....models.plugin_info import PluginInfo
+from .....models.stat_rollup import RollupKind, RollupPeriod, StatRollup
 from .....models.statistics import Statistics
+from .....stat.live_counter import live_counter
+from .....zxpm.cache import auth_snapshot
+from ....bot_cache import bot_cache, gather_limited
+from ....cache import response_cache
 from ....config import AVA_URL, GROUP_AVA_URL, QueryDateType
 from .model import (
     ActiveGroup,
@@ -48,6 +55,99 @@ class BotLive:
 bot_live = BotLive()
 
 
+async def count_windows(
+    model: type[Model],
+    column: str,
+    windows: dict[str, Any],
+    filters: dict[str, Any] | None = None,
+    sum_column: str | None = None,
+) -> dict[str, int]:
+    """单次扫描统计多个时间窗口内的数量
+
+    全部窗口以 SUM(CASE WHEN column >= ? ...) 在同一条查询中计算
+
+    参数:
+        model: 模型
+        column: 比较的字段，一般为时间字段
+        windows: 窗口名称与开始值，开始值为None时表示全部
+        filters: 等值过滤条件，值为None时忽略该条件
+        sum_column: 累加的字段，为空时统计行数
+
+    返回:
+        dict[str, int]: 窗口名称与数量
+    """
+    projection = model._meta.fields_db_projection
+    value = projection[sum_column] if sum_column else "1"
+    select_list = []
+    values = []
+    for i, start in enumerate(windows.values()):
+        if start is None:
+            select_list.append(f"SUM({value}) AS w{i}")
+        else:
+            select_list.append(
+                f"SUM(CASE WHEN {projection[column]} >= ? THEN {value} ELSE 0 END)"
+                f" AS w{i}"
+            )
+            values.append(to_db_value(model, column, start))
+    where_list = []
+    for key, v in (filters or {}).items():
+        if v is not None:
+            where_list.append(f"{projection[key]} = ?")
+            values.append(to_db_value(model, key, v))
+    sql = f"SELECT {', '.join(select_list)} FROM {model._meta.db_table}"
+    if where_list:
+        sql += f" WHERE {' AND '.join(where_list)}"
+    data_list = await fetch_sql(sql, values)
+    data = data_list[0] if data_list else {}
+    return {name: int(data.get(f"w{i}") or 0) for i, name in enumerate(windows)}
+
+
+async def count_rollup_windows(
+    kind: RollupKind, windows: dict[str, datetime | None], bot_id: str | None
+) -> dict[str, int]:
+    """通过按天汇总数据统计多个时间窗口内的数量
+
+    参数:
+        kind: 数据来源
+        windows: 窗口名称与开始时间，开始时间为None时表示全部
+        bot_id: bot id，为空时为全部
+
+    返回:
+        dict[str, int]: 窗口名称与数量
+    """
+    return await count_windows(
+        StatRollup,
+        "bucket",
+        {
+            name: StatRollup.bucket_of(RollupPeriod.DAY, start) if start else None
+            for name, start in windows.items()
+        },
+        {"kind": kind, "period": RollupPeriod.DAY, "bot_id": bot_id},
+        "count",
+    )
+
+
+def get_count_windows(*names: str) -> dict[str, datetime | None]:
+    """获取统计窗口的开始时间，均从当日零点起算
+
+    参数:
+        names: 窗口名称，可选 num/day/week/month/year
+
+    返回:
+        dict[str, datetime | None]: 窗口名称与开始时间
+    """
+    now = datetime.now()
+    today = now - timedelta(hours=now.hour, minutes=now.minute)
+    windows = {
+        "num": None,
+        "day": today,
+        "week": today - timedelta(days=7),
+        "month": today - timedelta(days=30),
+        "year": today - timedelta(days=365),
+    }
+    return {name: windows[name] for name in names}
+
+
 @driver.on_bot_connect
 async def _(bot: Bot):
     bot_live.add(bot.self_id)
@@ -69,15 +169,11 @@ class ApiDataSource:
         返回:
             TemplateBaseInfo: bot信息
         """
-        login_info = None
-        try:
-            login_info = await bot.get_login_info()
-        except Exception as e:
-            logger.warning("调用接口get_login_info失败", "WebUi", e=e)
+        profile = await bot_cache.get(bot)
         return TemplateBaseInfo(
             bot=bot,
             self_id=bot.self_id,
-            nickname=login_info["nickname"] if login_info else bot.self_id,
+            nickname=profile.nickname or bot.self_id,
             ava_url=AVA_URL.format(bot.self_id),
         )
 
@@ -101,32 +197,30 @@ class ApiDataSource:
         参数:
             select_bot: bot
         """
-        now = datetime.now()
-        # 今日累计接收消息
-        select_bot.received_messages = await ChatHistory.filter(
-            bot_id=select_bot.self_id,
-            create_time__gte=now - timedelta(hours=now.hour),
-        ).count()
+        (
+            profile,
+            select_bot.received_messages,
+            select_bot.status,
+            select_bot.day_call,
+            select_bot.connect_count,
+        ) = await asyncio.gather(
+            bot_cache.get(select_bot.bot),
+            # 今日累计接收消息
+            live_counter.get(RollupKind.CHAT, select_bot.self_id),
+            BotConsole.get_bot_status(select_bot.self_id),
+            live_counter.get(RollupKind.CALL),
+            BotConnectLog.filter(bot_id=select_bot.self_id).count(),
+        )
         # 群聊数量
-        select_bot.group_count = len(await PlatformUtils.get_group_list(select_bot.bot))
+        select_bot.group_count = profile.group_count
         # 好友数量
-        select_bot.friend_count = len(
-            await PlatformUtils.get_friend_list(select_bot.bot)
-        )
-        select_bot.status = await BotConsole.get_bot_status(select_bot.self_id)
+        select_bot.friend_count = profile.friend_count
         # 连接时间
         select_bot.connect_time = bot_live.get(select_bot.self_id) or 0
         if select_bot.connect_time:
             connect_date = datetime.fromtimestamp(select_bot.connect_time)
             select_bot.connect_date = connect_date.strftime("%Y-%m-%d %H:%M:%S")
         select_bot.version = cls.__get_bot_version()
-        day_call = await Statistics.filter(
-            create_time__gte=now - timedelta(hours=now.hour)
-        ).count()
-        select_bot.day_call = day_call
-        select_bot.connect_count = await BotConnectLog.filter(
-            bot_id=select_bot.self_id
-        ).count()
 
     @classmethod
     async def get_base_info(cls, bot_id: str | None) -> list[BaseInfo] | None:
@@ -142,7 +236,7 @@ class ApiDataSource:
         if not bots:
             return None
         select_bot: BaseInfo
-        bot_list = [await cls.__build_bot_info(bot) for _, bot in bots.items()]
+        bot_list = await gather_limited(cls.__build_bot_info, list(bots.values()))
         # 获取指定qq号的bot信息，若无指定   则获取第一个
         if _bl := [b for b in bot_list if b.self_id == bot_id]:
             select_bot = _bl[0]
@@ -164,31 +258,12 @@ class ApiDataSource:
         返回:
             QueryCount: 数据内容
         """
-        now = datetime.now()
-        query = ChatHistory
-        if bot_id:
-            query = query.filter(bot_id=bot_id)
-        all_count = await query.annotate().count()
-        day_count = await query.filter(
-            create_time__gte=now - timedelta(hours=now.hour, minutes=now.minute)
-        ).count()
-        week_count = await query.filter(
-            create_time__gte=now - timedelta(days=7, hours=now.hour, minutes=now.minute)
-        ).count()
-        month_count = await query.filter(
-            create_time__gte=now
-            - timedelta(days=30, hours=now.hour, minutes=now.minute)
-        ).count()
-        year_count = await query.filter(
-            create_time__gte=now
-            - timedelta(days=365, hours=now.hour, minutes=now.minute)
-        ).count()
         return QueryCount(
-            num=all_count,
-            day=day_count,
-            week=week_count,
-            month=month_count,
-            year=year_count,
+            **await count_rollup_windows(
+                RollupKind.CHAT,
+                get_count_windows("num", "day", "week", "month", "year"),
+                bot_id,
+            )
         )
 
     @classmethod
@@ -201,31 +276,12 @@ class ApiDataSource:
         返回:
             QueryCount: 数据内容
         """
-        now = datetime.now()
-        query = Statistics
-        if bot_id:
-            query = query.filter(bot_id=bot_id)
-        all_count = await query.annotate().count()
-        day_count = await query.filter(
-            create_time__gte=now - timedelta(hours=now.hour, minutes=now.minute)
-        ).count()
-        week_count = await query.filter(
-            create_time__gte=now - timedelta(days=7, hours=now.hour, minutes=now.minute)
-        ).count()
-        month_count = await query.filter(
-            create_time__gte=now
-            - timedelta(days=30, hours=now.hour, minutes=now.minute)
-        ).count()
-        year_count = await query.filter(
-            create_time__gte=now
-            - timedelta(days=365, hours=now.hour, minutes=now.minute)
-        ).count()
         return QueryCount(
-            num=all_count,
-            day=day_count,
-            week=week_count,
-            month=month_count,
-            year=year_count,
+            **await count_rollup_windows(
+                RollupKind.CALL,
+                get_count_windows("num", "day", "week", "month", "year"),
+                bot_id,
+            )
         )
 
     @classmethod
@@ -256,6 +312,7 @@ class ApiDataSource:
         return query
 
     @classmethod
+    @response_cache.cached("main/get_active_group", ttl=60, stale=600)
     async def get_active_group(
         cls, date_type: QueryDateType | None = None, bot_id: str | None = None
     ) -> list[ActiveGroup]:
@@ -301,6 +358,7 @@ class ApiDataSource:
         return active_group_list
 
     @classmethod
+    @response_cache.cached("main/get_hot_plugin", ttl=60, stale=600)
     async def get_hot_plugin(
         cls, date_type: QueryDateType | None = None, bot_id: str | None = None
     ) -> list[HotPlugin]:
@@ -322,12 +380,9 @@ class ApiDataSource:
             .values_list("plugin_name", "count")
         )
         hot_plugin_list = []
-        module_list = [x[0] for x in data_list]
-        plugins = await PluginInfo.filter(module__in=module_list).all()
-        module2name = {p.module: p.name for p in plugins}
         for data in data_list:
             module = data[0]
-            name = module2name.get(module) or module
+            name = auth_snapshot.get_plugin_name(module)
             hot_plugin_list.append(HotPlugin(module=module, name=name, count=data[1]))
         hot_plugin_list = sorted(hot_plugin_list, key=lambda x: x.count, reverse=True)
         if len(hot_plugin_list) > 5:
@@ -6,9 +6,11 @@ from zhenxun_utils.enum import RequestHandleType, RequestType
 from zhenxun_utils.exception import NotFoundError
 from zhenxun_utils.platform import PlatformUtils
 
+from .....models.chat_search import chat_search
 from .....models.fg_request import FgRequest
 from .....models.group_console import GroupConsole
 from ....base_model import Result
+from ....bot_cache import bot_cache
 from ....config import AVA_URL, GROUP_AVA_URL
 from ....utils import authentication
 from .data_source import ApiDataSource
@@ -21,6 +23,9 @@ from .model import (
     HandleRequest,
     LeaveGroup,
     ReqResult,
+    SearchMessage,
+    SearchMessageParam,
+    SearchMessageResult,
     SendMessageParam,
     UpdateGroup,
     UserDetail,
@@ -42,9 +47,8 @@ async def _(bot_id: str) -> Result:
     """
     group_list_result = []
     try:
-        bot = nonebot.get_bot(bot_id)
-        group_list, _ = await PlatformUtils.get_group_list(bot)
-        for g in group_list:
+        profile = await bot_cache.get(nonebot.get_bot(bot_id))
+        for g in profile.group_list:
             ava_url = GROUP_AVA_URL.format(g.group_id, g.group_id)
             group_list_result.append(
                 GroupResult(
@@ -87,10 +91,9 @@ async def _(bot_id: str) -> Result[list[Friend]]:
     获取群信息
     """
     try:
-        bot = nonebot.get_bot(bot_id)
-        friend_list, _ = await PlatformUtils.get_friend_list(bot)
+        profile = await bot_cache.get(nonebot.get_bot(bot_id))
         result_list = []
-        for f in friend_list:
+        for f in profile.friend_list:
             ava_url = AVA_URL.format(f.user_id)
             result_list.append(
                 Friend(user_id=f.user_id, nickname=f.name or "", ava_url=ava_url)
@@ -244,10 +247,11 @@ async def _(param: LeaveGroup) -> Result:
         platform = PlatformUtils.get_platform(bot)
         if platform != "qq":
             return Result.warning_("该平台不支持退群操作...")
-        group_list, _ = await PlatformUtils.get_group_list(bot)
-        if param.group_id not in [g.group_id for g in group_list]:
+        if not await bot_cache.find_group(bot, param.group_id):
             return Result.warning_("Bot未在该群聊中...")
         await bot.set_group_leave(group_id=param.group_id)
+        if profile := bot_cache.get_cached(bot.self_id):
+            profile.remove_group(param.group_id)
         return Result.ok(info="成功处理了请求!")
     except (ValueError, KeyError):
         return Result.warning_("指定Bot未连接...")
@@ -269,10 +273,11 @@ async def _(param: DeleteFriend) -> Result:
         platform = PlatformUtils.get_platform(bot)
         if platform != "qq":
             return Result.warning_("该平台不支持删除好友操作...")
-        friend_list, _ = await PlatformUtils.get_friend_list(bot)
-        if param.user_id not in [f.user_id for f in friend_list]:
+        if not await bot_cache.find_friend(bot, param.user_id):
             return Result.warning_("Bot未有其好友...")
         await bot.delete_friend(user_id=param.user_id)
+        if profile := bot_cache.get_cached(bot.self_id):
+            profile.remove_friend(param.user_id)
         return Result.ok(info="成功处理了请求!")
     except (ValueError, KeyError):
         return Result.warning_("指定Bot未连接...")
@@ -337,3 +342,44 @@ async def _(param: SendMessageParam) -> Result:
     except Exception as e:
         logger.error(f"WebUi {router.prefix}/send_message 调用错误 {type(e)}:{e}")
         return Result.fail(f"发生了一点错误捏 {type(e)}: {e}")
+
+
+@router.post(
+    "/search_messages",
+    dependencies=[authentication()],
+    response_model=Result[SearchMessageResult],
+    response_class=JSONResponse,
+    description="搜索消息",
+)
+async def _(param: SearchMessageParam) -> Result[SearchMessageResult]:
+    if not param.keyword.strip():
+        return Result.warning_("关键词不能为空...")
+    try:
+        message_list, next_cursor = await chat_search.search(
+            param.keyword.strip(),
+            param.group_id,
+            param.user_id,
+            param.bot_id,
+            param.start,
+            param.end,
+            param.cursor,
+            min(max(param.size, 1), 100),
+        )
+        result = SearchMessageResult(
+            data=[
+                SearchMessage(
+                    id=m.id,
+                    user_id=m.user_id,
+                    group_id=m.group_id,
+                    bot_id=m.bot_id,
+                    plain_text=m.plain_text,
+                    create_time=m.create_time,
+                )
+                for m in message_list
+            ],
+            next_cursor=next_cursor,
+        )
+        return Result.ok(result, "拿到信息啦!")
+    except Exception as e:
+        logger.error(f"WebUi {router.prefix}/search_messages 调用错误 {type(e)}:{e}")
+        return Result.fail(f"发生了一点错误捏 {type(e)}: {e}")
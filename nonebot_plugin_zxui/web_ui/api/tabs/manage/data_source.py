@@ -2,14 +2,13 @@ import nonebot
 from tortoise.functions import Count
 from zhenxun_utils.common_utils import CommonUtils
 from zhenxun_utils.enum import RequestType
-from zhenxun_utils.platform import PlatformUtils
 
-from .....models.ban_console import BanConsole
 from .....models.chat_history import ChatHistory
 from .....models.fg_request import FgRequest
 from .....models.group_console import GroupConsole
-from .....models.plugin_info import PluginInfo
 from .....models.statistics import Statistics
+from .....zxpm.cache import auth_snapshot, ban_registry
+from ....bot_cache import bot_cache
 from ....config import AVA_URL, GROUP_AVA_URL
 from .model import (
     FriendRequestResult,
@@ -96,10 +95,8 @@ class ApiDataSource:
         返回:
             UserDetail | None: 详情数据
         """
-        bot = nonebot.get_bot(bot_id)
-        friend_list, _ = await PlatformUtils.get_friend_list(bot)
-        fd = [x for x in friend_list if x.user_id == user_id]
-        if not fd:
+        user = await bot_cache.find_friend(nonebot.get_bot(bot_id), user_id)
+        if not user:
             return None
         like_plugin_list = (
             await Statistics.filter(user_id=user_id)
@@ -110,19 +107,14 @@ class ApiDataSource:
             .values_list("plugin_name", "count")
         )
         like_plugin = {}
-        module_list = [x[0] for x in like_plugin_list]
-        plugins = await PluginInfo.filter(module__in=module_list).all()
-        module2name = {p.module: p.name for p in plugins}
         for data in like_plugin_list:
-            name = module2name.get(data[0]) or data[0]
-            like_plugin[name] = data[1]
-        user = fd[0]
+            like_plugin[auth_snapshot.get_plugin_name(data[0])] = data[1]
         return UserDetail(
             user_id=user_id,
             ava_url=AVA_URL.format(user_id),
             nickname=user.name or "",
             remark="",
-            is_ban=await BanConsole.is_ban(user_id),
+            is_ban=ban_registry.is_ban(user_id),
             chat_count=await ChatHistory.filter(user_id=user_id).count(),
             call_count=await Statistics.filter(user_id=user_id).count(),
             like_plugin=like_plugin,
@@ -147,11 +139,8 @@ class ApiDataSource:
             .values_list("plugin_name", "count")
         )
         like_plugin = {}
-        plugins = await PluginInfo.get_plugins()
-        module2name = {p.module: p.name for p in plugins}
         for data in like_plugin_list:
-            name = module2name.get(data[0]) or data[0]
-            like_plugin[name] = data[1]
+            like_plugin[auth_snapshot.get_plugin_name(data[0])] = data[1]
         return like_plugin
 
     @classmethod
@@ -167,8 +156,6 @@ class ApiDataSource:
             list[Plugin]: 禁用插件数据列表
         """
         disable_plugins: list[Plugin] = []
-        plugins = await PluginInfo.get_plugins()
-        module2name = {p.module: p.name for p in plugins}
         if group.block_plugin:
             for module in CommonUtils.convert_module_format(group.block_plugin):
                 if module:
@@ -177,7 +164,7 @@ class ApiDataSource:
                         plugin_name=module,
                         is_super_block=False,
                     )
-                    plugin.plugin_name = module2name.get(module) or module
+                    plugin.plugin_name = auth_snapshot.get_plugin_name(module)
                     disable_plugins.append(plugin)
         exists_modules = [p.module for p in disable_plugins]
         if group.superuser_block_plugin:
@@ -190,7 +177,7 @@ class ApiDataSource:
                         plugin_name=module,
                         is_super_block=True,
                     )
-                    plugin.plugin_name = module2name.get(module) or module
+                    plugin.plugin_name = auth_snapshot.get_plugin_name(module)
                     disable_plugins.append(plugin)
         return disable_plugins
 
@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from pydantic import BaseModel
 from zhenxun_utils.enum import RequestType
 
@@ -269,3 +271,56 @@ class SendMessageParam(BaseModel):
     """群组id"""
     message: str
     """消息"""
+
+
+class SearchMessageParam(BaseModel):
+    """
+    搜索消息
+    """
+
+    keyword: str
+    """关键词"""
+    group_id: str | None = None
+    """群组id"""
+    user_id: str | None = None
+    """用户id"""
+    bot_id: str | None = None
+    """bot id"""
+    start: datetime | None = None
+    """开始时间"""
+    end: datetime | None = None
+    """结束时间"""
+    cursor: int | None = None
+    """游标，首页为空，之后为上一页返回的next_cursor"""
+    size: int = 20
+    """每页数量"""
+
+
+class SearchMessage(BaseModel):
+    """
+    搜索到的消息
+    """
+
+    id: int
+    """记录id"""
+    user_id: str
+    """用户id"""
+    group_id: str | None = None
+    """群组id"""
+    bot_id: str | None = None
+    """bot id"""
+    plain_text: str | None = None
+    """纯文本"""
+    create_time: datetime
+    """发送时间"""
+
+
+class SearchMessageResult(BaseModel):
+    """
+    搜索消息结果
+    """
+
+    data: list[SearchMessage]
+    """消息"""
+    next_cursor: int | None = None
+    """下一页游标，为空时没有更多"""
@@ -7,9 +7,12 @@ from fastapi import APIRouter
 from fastapi.responses import JSONResponse
 from zhenxun_utils._build_image import BuildImage
 
+from .....zxpm.cache import ban_registry, event_memo, limit_table
+from .....zxpm.metrics import metrics
 from ....base_model import Result, SystemFolderSize
+from ....cache import response_cache
 from ....utils import authentication, get_system_disk
-from .model import AddFile, DeleteFile, DirFile, RenameFile, SaveFile
+from .model import AddFile, DeleteFile, DirFile, HookMetrics, RenameFile, SaveFile
 
 router = APIRouter(prefix="/system")
 
@@ -214,3 +217,38 @@ async def _(full_path: str) -> Result[str]:
         return Result.ok(BuildImage.open(path).pic2bs4())
     except Exception as e:
         return Result.warning_(f"获取图片失败: {e!s}")
+
+
+@router.get(
+    "/get_hook_metrics",
+    dependencies=[authentication()],
+    response_model=Result[HookMetrics],
+    response_class=JSONResponse,
+    description="获取权限检测等钩子的耗时统计",
+)
+async def _() -> Result[HookMetrics]:
+    return Result.ok(
+        HookMetrics(
+            start_time=metrics.start_time,
+            stages=metrics.stats(),
+            event_memo=event_memo.stats(),
+            ban_count=len(ban_registry),
+            limit_version=limit_table.version,
+            limiters=limit_table.stats(),
+            response_cache=response_cache.stats(),
+        ),
+        "拿到信息啦!",
+    )
+
+
+@router.post(
+    "/reset_hook_metrics",
+    dependencies=[authentication()],
+    response_model=Result,
+    response_class=JSONResponse,
+    description="清空钩子耗时统计",
+)
+async def _() -> Result:
+    metrics.reset()
+    response_cache.reset()
+    return Result.ok(info="已清空统计数据!")
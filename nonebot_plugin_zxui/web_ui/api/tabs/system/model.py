@@ -1,5 +1,7 @@
 from pydantic import BaseModel
 
+from .....zxpm.metrics import StageStats
+
 
 class DirFile(BaseModel):
     """
@@ -58,3 +60,24 @@ class SaveFile(BaseModel):
     """全路径"""
     content: str
     """内容"""
+
+
+class HookMetrics(BaseModel):
+    """
+    钩子耗时统计
+    """
+
+    start_time: float
+    """开始统计的时间戳"""
+    stages: list[StageStats]
+    """各阶段统计"""
+    event_memo: dict[str, int]
+    """事件内检测缓存统计"""
+    ban_count: int
+    """封禁名单缓存数量"""
+    limit_version: int
+    """插件限制表版本"""
+    limiters: dict[str, dict[str, dict[str, int]]]
+    """各插件限制器的存储统计，包含当前数量与已清理的过期数量"""
+    response_cache: dict[str, dict[str, int]]
+    """接口缓存命中统计"""
@@ -0,0 +1,315 @@
+import asyncio
+import contextlib
+import time
+from collections.abc import Awaitable, Callable, Iterable
+from typing import TypeVar
+
+import nonebot
+from nonebot import on_notice
+from nonebot.adapters import Bot
+from nonebot_plugin_apscheduler import scheduler
+from zhenxun_utils.log import logger
+from zhenxun_utils.platform import GroupData, PlatformUtils, UserData
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+CALL_TIMEOUT = 5
+"""单次适配器接口调用超时秒数"""
+MAX_CONCURRENCY = 4
+"""同时获取bot信息的最大数量"""
+REFRESH_INTERVAL = 300
+"""定时刷新间隔秒数"""
+MISS_REFRESH_INTERVAL = 60
+"""查询不到好友/群组时，距上次刷新超过该秒数则刷新后再查询"""
+
+driver = nonebot.get_driver()
+
+
+async def gather_limited(
+    func: Callable[[T], Awaitable[R]],
+    items: Iterable[T],
+    limit: int = MAX_CONCURRENCY,
+) -> list[R]:
+    """并发执行，同时执行的数量不超过 limit，结果顺序与 items 一致
+
+    参数:
+        func: 执行方法
+        items: 参数
+        limit: 最大并发数量
+
+    返回:
+        list[R]: 结果
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(item: T) -> R:
+        async with semaphore:
+            return await func(item)
+
+    return list(await asyncio.gather(*(run(item) for item in items)))
+
+
+class BotProfile:
+    """
+    bot的登录信息与好友/群组通讯录
+
+    好友以用户id、群组以 (群组id, 频道id) 为key，查询与计数为 O(1)
+    """
+
+    def __init__(self, bot_id: str):
+        self.bot_id = bot_id
+        self.nickname: str | None = None
+        """昵称，获取失败时为None"""
+        self.groups: dict[tuple[str, str | None], GroupData] = {}
+        """群组，包含频道"""
+        self.friends: dict[str, UserData] = {}
+        """好友"""
+        self.update_time = 0.0
+        """上次刷新时间"""
+
+    @property
+    def group_list(self) -> list[GroupData]:
+        """群组列表，包含频道"""
+        return list(self.groups.values())
+
+    @property
+    def friend_list(self) -> list[UserData]:
+        """好友列表"""
+        return list(self.friends.values())
+
+    @property
+    def group_count(self) -> int:
+        """群组数量，不包含频道"""
+        return sum(not channel_id for _, channel_id in self.groups)
+
+    @property
+    def friend_count(self) -> int:
+        """好友数量"""
+        return len(self.friends)
+
+    def set_groups(self, group_list: list[GroupData]):
+        self.groups = {(g.group_id, g.channel_id): g for g in group_list}
+
+    def set_friends(self, friend_list: list[UserData]):
+        self.friends = {f.user_id: f for f in friend_list}
+
+    def get_group(self, group_id: str) -> GroupData | None:
+        """获取群组
+
+        参数:
+            group_id: 群组id
+
+        返回:
+            GroupData | None: 群组，不在群组中时为None
+        """
+        return self.groups.get((group_id, None))
+
+    def get_friend(self, user_id: str) -> UserData | None:
+        """获取好友
+
+        参数:
+            user_id: 用户id
+
+        返回:
+            UserData | None: 好友，不是好友时为None
+        """
+        return self.friends.get(user_id)
+
+    def remove_group(self, group_id: str):
+        """移除群组及其频道
+
+        参数:
+            group_id: 群组id
+        """
+        self.groups = {k: v for k, v in self.groups.items() if k[0] != group_id}
+
+    def remove_friend(self, user_id: str):
+        """移除好友
+
+        参数:
+            user_id: 用户id
+        """
+        self.friends.pop(user_id, None)
+
+
+class BotCache:
+    """
+    bot信息与通讯录缓存
+
+    连接时、定时与收到 进群/退群/添加好友 通知时刷新，
+    每个适配器接口调用单独超时，失败时保留上次的数据
+    """
+
+    def __init__(self):
+        self._data: dict[str, BotProfile] = {}
+        self._running: dict[str, asyncio.Task] = {}
+        self._background: set[asyncio.Task] = set()
+        """后台刷新任务，保留引用避免被回收"""
+
+    async def __call(self, bot: Bot, name: str, coro: Awaitable[T]) -> T | None:
+        try:
+            return await asyncio.wait_for(coro, CALL_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Bot: {bot.self_id} 获取{name}失败", "WebUi", e=e)
+            return None
+
+    async def __refresh(self, bot: Bot) -> BotProfile:
+        profile = self._data.get(bot.self_id) or BotProfile(bot.self_id)
+        platform = PlatformUtils.get_platform(bot)
+        login_info, group_result, friend_result = await asyncio.gather(
+            self.__call(bot, "登录信息", bot.get_login_info())
+            if platform == "qq"
+            else asyncio.sleep(0),
+            self.__call(bot, "群组列表", PlatformUtils.get_group_list(bot)),
+            self.__call(bot, "好友列表", PlatformUtils.get_friend_list(bot)),
+        )
+        if login_info:
+            profile.nickname = login_info["nickname"]
+        if group_result:
+            profile.set_groups(group_result[0])
+        if friend_result:
+            profile.set_friends(friend_result[0])
+        profile.update_time = time.time()
+        self._data[bot.self_id] = profile
+        return profile
+
+    async def refresh(self, bot: Bot) -> BotProfile:
+        """刷新bot信息，同一bot同时只刷新一次
+
+        参数:
+            bot: Bot
+
+        返回:
+            BotProfile: bot信息
+        """
+        if not (task := self._running.get(bot.self_id)):
+            task = self._running[bot.self_id] = asyncio.create_task(self.__refresh(bot))
+            task.add_done_callback(lambda _: self._running.pop(bot.self_id, None))
+        return await asyncio.shield(task)
+
+    def refresh_later(self, bot: Bot):
+        """在后台刷新bot信息，不等待结果
+
+        参数:
+            bot: Bot
+        """
+        task = asyncio.create_task(self.refresh(bot))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def get(self, bot: Bot) -> BotProfile:
+        """获取bot信息，不存在时刷新
+
+        参数:
+            bot: Bot
+
+        返回:
+            BotProfile: bot信息
+        """
+        if profile := self._data.get(bot.self_id):
+            return profile
+        return await self.refresh(bot)
+
+    async def find_group(self, bot: Bot, group_id: str) -> GroupData | None:
+        """查询bot所在的群组
+
+        参数:
+            bot: Bot
+            group_id: 群组id
+
+        返回:
+            GroupData | None: 群组，不在群组中时为None
+        """
+        profile = await self.get(bot)
+        group = profile.get_group(group_id)
+        if not group and time.time() - profile.update_time > MISS_REFRESH_INTERVAL:
+            group = (await self.refresh(bot)).get_group(group_id)
+        return group
+
+    async def find_friend(self, bot: Bot, user_id: str) -> UserData | None:
+        """查询bot的好友
+
+        参数:
+            bot: Bot
+            user_id: 用户id
+
+        返回:
+            UserData | None: 好友，不是好友时为None
+        """
+        profile = await self.get(bot)
+        friend = profile.get_friend(user_id)
+        if not friend and time.time() - profile.update_time > MISS_REFRESH_INTERVAL:
+            friend = (await self.refresh(bot)).get_friend(user_id)
+        return friend
+
+    def get_cached(self, bot_id: str) -> BotProfile | None:
+        """获取已缓存的bot信息，不刷新
+
+        参数:
+            bot_id: bot id
+
+        返回:
+            BotProfile | None: bot信息
+        """
+        return self._data.get(bot_id)
+
+    async def refresh_all(self):
+        """刷新全部已连接的bot"""
+        await gather_limited(self.refresh, list(nonebot.get_bots().values()))
+
+    def remove(self, bot_id: str):
+        """移除bot信息
+
+        参数:
+            bot_id: bot id
+        """
+        self._data.pop(bot_id, None)
+
+
+bot_cache = BotCache()
+
+
+@driver.on_bot_connect
+async def _(bot: Bot):
+    bot_cache.refresh_later(bot)
+
+
+@driver.on_bot_disconnect
+async def _(bot: Bot):
+    bot_cache.remove(bot.self_id)
+
+
+@scheduler.scheduled_job(
+    "interval",
+    seconds=REFRESH_INTERVAL,
+)
+async def _():
+    await bot_cache.refresh_all()
+
+
+with contextlib.suppress(ImportError):
+    from nonebot.adapters.onebot.v11 import (
+        FriendAddNoticeEvent,
+        GroupDecreaseNoticeEvent,
+        GroupIncreaseNoticeEvent,
+    )
+
+    _notice = on_notice(priority=1, block=False)
+
+    @_notice.handle()
+    async def _(
+        bot: Bot,
+        event: GroupIncreaseNoticeEvent
+        | GroupDecreaseNoticeEvent
+        | FriendAddNoticeEvent,
+    ):
+        if isinstance(event, FriendAddNoticeEvent):
+            """好友名称需从适配器获取"""
+            bot_cache.refresh_later(bot)
+        elif str(event.user_id) != bot.self_id:
+            return
+        elif isinstance(event, GroupIncreaseNoticeEvent):
+            bot_cache.refresh_later(bot)
+        elif profile := bot_cache.get_cached(bot.self_id):
+            profile.remove_group(str(event.group_id))
@@ -0,0 +1,163 @@
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from functools import wraps
+from typing import Any, ParamSpec, TypeVar
+
+from nonebot import logger
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+MAX_CACHE_SIZE = 1024
+"""最大缓存数量，超出时移除最早写入的缓存"""
+
+
+class CacheEntry:
+    __slots__ = ("expire_at", "stale_at", "value")
+
+    def __init__(self, value: Any, ttl: float, stale: float):
+        now = time.time()
+        self.value = value
+        self.expire_at = now + ttl
+        """过期时间，之前直接返回"""
+        self.stale_at = now + ttl + stale
+        """失效时间，过期后失效前返回旧值并在后台刷新"""
+
+
+class ResponseCache:
+    """
+    接口结果缓存
+
+    以 名称+参数 为key，未过期时直接返回；过期未失效时返回旧值并在后台刷新；
+    失效或不存在时同一key的并发请求只执行一次，其余等待同一结果
+    """
+
+    def __init__(self):
+        self._data: dict[tuple, CacheEntry] = {}
+        self._running: dict[tuple, asyncio.Task] = {}
+        self._stats: dict[str, dict[str, int]] = {}
+
+    def __incr(self, name: str, key: str):
+        if not (stats := self._stats.get(name)):
+            stats = self._stats[name] = {
+                "hit": 0,
+                "stale": 0,
+                "miss": 0,
+                "shared": 0,
+                "error": 0,
+            }
+        stats[key] += 1
+
+    def __run(
+        self,
+        key: tuple,
+        func: Callable[[], Awaitable[Any]],
+        ttl: float,
+        stale: float,
+    ) -> asyncio.Task:
+        async def run():
+            try:
+                value = await func()
+            except Exception:
+                self.__incr(key[0], "error")
+                raise
+            finally:
+                self._running.pop(key, None)
+            if key not in self._data and len(self._data) >= MAX_CACHE_SIZE:
+                del self._data[next(iter(self._data))]
+            self._data[key] = CacheEntry(value, ttl, stale)
+            return value
+
+        task = self._running[key] = asyncio.create_task(run())
+        return task
+
+    async def get(
+        self,
+        name: str,
+        args: tuple,
+        func: Callable[[], Awaitable[R]],
+        ttl: float,
+        stale: float = 0,
+    ) -> R:
+        """获取缓存结果
+
+        参数:
+            name: 缓存名称，一般为接口名称
+            args: 参数，与名称组成key
+            func: 获取结果的方法
+            ttl: 有效秒数
+            stale: 过期后仍可返回旧值的秒数
+
+        返回:
+            R: 结果
+        """
+        key = (name, *args)
+        now = time.time()
+        if entry := self._data.get(key):
+            if now < entry.expire_at:
+                self.__incr(name, "hit")
+                return entry.value
+            if now < entry.stale_at:
+                self.__incr(name, "stale")
+                if key not in self._running:
+                    self.__run(key, func, ttl, stale).add_done_callback(
+                        self.__log_error
+                    )
+                return entry.value
+        if task := self._running.get(key):
+            self.__incr(name, "shared")
+        else:
+            self.__incr(name, "miss")
+            task = self.__run(key, func, ttl, stale)
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def __log_error(task: asyncio.Task):
+        if not task.cancelled() and (e := task.exception()):
+            logger.error(f"WebUi 后台刷新缓存失败 {type(e)}:{e}")
+
+    def cached(
+        self, name: str, ttl: float, stale: float = 0
+    ) -> Callable[[Callable[P, Awaitable[R]]], Callable[P, Awaitable[R]]]:
+        """缓存方法结果，参数作为key，需可哈希
+
+        参数:
+            name: 缓存名称
+            ttl: 有效秒数
+            stale: 过期后仍可返回旧值的秒数
+        """
+
+        def decorator(func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
+            @wraps(func)
+            async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+                return await self.get(
+                    name,
+                    (*args, *sorted(kwargs.items())),
+                    lambda: func(*args, **kwargs),
+                    ttl,
+                    stale,
+                )
+
+            return wrapper
+
+        return decorator
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """各缓存的命中统计
+
+        返回:
+            dict[str, dict[str, int]]: 缓存名称与 命中/旧值/未命中/等待/异常 次数
+        """
+        return {name: dict(stats) for name, stats in self._stats.items()}
+
+    def reset(self):
+        """清空命中统计"""
+        self._stats = {}
+
+    def clear(self):
+        """清空缓存"""
+        self._data = {}
+
+
+response_cache = ResponseCache()
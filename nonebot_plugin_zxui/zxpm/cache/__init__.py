@@ -0,0 +1,10 @@
+from .auth_snapshot import (  # noqa: F401
+    AuthSnapshot,
+    BotSnapshot,
+    GroupSnapshot,
+    PluginSnapshot,
+    auth_snapshot,
+)
+from .ban_registry import BanEntry, BanRegistry, ban_registry  # noqa: F401
+from .event_memo import EventMemo, event_memo  # noqa: F401
+from .limit_table import Limit, LimitTable, limit_table  # noqa: F401
@@ -0,0 +1,492 @@
+import asyncio
+from typing import Any, TypeVar
+
+from nonebot.compat import model_dump
+from pydantic import BaseModel
+from tortoise.signals import post_delete, post_save
+from zhenxun_utils.enum import BlockType, PluginType
+from zhenxun_utils.log import logger
+
+from ...models.bot_console import BotConsole
+from ...models.group_console import GroupConsole
+from ...models.level_user import LevelUser
+from ...models.plugin_info import PluginInfo
+
+PLUGIN_FIELDS = (
+    "id",
+    "module",
+    "module_path",
+    "name",
+    "status",
+    "block_type",
+    "load_status",
+    "level",
+    "admin_level",
+    "plugin_type",
+)
+"""快照中保留的插件字段"""
+
+GROUP_FIELDS = (
+    "group_id",
+    "channel_id",
+    "status",
+    "level",
+    "is_super",
+    "block_plugin",
+    "superuser_block_plugin",
+)
+"""快照中保留的群组字段"""
+
+BOT_FIELDS = ("bot_id", "status", "block_plugins")
+"""快照中保留的Bot字段"""
+
+_T = TypeVar("_T", "PluginSnapshot", "GroupSnapshot", "BotSnapshot")
+
+
+def _parse_modules(data: str | frozenset[str] | None) -> frozenset[str]:
+    """将 `<aaa,<bbb,` 格式转换为模块集合，已转换的集合原样返回
+
+    参数:
+        data: 格式化字符串
+
+    返回:
+        frozenset[str]: 模块集合
+    """
+    if isinstance(data, frozenset):
+        return data
+    return frozenset(BotConsole.convert_module_format(data)) if data else frozenset()
+
+
+class PluginSnapshot(BaseModel):
+    """
+    插件权限快照
+    """
+
+    id: int
+    """自增id"""
+    module: str
+    """模块名"""
+    module_path: str
+    """模块路径"""
+    name: str
+    """插件名称"""
+    status: bool = True
+    """全局开关状态"""
+    block_type: BlockType | None = None
+    """禁用类型"""
+    load_status: bool = True
+    """加载状态"""
+    level: int = 5
+    """所需群权限"""
+    admin_level: int | None = 0
+    """调用所需权限等级"""
+    plugin_type: PluginType | None = None
+    """插件类型"""
+
+    @classmethod
+    def parse(cls, data: dict[str, Any]) -> "PluginSnapshot":
+        return cls(**data)
+
+
+class GroupSnapshot(BaseModel):
+    """
+    群组权限快照
+    """
+
+    group_id: str
+    """群组id"""
+    channel_id: str | None = None
+    """频道id"""
+    status: bool = True
+    """群状态"""
+    level: int = 5
+    """群权限"""
+    is_super: bool = False
+    """超级用户指定群"""
+    block_plugin: frozenset[str] = frozenset()
+    """禁用插件"""
+    superuser_block_plugin: frozenset[str] = frozenset()
+    """超级用户禁用插件"""
+
+    @classmethod
+    def parse(cls, data: dict[str, Any]) -> "GroupSnapshot":
+        data = dict(data)
+        for key in ("block_plugin", "superuser_block_plugin"):
+            data[key] = _parse_modules(data.get(key))
+        return cls(**data)
+
+
+class BotSnapshot(BaseModel):
+    """
+    Bot权限快照
+    """
+
+    bot_id: str
+    """bot_id"""
+    status: bool = True
+    """Bot状态"""
+    block_plugins: frozenset[str] = frozenset()
+    """禁用插件"""
+
+    @classmethod
+    def parse(cls, data: dict[str, Any]) -> "BotSnapshot":
+        data = dict(data)
+        data["block_plugins"] = _parse_modules(data.get("block_plugins"))
+        return cls(**data)
+
+
+class AuthSnapshot:
+    """
+    权限检测使用的进程内数据快照
+
+    读取全部为同步操作，写入通过模型信号或显式刷新增量更新
+    """
+
+    def __init__(self):
+        self.version = 0
+        """快照版本，每次变更递增"""
+        self.loaded = False
+        """是否已完成全量加载"""
+        self._plugins: dict[str, PluginSnapshot] = {}
+        self._modules: dict[str, PluginSnapshot] = {}
+        """模块名索引，同名时优先已加载的插件"""
+        self._groups: dict[str, dict[str | None, GroupSnapshot]] = {}
+        self._bots: dict[str, BotSnapshot] = {}
+        self._levels: dict[str, dict[str, int]] = {}
+
+    def _bump(self):
+        self.version += 1
+
+    async def load(self):
+        """全量加载快照，各表互不依赖，并发读取"""
+        await asyncio.gather(
+            self.refresh_plugins(),
+            self.refresh_groups(),
+            self.refresh_bots(),
+            self.refresh_levels(),
+        )
+        self.loaded = True
+        logger.debug(
+            f"权限快照加载完成 插件: {len(self._plugins)} 群组: {len(self._groups)}"
+            f" Bot: {len(self._bots)} 版本: {self.version}",
+            "AuthSnapshot",
+        )
+
+    async def refresh_plugins(self):
+        """刷新全部插件"""
+        data_list = await PluginInfo.all().values(*PLUGIN_FIELDS)
+        self._plugins = {d["module_path"]: PluginSnapshot.parse(d) for d in data_list}
+        self._index_modules()
+        self._bump()
+
+    def _index_modules(self):
+        modules: dict[str, PluginSnapshot] = {}
+        for plugin in self._plugins.values():
+            if plugin.module not in modules or plugin.load_status:
+                modules[plugin.module] = plugin
+        self._modules = modules
+
+    async def refresh_groups(self):
+        """刷新全部群组"""
+        data_list = await GroupConsole.all().values(*GROUP_FIELDS)
+        groups: dict[str, dict[str | None, GroupSnapshot]] = {}
+        for data in data_list:
+            group = GroupSnapshot.parse(data)
+            groups.setdefault(group.group_id, {})[group.channel_id] = group
+        self._groups = groups
+        self._bump()
+
+    async def refresh_group(self, group_id: str):
+        """刷新单个群组（包含频道）
+
+        参数:
+            group_id: 群组id
+        """
+        data_list = await GroupConsole.filter(group_id=group_id).values(*GROUP_FIELDS)
+        if data_list:
+            self._groups[group_id] = {
+                d["channel_id"]: GroupSnapshot.parse(d) for d in data_list
+            }
+        else:
+            self._groups.pop(group_id, None)
+        self._bump()
+
+    async def refresh_bots(self):
+        """刷新全部Bot"""
+        data_list = await BotConsole.all().values(*BOT_FIELDS)
+        self._bots = {d["bot_id"]: BotSnapshot.parse(d) for d in data_list}
+        self._bump()
+
+    async def refresh_levels(self):
+        """刷新全部用户权限"""
+        data_list = await LevelUser.all().values_list(
+            "user_id", "group_id", "user_level"
+        )
+        levels: dict[str, dict[str, int]] = {}
+        for user_id, group_id, user_level in data_list:
+            levels.setdefault(user_id, {})[group_id] = user_level
+        self._levels = levels
+        self._bump()
+
+    def get_plugin(self, module_path: str) -> PluginSnapshot | None:
+        """获取插件
+
+        参数:
+            module_path: 模块路径
+
+        返回:
+            PluginSnapshot | None: 插件快照
+        """
+        return self._plugins.get(module_path)
+
+    def get_plugin_by_module(self, module: str) -> PluginSnapshot | None:
+        """通过模块名获取插件
+
+        参数:
+            module: 模块名
+
+        返回:
+            PluginSnapshot | None: 插件快照
+        """
+        return self._modules.get(module)
+
+    def get_plugin_name(self, module: str) -> str:
+        """获取插件名称，插件不存在时返回模块名
+
+        参数:
+            module: 模块名
+
+        返回:
+            str: 插件名称
+        """
+        return plugin.name if (plugin := self._modules.get(module)) else module
+
+    def get_bot_status(self, bot_id: str) -> bool:
+        """获取bot状态，与 BotConsole.get_bot_status 一致，不存在时为False
+
+        参数:
+            bot_id: bot_id
+
+        返回:
+            bool: bot状态
+        """
+        return bot.status if (bot := self._bots.get(bot_id)) else False
+
+    def is_bot_block_plugin(self, bot_id: str, module: str) -> bool:
+        """bot是否禁用插件
+
+        参数:
+            bot_id: bot_id
+            module: 模块名
+
+        返回:
+            bool: 是否禁用
+        """
+        return module in bot.block_plugins if (bot := self._bots.get(bot_id)) else False
+
+    def get_group(
+        self, group_id: str, channel_id: str | None = None
+    ) -> GroupSnapshot | None:
+        """获取群组
+
+        参数:
+            group_id: 群组id
+            channel_id: 频道id
+
+        返回:
+            GroupSnapshot | None: 群组快照
+        """
+        if channels := self._groups.get(group_id):
+            return channels.get(channel_id)
+        return None
+
+    def is_super_group(self, group_id: str) -> bool:
+        """是否超级用户指定群
+
+        参数:
+            group_id: 群组id
+
+        返回:
+            bool: 是否超级用户指定群
+        """
+        return group.is_super if (group := self.get_group(group_id)) else False
+
+    def is_superuser_block_plugin(self, group_id: str, module: str) -> bool:
+        """群组是否被超级用户禁用插件（任意频道）
+
+        参数:
+            group_id: 群组id
+            module: 模块名
+
+        返回:
+            bool: 是否禁用
+        """
+        return any(
+            module in group.superuser_block_plugin
+            for group in self._groups.get(group_id, {}).values()
+        )
+
+    def is_normal_block_plugin(
+        self, group_id: str, module: str, channel_id: str | None = None
+    ) -> bool:
+        """群组是否禁用插件
+
+        参数:
+            group_id: 群组id
+            module: 模块名
+            channel_id: 频道id
+
+        返回:
+            bool: 是否禁用
+        """
+        group = self.get_group(group_id, channel_id)
+        return module in group.block_plugin if group else False
+
+    def check_level(self, user_id: str, group_id: str | None, level: int) -> bool:
+        """检查用户权限等级是否大于 level，与 LevelUser.check_level 一致
+
+        参数:
+            user_id: 用户id
+            group_id: 群组id
+            level: 权限等级
+
+        返回:
+            bool: 是否大于level
+        """
+        if not (user_levels := self._levels.get(user_id)):
+            return False
+        if group_id:
+            if (user_level := user_levels.get(group_id)) is not None:
+                return user_level >= level
+            return False
+        return max(user_levels.values()) >= level
+
+    def _merge(
+        self,
+        snapshot_type: type[_T],
+        old: _T | None,
+        instance: Any,
+        fields: tuple[str, ...],
+        update_fields: list[str] | None,
+    ) -> _T | None:
+        """根据保存的实例生成新快照，仅保存部分字段时以旧快照为基础
+
+        参数:
+            snapshot_type: 快照类型
+            old: 旧快照
+            instance: 模型实例
+            fields: 快照字段
+            update_fields: 保存的字段
+
+        返回:
+            _T | None: 新快照，缺少旧快照无法合并时返回None
+        """
+        if not update_fields:
+            return snapshot_type.parse({f: getattr(instance, f) for f in fields})
+        if old is None:
+            return None
+        data = model_dump(old)
+        data.update({f: getattr(instance, f) for f in update_fields if f in fields})
+        return snapshot_type.parse(data)
+
+    async def on_plugin_save(self, instance: PluginInfo, update_fields: list[str]):
+        old = self._plugins.get(instance.module_path)
+        plugin = self._merge(
+            PluginSnapshot, old, instance, PLUGIN_FIELDS, update_fields
+        )
+        if not plugin:
+            await self.refresh_plugins()
+            return
+        self._plugins[plugin.module_path] = plugin
+        self._index_modules()
+        self._bump()
+
+    def on_plugin_delete(self, instance: PluginInfo):
+        if self._plugins.pop(instance.module_path, None):
+            self._index_modules()
+            self._bump()
+
+    async def on_group_save(self, instance: GroupConsole, update_fields: list[str]):
+        old = self.get_group(instance.group_id, instance.channel_id)
+        group = self._merge(GroupSnapshot, old, instance, GROUP_FIELDS, update_fields)
+        if not group:
+            await self.refresh_group(instance.group_id)
+            return
+        self._groups.setdefault(group.group_id, {})[group.channel_id] = group
+        self._bump()
+
+    def on_group_delete(self, instance: GroupConsole):
+        channels = self._groups.get(instance.group_id)
+        if channels and channels.pop(instance.channel_id, None):
+            if not channels:
+                del self._groups[instance.group_id]
+            self._bump()
+
+    async def on_bot_save(self, instance: BotConsole, update_fields: list[str]):
+        old = self._bots.get(instance.bot_id)
+        bot = self._merge(BotSnapshot, old, instance, BOT_FIELDS, update_fields)
+        if not bot:
+            await self.refresh_bots()
+            return
+        self._bots[bot.bot_id] = bot
+        self._bump()
+
+    def on_bot_delete(self, instance: BotConsole):
+        if self._bots.pop(instance.bot_id, None):
+            self._bump()
+
+    def on_level_save(self, instance: LevelUser):
+        self._levels.setdefault(instance.user_id, {})[instance.group_id] = (
+            instance.user_level
+        )
+        self._bump()
+
+    def on_level_delete(self, instance: LevelUser):
+        user_levels = self._levels.get(instance.user_id)
+        if user_levels and user_levels.pop(instance.group_id, None) is not None:
+            if not user_levels:
+                del self._levels[instance.user_id]
+            self._bump()
+
+
+auth_snapshot = AuthSnapshot()
+
+
+@post_save(PluginInfo)
+async def _(sender, instance: PluginInfo, created, using_db, update_fields):
+    await auth_snapshot.on_plugin_save(instance, update_fields)
+
+
+@post_delete(PluginInfo)
+async def _(sender, instance: PluginInfo, using_db):
+    auth_snapshot.on_plugin_delete(instance)
+
+
+@post_save(GroupConsole)
+async def _(sender, instance: GroupConsole, created, using_db, update_fields):
+    await auth_snapshot.on_group_save(instance, update_fields)
+
+
+@post_delete(GroupConsole)
+async def _(sender, instance: GroupConsole, using_db):
+    auth_snapshot.on_group_delete(instance)
+
+
+@post_save(BotConsole)
+async def _(sender, instance: BotConsole, created, using_db, update_fields):
+    await auth_snapshot.on_bot_save(instance, update_fields)
+
+
+@post_delete(BotConsole)
+async def _(sender, instance: BotConsole, using_db):
+    auth_snapshot.on_bot_delete(instance)
+
+
+@post_save(LevelUser)
+async def _(sender, instance: LevelUser, created, using_db, update_fields):
+    auth_snapshot.on_level_save(instance)
+
+
+@post_delete(LevelUser)
+async def _(sender, instance: LevelUser, using_db):
+    auth_snapshot.on_level_delete(instance)
@@ -0,0 +1,174 @@
+import heapq
+import time
+
+from pydantic import BaseModel
+from tortoise.signals import post_delete, post_save
+from zhenxun_utils.log import logger
+
+from ...models.ban_console import BanConsole
+
+BAN_FIELDS = ("id", "user_id", "group_id", "ban_level", "ban_time", "duration")
+"""封禁表中保留的字段"""
+
+
+class BanEntry(BaseModel):
+    id: int
+    """BanConsole id"""
+    user_id: str
+    """用户id，封禁群组时为空字符串"""
+    group_id: str
+    """群组id，全局封禁用户时为空字符串"""
+    ban_level: int
+    """使用ban命令的用户等级"""
+    ban_time: int
+    """ban开始的时间"""
+    duration: int
+    """ban时长，-1为永久"""
+
+    @classmethod
+    def parse(cls, data: dict) -> "BanEntry":
+        return cls(
+            id=data["id"],
+            user_id=data["user_id"] or "",
+            group_id=data["group_id"] or "",
+            ban_level=data["ban_level"],
+            ban_time=data["ban_time"],
+            duration=data["duration"],
+        )
+
+    @property
+    def key(self) -> tuple[str, str]:
+        return self.user_id, self.group_id
+
+    def remaining(self, now: float) -> int:
+        """剩余时长，与 BanConsole.check_ban_time 一致
+
+        参数:
+            now: 当前时间戳
+
+        返回:
+            int: ban剩余时长，-1时为永久ban，0表示未被ban
+        """
+        if self.duration == -1:
+            return -1
+        _time = now - (self.ban_time + self.duration)
+        return 0 if _time > 0 else int(_time)
+
+
+class BanRegistry:
+    """
+    封禁名单缓存
+
+    以 (用户id, 群组id) 为key常驻内存，过期时间使用最小堆维护，
+    过期数据在后台定时清理，检测时不再访问数据库
+    """
+
+    def __init__(self):
+        self.loaded = False
+        """是否已完成全量加载"""
+        self._data: dict[tuple[str, str], BanEntry] = {}
+        self._keys: dict[int, tuple[str, str]] = {}
+        self._heap: list[tuple[int, int]] = []
+        """(过期时间, id)"""
+
+    async def load(self):
+        """全量加载封禁名单"""
+        data_list = await BanConsole.all().values(*BAN_FIELDS)
+        self._data = {}
+        self._keys = {}
+        self._heap = []
+        for data in data_list:
+            self._put(BanEntry.parse(data))
+        self.loaded = True
+        logger.debug(f"封禁名单加载完成 共 {len(self._data)} 条", "BanRegistry")
+
+    def _put(self, entry: BanEntry):
+        if (key := self._keys.get(entry.id)) and key != entry.key:
+            self._data.pop(key, None)
+        self._data[entry.key] = entry
+        self._keys[entry.id] = entry.key
+        if entry.duration != -1:
+            heapq.heappush(self._heap, (entry.ban_time + entry.duration, entry.id))
+
+    def _remove(self, entry_id: int):
+        key = self._keys.pop(entry_id, None)
+        if key and (entry := self._data.get(key)) and entry.id == entry_id:
+            del self._data[key]
+
+    def check_ban_time(self, user_id: str | None, group_id: str | None = None) -> int:
+        """检测用户被ban时长
+
+        参数:
+            user_id: 用户id
+            group_id: 群组id
+
+        返回:
+            int: ban剩余时长，-1时为永久ban，0表示未被ban
+        """
+        now = time.time()
+        result = 0
+        if entry := self._data.get((user_id or "", group_id or "")):
+            result = entry.remaining(now)
+        if (
+            not result
+            and user_id
+            and group_id
+            and (entry := self._data.get((user_id, "")))
+        ):
+            result = entry.remaining(now)
+        return result
+
+    def is_ban(self, user_id: str | None, group_id: str | None = None) -> bool:
+        """判断用户是否被ban
+
+        参数:
+            user_id: 用户id
+            group_id: 群组id
+
+        返回:
+            bool: 是否被ban
+        """
+        return self.check_ban_time(user_id, group_id) != 0
+
+    async def sweep(self) -> int:
+        """清理已过期的封禁数据
+
+        返回:
+            int: 清理数量
+        """
+        now = time.time()
+        expired = []
+        while self._heap and self._heap[0][0] < now:
+            _, entry_id = heapq.heappop(self._heap)
+            key = self._keys.get(entry_id)
+            entry = self._data.get(key) if key else None
+            if entry and entry.id == entry_id and not entry.remaining(now):
+                self._remove(entry_id)
+                expired.append(entry_id)
+        if expired:
+            await BanConsole.filter(id__in=expired).delete()
+        return len(expired)
+
+    def on_save(self, instance: BanConsole):
+        self._put(
+            BanEntry.parse({field: getattr(instance, field) for field in BAN_FIELDS})
+        )
+
+    def on_delete(self, instance: BanConsole):
+        self._remove(instance.id)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+ban_registry = BanRegistry()
+
+
+@post_save(BanConsole)
+async def _(sender, instance: BanConsole, created, using_db, update_fields):
+    ban_registry.on_save(instance)
+
+
+@post_delete(BanConsole)
+async def _(sender, instance: BanConsole, using_db):
+    ban_registry.on_delete(instance)
@@ -0,0 +1,216 @@
+import asyncio
+import sqlite3
+import threading
+from datetime import date, datetime
+from typing import Any
+
+from zhenxun_utils.log import logger
+
+from ...models.limit_count import LimitCount
+from ..config import zxpm_data_path
+from ..extra.limit import TZ, BaseCountStore, CountLimitBackend, MemoryCountStore
+
+SHARED_DB_PATH = zxpm_data_path / "limit_count.db"
+"""多进程共享计数的本地数据库"""
+SHARED_TIMEOUT = 5
+"""共享计数数据库被锁定时的等待秒数"""
+
+
+class DatabaseCountStore(BaseCountStore):
+    """
+    内存计数，变更的计数定时批量写入数据库（write-behind）
+    """
+
+    backend = CountLimitBackend.DATABASE
+
+    def __init__(self, module: str):
+        self.module = module
+        self.data: dict[tuple[date, str], int] = {}
+        self.dirty: set[tuple[date, str]] = set()
+
+    async def get(self, key: Any, day: date) -> int:
+        return self.data.get((day, str(key)), 0)
+
+    async def acquire(self, key: Any, day: date, max_num: int, num: int = 1) -> bool:
+        _key = (day, str(key))
+        count = self.data.get(_key, 0) + num
+        if count > max_num:
+            return False
+        self.data[_key] = count
+        self.dirty.add(_key)
+        return True
+
+    async def increase(self, key: Any, day: date, num: int = 1):
+        _key = (day, str(key))
+        self.data[_key] = self.data.get(_key, 0) + num
+        self.dirty.add(_key)
+
+    async def reset(self, key: Any, day: date):
+        _key = (day, str(key))
+        if self.data.pop(_key, None) is not None:
+            self.dirty.add(_key)
+
+    async def load(self):
+        """读取当日计数"""
+        today = datetime.now(TZ).date()
+        data_list = await LimitCount.filter(module=self.module, day=today).values_list(
+            "key", "count"
+        )
+        for key, count in data_list:
+            self.data.setdefault((today, key), count)
+
+    async def flush(self):
+        """批量写入变更的计数，并清理过期日期"""
+        dirty, self.dirty = self.dirty, set()
+        if dirty:
+            try:
+                update_list = await LimitCount.filter(
+                    module=self.module,
+                    day__in={day for day, _ in dirty},
+                    key__in={key for _, key in dirty},
+                )
+                exists = set()
+                for data in update_list:
+                    exists.add((data.day, data.key))
+                    data.count = self.data.get((data.day, data.key), 0)
+                create_list = [
+                    LimitCount(
+                        module=self.module,
+                        day=_key[0],
+                        key=_key[1],
+                        count=self.data.get(_key, 0),
+                    )
+                    for _key in dirty
+                    if _key not in exists
+                ]
+                update_list = [
+                    data for data in update_list if (data.day, data.key) in dirty
+                ]
+                if update_list:
+                    await LimitCount.bulk_update(update_list, ["count"], 100)
+                if create_list:
+                    await LimitCount.bulk_create(create_list, 100)
+            except Exception:
+                self.dirty |= dirty
+                raise
+        today = datetime.now(TZ).date()
+        for _key in [k for k in self.data if k[0] < today and k not in self.dirty]:
+            del self.data[_key]
+
+    def stats(self) -> dict[str, int]:
+        return {"size": len(self.data), "dirty": len(self.dirty)}
+
+
+class SharedCountStore(BaseCountStore):
+    """
+    多进程共享计数，计数直接读写本地 sqlite 文件
+
+    sqlite 调用在线程中执行，不阻塞事件循环；
+    检测与增加由单条条件 UPSERT 完成，多进程同时调用时不会超出限制
+    """
+
+    backend = CountLimitBackend.SHARED
+
+    def __init__(self, module: str):
+        self.module = module
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self.errors = 0
+        """读写失败次数"""
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if not self._conn:
+            self._conn = sqlite3.connect(
+                SHARED_DB_PATH,
+                timeout=SHARED_TIMEOUT,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS limit_count (module TEXT, key TEXT,"
+                " day TEXT, count INTEGER, PRIMARY KEY (module, key, day))"
+            )
+        return self._conn
+
+    def __execute(self, sql: str, values: tuple) -> tuple[list, int]:
+        with self._lock:
+            cursor = self.conn.execute(sql, values)
+            return cursor.fetchall(), cursor.rowcount
+
+    async def __run(self, sql: str, values: tuple) -> tuple[list, int] | None:
+        """执行sql，失败时返回None
+
+        返回:
+            tuple[list, int] | None: 查询结果与变更行数
+        """
+        try:
+            return await asyncio.to_thread(self.__execute, sql, values)
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"读写插件 {self.module} 共享计数失败", "LimitTable", e=e)
+            return None
+
+    async def get(self, key: Any, day: date) -> int:
+        result = await self.__run(
+            "SELECT count FROM limit_count WHERE module = ? AND key = ? AND day = ?",
+            (self.module, str(key), day.isoformat()),
+        )
+        return result[0][0][0] if result and result[0] else 0
+
+    async def acquire(self, key: Any, day: date, max_num: int, num: int = 1) -> bool:
+        """读写失败时不限制"""
+        if num > max_num:
+            return False
+        result = await self.__run(
+            "INSERT INTO limit_count (module, key, day, count) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT (module, key, day) DO UPDATE SET count = count + ?"
+            " WHERE count + ? <= ?",
+            (self.module, str(key), day.isoformat(), num, num, num, max_num),
+        )
+        return result is None or result[1] > 0
+
+    async def increase(self, key: Any, day: date, num: int = 1):
+        await self.__run(
+            "INSERT INTO limit_count (module, key, day, count) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT (module, key, day) DO UPDATE SET count = count + ?",
+            (self.module, str(key), day.isoformat(), num, num),
+        )
+
+    async def reset(self, key: Any, day: date):
+        await self.__run(
+            "DELETE FROM limit_count WHERE module = ? AND key = ? AND day = ?",
+            (self.module, str(key), day.isoformat()),
+        )
+
+    async def flush(self):
+        """清理过期日期"""
+        await self.__run(
+            "DELETE FROM limit_count WHERE module = ? AND day < ?",
+            (self.module, datetime.now(TZ).date().isoformat()),
+        )
+
+    def stats(self) -> dict[str, int]:
+        return {"errors": self.errors}
+
+
+def build_count_store(backend: str | None, module: str) -> BaseCountStore:
+    """根据存储方式构造计数存储
+
+    参数:
+        backend: 存储方式
+        module: 模块名
+
+    返回:
+        BaseCountStore: 计数存储
+    """
+    if backend == CountLimitBackend.DATABASE:
+        return DatabaseCountStore(module)
+    if backend == CountLimitBackend.SHARED:
+        return SharedCountStore(module)
+    if backend and backend != CountLimitBackend.MEMORY:
+        logger.warning(
+            f"未知的次数限制存储方式 {backend}，已使用内存存储", "LimitTable"
+        )
+    return MemoryCountStore()
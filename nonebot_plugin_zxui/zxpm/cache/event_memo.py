@@ -0,0 +1,86 @@
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from nonebot.adapters import Event
+from nonebot.exception import IgnoredException
+
+MAX_EVENT_SIZE = 512
+"""同时保留的最大事件数量，防止事件未正常结束时无限增长"""
+
+
+class EventMemo:
+    """
+    单个事件内的权限检测结果缓存
+
+    同一事件会依次经过多个matcher的 run_preprocessor，
+    群组/bot/ban 的检测结果只与事件和插件模块有关，只需计算一次
+    """
+
+    def __init__(self):
+        self._data: dict[int, dict[tuple[Any, ...], str | None]] = {}
+        self.hit = 0
+        """命中次数，即节省的检测次数"""
+        self.miss = 0
+        """未命中次数，即实际执行的检测次数"""
+        self.event_count = 0
+        """缓存过的事件数量"""
+
+    async def run(
+        self,
+        event: Event,
+        key: tuple[Any, ...],
+        func: Callable[[], Awaitable[Any]],
+    ):
+        """执行检测，同一事件中相同key的检测只执行一次
+
+        参数:
+            event: Event
+            key: 缓存key，一般为 (检测阶段, 插件模块)
+            func: 检测函数，阻断时抛出 IgnoredException
+
+        异常:
+            IgnoredException: 检测结果为阻断
+        """
+        event_id = id(event)
+        cache = self._data.get(event_id)
+        if cache is None:
+            if len(self._data) >= MAX_EVENT_SIZE:
+                del self._data[next(iter(self._data))]
+            cache = self._data[event_id] = {}
+            self.event_count += 1
+        if key in cache:
+            self.hit += 1
+            if (reason := cache[key]) is not None:
+                raise IgnoredException(reason)
+            return
+        self.miss += 1
+        try:
+            await func()
+        except IgnoredException as e:
+            cache[key] = str(e.reason)
+            raise
+        cache[key] = None
+
+    def discard(self, event: Event):
+        """事件处理结束，丢弃缓存
+
+        参数:
+            event: Event
+        """
+        self._data.pop(id(event), None)
+
+    def stats(self) -> dict[str, int]:
+        """缓存统计
+
+        返回:
+            dict[str, int]: 统计数据
+        """
+        return {
+            "hit": self.hit,
+            "miss": self.miss,
+            "event_count": self.event_count,
+            "pending": len(self._data),
+        }
+
+
+event_memo = EventMemo()
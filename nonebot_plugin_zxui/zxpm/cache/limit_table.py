@@ -0,0 +1,279 @@
+import asyncio
+from collections.abc import Mapping
+from types import MappingProxyType
+
+from pydantic import BaseModel
+from tortoise.signals import post_delete, post_save
+from zhenxun_utils.enum import PluginLimitType
+from zhenxun_utils.log import logger
+
+from ...models.plugin_limit import PluginLimit
+from ..extra.limit import (
+    BaseBlock,
+    ConcurrencyLimiter,
+    CountLimiter,
+    ExtraLimitType,
+    FreqLimiter,
+    PluginConcurrencyBlock,
+    PluginRateBlock,
+    SlidingWindowLimiter,
+    TokenBucketLimiter,
+    UserBlockLimiter,
+)
+from .count_store import build_count_store
+
+LIMIT_ORDER = (
+    PluginLimitType.CD,
+    PluginLimitType.BLOCK,
+    PluginLimitType.COUNT,
+    ExtraLimitType.TOKEN_BUCKET,
+    ExtraLimitType.SLIDING_WINDOW,
+    ExtraLimitType.CONCURRENCY,
+)
+"""同一插件多个限制时的检测顺序，并发限制占用名额，必须最后检测"""
+
+LimitType = PluginLimitType | ExtraLimitType
+
+Limiter = (
+    FreqLimiter
+    | UserBlockLimiter
+    | CountLimiter
+    | TokenBucketLimiter
+    | SlidingWindowLimiter
+    | ConcurrencyLimiter
+)
+
+
+class Limit(BaseModel):
+    limit: PluginLimit
+    limiter: Limiter
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+class LimitTable:
+    """
+    插件限制表
+
+    由 plugin_limit 编译为 模块 -> 限制 的只读映射，权限检测时不再访问数据库，
+    数据变更时重新编译并整体替换，未变更类型的限制器会保留已有状态
+    """
+
+    def __init__(self):
+        self.version = 0
+        """限制表版本，每次编译递增"""
+        self.loaded = False
+        """是否已完成加载"""
+        self._data: Mapping[str, Mapping[LimitType, Limit]] = MappingProxyType({})
+        self._extra: dict[str, list[BaseBlock]] = {}
+        self._dirty = False
+        self._task: asyncio.Task | None = None
+
+    async def load(self):
+        """从数据库读取启用的限制并编译"""
+        limit_list = await PluginLimit.filter(status=True).all()
+        old_limiters = {id(limit.limiter) for limit in self.__iter_limits()}
+        self.compile(limit_list)
+        for limit in self.__iter_limits():
+            if (
+                isinstance(limit.limiter, CountLimiter)
+                and id(limit.limiter) not in old_limiters
+            ):
+                await limit.limiter.count.load()
+        logger.debug(
+            f"插件限制表编译完成 共 {len(self._data)} 个插件 版本: {self.version}",
+            "LimitTable",
+        )
+
+    def compile(self, limit_list: list[PluginLimit]):
+        """编译限制并替换当前限制表
+
+        参数:
+            limit_list: 插件限制列表
+        """
+        module2limit: dict[str, dict[LimitType, tuple[PluginLimit, BaseBlock | None]]]
+        module2limit = {}
+        for limit in limit_list:
+            module2limit.setdefault(limit.module, {})[limit.limit_type] = (limit, None)
+        for module, block_list in self._extra.items():
+            for block in block_list:
+                if not block.status:
+                    continue
+                limit_type = (
+                    block.algorithm
+                    if isinstance(block, PluginRateBlock)
+                    else ExtraLimitType.CONCURRENCY
+                )
+                limit = PluginLimit(
+                    module=module,
+                    module_path=module,
+                    limit_type=limit_type,
+                    watch_type=block.watch_type,
+                    status=block.status,
+                    result=block.result,
+                )
+                module2limit.setdefault(module, {})[limit_type] = (limit, block)
+        data = {
+            module: MappingProxyType(
+                {
+                    limit_type: Limit(
+                        limit=limits[limit_type][0],
+                        limiter=self.__build_limiter(module, *limits[limit_type]),
+                    )
+                    for limit_type in LIMIT_ORDER
+                    if limit_type in limits
+                }
+            )
+            for module, limits in module2limit.items()
+        }
+        self._data = MappingProxyType(data)
+        self.version += 1
+        self.loaded = True
+
+    def set_extra(self, module2block: dict[str, list[BaseBlock]]):
+        """设置只存在于配置文件中的限制（令牌桶/滑动窗口/并发），下次编译时生效
+
+        参数:
+            module2block: 模块名与限制配置
+        """
+        self._extra = module2block
+
+    def __build_limiter(
+        self, module: str, limit: PluginLimit, block: BaseBlock | None = None
+    ) -> Limiter:
+        """构造限制器，类型未变时沿用旧限制器并更新参数
+
+        参数:
+            module: 模块名
+            limit: PluginLimit
+            block: 配置文件中的限制配置，仅扩展限制类型存在
+
+        返回:
+            Limiter: 限制器
+        """
+        old = self.get(module, limit.limit_type)
+        limiter = old.limiter if old else None
+        if isinstance(block, PluginRateBlock):
+            if block.algorithm == ExtraLimitType.SLIDING_WINDOW:
+                if (
+                    not isinstance(limiter, SlidingWindowLimiter)
+                    or limiter.max != block.max_count
+                    or limiter.period != block.period
+                ):
+                    limiter = SlidingWindowLimiter(block.max_count, block.period)
+                return limiter
+            new_limiter = TokenBucketLimiter(block.max_count, block.period, block.burst)
+            if (
+                not isinstance(limiter, TokenBucketLimiter)
+                or limiter.rate != new_limiter.rate
+                or limiter.burst != new_limiter.burst
+            ):
+                limiter = new_limiter
+            return limiter
+        if isinstance(block, PluginConcurrencyBlock):
+            if not isinstance(limiter, ConcurrencyLimiter):
+                limiter = ConcurrencyLimiter(block.max_in_flight, block.timeout)
+            limiter.max = block.max_in_flight
+            limiter.timeout = block.timeout
+            return limiter
+        if limit.limit_type == PluginLimitType.CD:
+            if not isinstance(limiter, FreqLimiter):
+                limiter = FreqLimiter(limit.cd or 0)
+            limiter.default_cd = limit.cd or 0
+        elif limit.limit_type == PluginLimitType.COUNT:
+            if (
+                not isinstance(limiter, CountLimiter)
+                or limiter.backend != limit.count_backend
+            ):
+                limiter = CountLimiter(
+                    limit.max_count or 0,
+                    build_count_store(limit.count_backend, module),
+                )
+            limiter.max = limit.max_count or 0
+        elif not isinstance(limiter, UserBlockLimiter):
+            limiter = UserBlockLimiter()
+        return limiter
+
+    def get(self, module: str, limit_type: LimitType) -> Limit | None:
+        """获取插件指定类型的限制
+
+        参数:
+            module: 模块名
+            limit_type: 限制类型
+
+        返回:
+            Limit | None: 限制
+        """
+        if limits := self._data.get(module):
+            return limits.get(limit_type)
+        return None
+
+    def get_all(self, module: str) -> Mapping[LimitType, Limit]:
+        """获取插件全部限制，按检测顺序排列
+
+        参数:
+            module: 模块名
+
+        返回:
+            Mapping[LimitType, Limit]: 限制
+        """
+        return self._data.get(module) or MappingProxyType({})
+
+    def __iter_limits(self):
+        for limits in self._data.values():
+            yield from limits.values()
+
+    def stats(self) -> dict[str, dict[str, dict[str, int]]]:
+        """各插件限制器的存储统计
+
+        返回:
+            dict[str, dict[str, dict[str, int]]]: 模块名 -> 限制类型 -> 存储统计
+        """
+        return {
+            module: {
+                str(limit_type): limit.limiter.stats()
+                for limit_type, limit in limits.items()
+            }
+            for module, limits in self._data.items()
+        }
+
+    async def flush(self):
+        """写入次数限制中未持久化的计数"""
+        for limit in self.__iter_limits():
+            if isinstance(limit.limiter, CountLimiter):
+                try:
+                    await limit.limiter.count.flush()
+                except Exception as e:
+                    logger.error(
+                        f"写入插件 {limit.limit.module} 次数限制计数失败",
+                        "LimitTable",
+                        e=e,
+                    )
+
+    def invalidate(self):
+        """数据变更，在后台重新编译，多次变更只会合并为一次"""
+        self._dirty = True
+        if not self._task or self._task.done():
+            self._task = asyncio.create_task(self.__reload())
+
+    async def __reload(self):
+        while self._dirty:
+            self._dirty = False
+            try:
+                await self.load()
+            except Exception as e:
+                logger.error("重新编译插件限制表失败", "LimitTable", e=e)
+
+
+limit_table = LimitTable()
+
+
+@post_save(PluginLimit)
+async def _(sender, instance: PluginLimit, created, using_db, update_fields):
+    limit_table.invalidate()
+
+
+@post_delete(PluginLimit)
+async def _(sender, instance: PluginLimit, using_db):
+    limit_table.invalidate()
@@ -7,6 +7,7 @@ from zhenxun_utils.log import logger
 
 from ...models.group_console import GroupConsole
 from ...models.plugin_info import PluginInfo
+from ..cache import auth_snapshot
 from .zxpm_ban import *  # noqa: F403
 from .zxpm_bot_manage import *  # noqa: F403
 from .zxpm_help import *  # noqa: F403
@@ -50,6 +51,8 @@ async def _(bot: Bot):
                     create_list.append(group)
             if create_list:
                 await GroupConsole.bulk_create(create_list, 10)
+                await GroupConsole.build_block([g.group_id for g in create_list])
+                await auth_snapshot.refresh_groups()
                 logger.debug(
                     f"更新Bot: {bot.self_id} 共创建 {len(create_list)} 条群组数据..."
                 )
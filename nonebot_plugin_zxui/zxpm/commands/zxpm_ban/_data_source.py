@@ -6,6 +6,7 @@ from zhenxun_utils._image_template import ImageTemplate
 
 from ....models.ban_console import BanConsole
 from ....models.level_user import LevelUser
+from ...cache import ban_registry
 
 
 class BanManage:
@@ -78,7 +79,9 @@ class BanManage:
         返回:
             bool: 是否被ban
         """
-        return await BanConsole.is_ban(user_id, group_id)
+        if not ban_registry.loaded:
+            await ban_registry.load()
+        return ban_registry.is_ban(user_id, group_id)
 
     @classmethod
     async def unban(
@@ -4,6 +4,7 @@ from zhenxun_utils.log import logger
 from zhenxun_utils.message import MessageUtils
 
 from ....models.bot_console import BotConsole
+from ...cache import auth_snapshot
 from .command import bot_manage
 
 
@@ -23,6 +24,7 @@ async def enable_bot_switch(
         )
         try:
             await BotConsole.set_bot_status(True, bot_id.result)
+            await auth_snapshot.refresh_bots()
         except ValueError:
             await MessageUtils.build_message(f"bot_id {bot_id.result} 不存在").finish()
 
@@ -45,6 +47,7 @@ async def diasble_bot_switch(
         )
         try:
             await BotConsole.set_bot_status(False, bot_id.result)
+            await auth_snapshot.refresh_bots()
         except ValueError:
             await MessageUtils.build_message(f"bot_id {bot_id.result} 不存在").finish()
 
@@ -1,3 +1,4 @@
+import asyncio
 import contextlib
 
 from nonebot.adapters import Bot, Event
@@ -5,56 +6,27 @@ from nonebot.exception import IgnoredException
 from nonebot.matcher import Matcher
 from nonebot_plugin_alconna import At, UniMsg
 from nonebot_plugin_session import EventSession
-from pydantic import BaseModel
 from zhenxun_utils.enum import BlockType, LimitWatchType, PluginLimitType, PluginType
 from zhenxun_utils.log import logger
 from zhenxun_utils.message import MessageUtils
 
-from ....models.bot_console import BotConsole
-from ....models.group_console import GroupConsole
-from ....models.level_user import LevelUser
-from ....models.plugin_info import PluginInfo
 from ....models.plugin_limit import PluginLimit
+from ...cache import Limit, PluginSnapshot, auth_snapshot, event_memo, limit_table
 from ...config import ZxpmConfig
-from ...extra.limit import CountLimiter, FreqLimiter, UserBlockLimiter
-
-
-class Limit(BaseModel):
-    limit: PluginLimit
-    limiter: FreqLimiter | UserBlockLimiter | CountLimiter
-
-    class Config:
-        arbitrary_types_allowed = True
+from ...extra.limit import (
+    ConcurrencyLimiter,
+    CountLimiter,
+    FreqLimiter,
+    SlidingWindowLimiter,
+    TokenBucketLimiter,
+    UserBlockLimiter,
+)
+from ...metrics import metrics
 
 
 class LimitManage:
-    add_module = []  # noqa: RUF012
-
-    cd_limit: dict[str, Limit] = {}  # noqa: RUF012
-    block_limit: dict[str, Limit] = {}  # noqa: RUF012
-    count_limit: dict[str, Limit] = {}  # noqa: RUF012
-
-    @classmethod
-    def add_limit(cls, limit: PluginLimit):
-        """添加限制
-
-        参数:
-            limit: PluginLimit
-        """
-        if limit.module not in cls.add_module:
-            cls.add_module.append(limit.module)
-            if limit.limit_type == PluginLimitType.BLOCK:
-                cls.block_limit[limit.module] = Limit(
-                    limit=limit, limiter=UserBlockLimiter()
-                )
-            elif limit.limit_type == PluginLimitType.CD:
-                cls.cd_limit[limit.module] = Limit(
-                    limit=limit, limiter=FreqLimiter(limit.cd)
-                )
-            elif limit.limit_type == PluginLimitType.COUNT:
-                cls.count_limit[limit.module] = Limit(
-                    limit=limit, limiter=CountLimiter(limit.max_count)
-                )
+    slots: dict[int, dict[int, list[tuple[ConcurrencyLimiter, int]]]] = {}  # noqa: RUF012
+    """事件id -> matcher id -> 持有的并发名额，在事件结束后兜底释放"""
 
     @classmethod
     def unblock(
@@ -68,7 +40,7 @@ class LimitManage:
             group_id: 群组id
             channel_id: 频道id
         """
-        if limit_model := cls.block_limit.get(module):
+        if limit_model := limit_table.get(module, PluginLimitType.BLOCK):
             limit = limit_model.limit
             limiter: UserBlockLimiter = limit_model.limiter  # type: ignore
             key_type = user_id
@@ -76,6 +48,44 @@ class LimitManage:
                 key_type = channel_id or group_id
             limiter.set_false(key_type)
 
+    @classmethod
+    def hold(
+        cls, event: Event, matcher: Matcher, limiter: ConcurrencyLimiter, token: int
+    ):
+        """记录matcher持有的并发名额
+
+        参数:
+            event: Event
+            matcher: Matcher
+            limiter: 并发限制
+            token: 名额凭证
+        """
+        cls.slots.setdefault(id(event), {}).setdefault(id(matcher), []).append(
+            (limiter, token)
+        )
+
+    @classmethod
+    def release(cls, event: Event, matcher: Matcher | None = None):
+        """插件执行结束，释放并发名额
+
+        参数:
+            event: Event
+            matcher: Matcher，为空时释放事件中全部matcher持有的名额
+        """
+        if matcher:
+            matcher2slots = cls.slots.get(id(event), {})
+            slot_list = matcher2slots.pop(id(matcher), [])
+            if not matcher2slots:
+                cls.slots.pop(id(event), None)
+        else:
+            slot_list = [
+                slot
+                for slots in cls.slots.pop(id(event), {}).values()
+                for slot in slots
+            ]
+        for limiter, token in slot_list:
+            limiter.release(token)
+
     @classmethod
     async def check(
         cls,
@@ -84,8 +94,10 @@ class LimitManage:
         group_id: str | None,
         channel_id: str | None,
         session: EventSession,
+        event: Event,
+        matcher: Matcher,
     ):
-        """检测限制
+        """检测限制，全部限制通过后才记录调用，被阻断的调用不消耗次数与令牌
 
         参数:
             module: 模块名
@@ -93,72 +105,109 @@ class LimitManage:
             group_id: 群组id
             channel_id: 频道id
             session: Session
+            event: Event
+            matcher: Matcher
 
         异常:
             IgnoredException: IgnoredException
         """
-        if limit_model := cls.cd_limit.get(module):
-            await cls.__check(limit_model, user_id, group_id, channel_id, session)
-        if limit_model := cls.block_limit.get(module):
-            await cls.__check(limit_model, user_id, group_id, channel_id, session)
-        if limit_model := cls.count_limit.get(module):
-            await cls.__check(limit_model, user_id, group_id, channel_id, session)
+        limit_list = [
+            (
+                limit_model,
+                cls.__get_key(limit_model.limit, user_id, group_id, channel_id),
+            )
+            for limit_model in limit_table.get_all(module).values()
+            if limit_model
+        ]
+        if denied := cls.__find_denied(limit_list):
+            await cls.__deny(denied, session)
+        count_list: list[tuple[CountLimiter, str]] = []
+        for limit_model, key_type in limit_list:
+            limiter = limit_model.limiter
+            if not isinstance(limiter, CountLimiter):
+                continue
+            # 检测与计数在存储中原子完成，避免多进程同时通过检测
+            if not await limiter.acquire(key_type):
+                await cls.__rollback(count_list)
+                await cls.__deny(limit_model, session)
+            count_list.append((limiter, key_type))
+        if count_list and (denied := cls.__find_denied(limit_list)):
+            """等待计数期间其他调用可能已占用名额"""
+            await cls.__rollback(count_list)
+            await cls.__deny(denied, session)
+        for limit_model, key_type in limit_list:
+            limiter = limit_model.limiter
+            if isinstance(limiter, FreqLimiter):
+                limiter.start_cd(key_type)
+            if isinstance(limiter, UserBlockLimiter):
+                limiter.set_true(key_type)
+            if isinstance(limiter, TokenBucketLimiter):
+                limiter.consume(key_type)
+            if isinstance(limiter, SlidingWindowLimiter):
+                limiter.add(key_type)
+            if isinstance(limiter, ConcurrencyLimiter):
+                cls.hold(event, matcher, limiter, limiter.acquire(key_type))
 
     @classmethod
-    async def __check(
+    def __get_key(
         cls,
-        limit_model: Limit | None,
+        limit: PluginLimit,
         user_id: str,
         group_id: str | None,
         channel_id: str | None,
-        session: EventSession,
-    ):
-        """检测限制
+    ) -> str:
+        if group_id and limit.watch_type == LimitWatchType.GROUP:
+            return channel_id or group_id
+        return user_id
 
-        参数:
-            limit_model: Limit
-            user_id: 用户id
-            group_id: 群组id
-            channel_id: 频道id
-            session: Session
+    @classmethod
+    def __find_denied(cls, limit_list: list[tuple[Limit, str]]) -> Limit | None:
+        """获取第一个未通过检测的限制，次数限制在计数时检测"""
+        for limit_model, key_type in limit_list:
+            limiter = limit_model.limiter
+            if not isinstance(limiter, CountLimiter) and not limiter.check(key_type):
+                return limit_model
+        return None
+
+    @classmethod
+    async def __rollback(cls, count_list: list[tuple[CountLimiter, str]]):
+        """撤销已增加的次数"""
+        for limiter, key_type in count_list:
+            await limiter.increase(key_type, -1)
+
+    @classmethod
+    async def __deny(cls, limit_model: Limit, session: EventSession):
+        """阻断调用
 
         异常:
             IgnoredException: IgnoredException
         """
-        if not limit_model:
-            return
         limit = limit_model.limit
-        limiter = limit_model.limiter
-        is_limit = (
-            LimitWatchType.ALL
-            or (group_id and limit.watch_type == LimitWatchType.GROUP)
-            or (not group_id and limit.watch_type == LimitWatchType.USER)
+        if limit.result:
+            await MessageUtils.build_message(limit.result).send()
+        logger.debug(
+            f"{limit.module}({limit.limit_type}) 正在限制中...",
+            "AuthChecker",
+            session=session,
         )
-        key_type = user_id
-        if group_id and limit.watch_type == LimitWatchType.GROUP:
-            key_type = channel_id or group_id
-        if is_limit and not limiter.check(key_type):
-            if limit.result:
-                await MessageUtils.build_message(limit.result).send()
-            logger.debug(
-                f"{limit.module}({limit.limit_type}) 正在限制中...",
-                "AuthChecker",
-                session=session,
-            )
-            raise IgnoredException(f"{limit.module} 正在限制中...")
-        else:
-            if isinstance(limiter, FreqLimiter):
-                limiter.start_cd(key_type)
-            if isinstance(limiter, UserBlockLimiter):
-                limiter.set_true(key_type)
-            if isinstance(limiter, CountLimiter):
-                limiter.increase(key_type)
+        raise IgnoredException(f"{limit.module} 正在限制中...")
 
 
 class IsSuperuserException(Exception):
     pass
 
 
+async def ensure_loaded():
+    """首次检测前并发加载权限快照与插件限制表，之后的检测不再访问数据库"""
+    tasks = []
+    if not auth_snapshot.loaded:
+        tasks.append(auth_snapshot.load())
+    if not limit_table.loaded:
+        tasks.append(limit_table.load())
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
 class AuthChecker:
     """
     权限检查
@@ -171,11 +220,11 @@ class AuthChecker:
         self._flmt_s = FreqLimiter(check_notice_info_cd)
         self._flmt_c = FreqLimiter(check_notice_info_cd)
 
-    def is_send_limit_message(self, plugin: PluginInfo, sid: str) -> bool:
+    def is_send_limit_message(self, plugin: PluginSnapshot, sid: str) -> bool:
         """是否发送提示消息
 
         参数:
-            plugin: PluginInfo
+            plugin: PluginSnapshot
 
         返回:
             bool: 是否发送提示消息
@@ -202,6 +251,17 @@ class AuthChecker:
             session: EventSession
             message: UniMsg
         """
+        with metrics.timer("auth"):
+            await self.__auth(matcher, event, bot, session, message)
+
+    async def __auth(
+        self,
+        matcher: Matcher,
+        event: Event,
+        bot: Bot,
+        session: EventSession,
+        message: UniMsg,
+    ):
         is_ignore = False
         user_id = session.id1
         group_id = session.id3
@@ -219,7 +279,8 @@ class AuthChecker:
             if matcher.type == "notice":
                 return
         if user_id and matcher.plugin and (module_path := matcher.plugin.module_name):
-            if plugin := await PluginInfo.get_or_none(module_path=module_path):
+            await ensure_loaded()
+            if plugin := auth_snapshot.get_plugin(module_path):
                 if plugin.plugin_type == PluginType.HIDDEN:
                     logger.debug("插件为HIDDEN，已跳过...")
                     return
@@ -228,11 +289,24 @@ class AuthChecker:
                         session.id1 not in bot.config.superusers
                         or ZxpmConfig.zxpm_limit_superuser
                     ):
-                        await self.auth_bot(plugin, bot.self_id)
-                        await self.auth_group(plugin, session, message)
-                        await self.auth_admin(plugin, session)
-                        await self.auth_plugin(plugin, session, event)
-                        await self.auth_limit(plugin, session)
+                        with metrics.timer("auth.bot"):
+                            await event_memo.run(
+                                event,
+                                ("bot", plugin.module),
+                                lambda: self.auth_bot(plugin, bot.self_id),
+                            )
+                        with metrics.timer("auth.group"):
+                            await event_memo.run(
+                                event,
+                                ("group", plugin.module),
+                                lambda: self.auth_group(plugin, session, message),
+                            )
+                        with metrics.timer("auth.admin"):
+                            await self.auth_admin(plugin, session)
+                        with metrics.timer("auth.plugin", (IsSuperuserException,)):
+                            await self.auth_plugin(plugin, session, event)
+                        with metrics.timer("auth.limit"):
+                            await self.auth_limit(plugin, session, event, matcher)
                 except IsSuperuserException:
                     logger.debug(
                         "超级用户或被ban跳过权限检测...", "AuthChecker", session=session
@@ -248,29 +322,37 @@ class AuthChecker:
         if is_ignore:
             raise IgnoredException("权限检测 ignore")
 
-    async def auth_bot(self, plugin: PluginInfo, bot_id: str):
+    async def auth_bot(self, plugin: PluginSnapshot, bot_id: str):
         """机器人权限
 
         参数:
-            plugin: PluginInfo
+            plugin: PluginSnapshot
             bot_id: bot_id
         """
-        if not await BotConsole.get_bot_status(bot_id):
+        if not auth_snapshot.get_bot_status(bot_id):
             logger.debug("Bot休眠中阻断权限检测...", "AuthChecker")
             raise IgnoredException("BotConsole休眠权限检测 ignore")
-        if await BotConsole.is_block_plugin(bot_id, plugin.module):
+        if auth_snapshot.is_bot_block_plugin(bot_id, plugin.module):
             logger.debug(
                 f"Bot插件 {plugin.name}({plugin.module}) 权限检查结果为关闭...",
                 "AuthChecker",
             )
             raise IgnoredException("BotConsole插件权限检测 ignore")
 
-    async def auth_limit(self, plugin: PluginInfo, session: EventSession):
+    async def auth_limit(
+        self,
+        plugin: PluginSnapshot,
+        session: EventSession,
+        event: Event,
+        matcher: Matcher,
+    ):
         """插件限制
 
         参数:
-            plugin: PluginInfo
+            plugin: PluginSnapshot
             session: EventSession
+            event: Event
+            matcher: Matcher，持有并发名额直到执行结束
         """
         user_id = session.id1
         group_id = session.id3
@@ -278,23 +360,18 @@ class AuthChecker:
         if not group_id:
             group_id = channel_id
             channel_id = None
-        limit_list: list[PluginLimit] = await plugin.plugin_limit.filter(
-            status=True
-        ).all()  # type: ignore
-        for limit in limit_list:
-            LimitManage.add_limit(limit)
         if user_id:
             await LimitManage.check(
-                plugin.module, user_id, group_id, channel_id, session
+                plugin.module, user_id, group_id, channel_id, session, event, matcher
             )
 
     async def auth_plugin(
-        self, plugin: PluginInfo, session: EventSession, event: Event
+        self, plugin: PluginSnapshot, session: EventSession, event: Event
     ):
         """插件状态
 
         参数:
-            plugin: PluginInfo
+            plugin: PluginSnapshot
             session: EventSession
         """
         group_id = session.id3
@@ -310,9 +387,7 @@ class AuthChecker:
                 is_poke = isinstance(event, PokeNotifyEvent)
             if group_id:
                 sid = group_id or user_id
-                if await GroupConsole.is_superuser_block_plugin(
-                    group_id, plugin.module
-                ):
+                if auth_snapshot.is_superuser_block_plugin(group_id, plugin.module):
                     """超级用户群组插件状态"""
                     if self.is_send_limit_message(plugin, sid) and not is_poke:
                         self._flmt_s.start_cd(group_id or user_id)
@@ -325,7 +400,7 @@ class AuthChecker:
                         session=session,
                     )
                     raise IgnoredException("超级管理员禁用了该群此功能...")
-                if await GroupConsole.is_normal_block_plugin(group_id, plugin.module):
+                if auth_snapshot.is_normal_block_plugin(group_id, plugin.module):
                     """群组插件状态"""
                     if self.is_send_limit_message(plugin, sid) and not is_poke:
                         self._flmt_s.start_cd(group_id or user_id)
@@ -384,7 +459,7 @@ class AuthChecker:
                     raise IgnoredException("该插件在私聊中已被禁用...")
             if not plugin.status and plugin.block_type == BlockType.ALL:
                 """全局状态"""
-                if group_id and await GroupConsole.is_super_group(group_id):
+                if group_id and auth_snapshot.is_super_group(group_id):
                     raise IsSuperuserException()
                 logger.debug(
                     f"{plugin.name}({plugin.module}) 全局未开启此功能...",
@@ -396,19 +471,17 @@ class AuthChecker:
                     await MessageUtils.build_message("全局未开启此功能...").send()
                 raise IgnoredException("全局未开启此功能...")
 
-    async def auth_admin(self, plugin: PluginInfo, session: EventSession):
+    async def auth_admin(self, plugin: PluginSnapshot, session: EventSession):
         """管理员命令 个人权限
 
         参数:
-            plugin: PluginInfo
+            plugin: PluginSnapshot
             session: EventSession
         """
         user_id = session.id1
         if user_id and plugin.admin_level:
             if group_id := session.id3 or session.id2:
-                if not await LevelUser.check_level(
-                    user_id, group_id, plugin.admin_level
-                ):
+                if not auth_snapshot.check_level(user_id, group_id, plugin.admin_level):
                     try:
                         if self._flmt.check(user_id):
                             self._flmt.start_cd(user_id)
@@ -432,7 +505,7 @@ class AuthChecker:
                         session=session,
                     )
                     raise IgnoredException("管理员权限不足...")
-            elif not await LevelUser.check_level(user_id, None, plugin.admin_level):
+            elif not auth_snapshot.check_level(user_id, None, plugin.admin_level):
                 try:
                     await MessageUtils.build_message(
                         f"你的权限不足喔，该功能需要的权限等级: {plugin.admin_level}"
@@ -449,19 +522,19 @@ class AuthChecker:
                 raise IgnoredException("权限不足")
 
     async def auth_group(
-        self, plugin: PluginInfo, session: EventSession, message: UniMsg
+        self, plugin: PluginSnapshot, session: EventSession, message: UniMsg
     ):
         """群黑名单检测 群总开关检测
 
         参数:
-            plugin: PluginInfo
+            plugin: PluginSnapshot
             session: EventSession
             message: UniMsg
         """
         if not (group_id := session.id3 or session.id2):
             return
         text = message.extract_plain_text()
-        group = await GroupConsole.get_group(group_id)
+        group = auth_snapshot.get_group(group_id)
         if not group:
             """群不存在"""
             raise IgnoredException("群不存在")
@@ -1,9 +1,10 @@
 from nonebot.adapters import Bot, Event
 from nonebot.matcher import Matcher
-from nonebot.message import run_postprocessor, run_preprocessor
+from nonebot.message import event_postprocessor, run_postprocessor, run_preprocessor
 from nonebot_plugin_alconna import UniMsg
 from nonebot_plugin_session import EventSession
 
+from ...cache import event_memo
 from ._auth_checker import LimitManage, checker
 
 
@@ -39,3 +40,11 @@ async def _(
     if user_id and matcher.plugin:
         module = matcher.plugin.name
         LimitManage.unblock(module, user_id, group_id, channel_id)
+    LimitManage.release(event, matcher)
+
+
+# 清除事件内权限检测缓存，释放被其他 run_preprocessor 取消的matcher持有的并发名额
+@event_postprocessor
+async def _(event: Event):
+    event_memo.discard(event)
+    LimitManage.release(event)
@@ -4,38 +4,43 @@ from nonebot.matcher import Matcher
 from nonebot.message import run_preprocessor
 from nonebot.typing import T_State
 from nonebot_plugin_alconna import At
+from nonebot_plugin_apscheduler import scheduler
 from nonebot_plugin_session import EventSession
 from zhenxun_utils.enum import PluginType
 from zhenxun_utils.log import logger
 from zhenxun_utils.message import MessageUtils
 
-from ....models.ban_console import BanConsole
-from ....models.group_console import GroupConsole
+from ...cache import auth_snapshot, ban_registry, event_memo
 from ...config import ZxpmConfig
 from ...extra.limit import FreqLimiter
+from ...metrics import metrics
 
 _flmt = FreqLimiter(300)
 
 
-# 检查是否被ban
-@run_preprocessor
-async def _(
-    matcher: Matcher, bot: Bot, event: Event, state: T_State, session: EventSession
-):
-    if plugin := matcher.plugin:
-        if metadata := plugin.metadata:
-            extra = metadata.extra
-            if extra.get("plugin_type") in [PluginType.HIDDEN, PluginType.DEPENDANT]:
-                return
+async def _check_ban(bot: Bot, session: EventSession):
+    """检测群组/用户是否被ban，结果只与事件相关
+
+    参数:
+        bot: Bot
+        session: EventSession
+
+    异常:
+        IgnoredException: 群组或用户处于黑名单中
+    """
     user_id = session.id1
     group_id = session.id3 or session.id2
+    if not ban_registry.loaded:
+        await ban_registry.load()
     if group_id:
         if user_id in bot.config.superusers:
             return
-        if await BanConsole.is_ban(None, group_id):
+        if not auth_snapshot.loaded:
+            await auth_snapshot.load()
+        if ban_registry.is_ban(None, group_id):
             logger.debug("群组处于黑名单中...", "ban_hook")
             raise IgnoredException("群组处于黑名单中...")
-        if g := await GroupConsole.get_group(group_id):
+        if g := auth_snapshot.get_group(group_id):
             if g.level < 0:
                 logger.debug("群黑名单, 群权限-1...", "ban_hook")
                 raise IgnoredException("群黑名单, 群权限-1..")
@@ -43,8 +48,7 @@ async def _(
         ban_result = ZxpmConfig.zxpm_ban_reply
         if user_id in bot.config.superusers:
             return
-        if await BanConsole.is_ban(user_id, group_id):
-            time = await BanConsole.check_ban_time(user_id, group_id)
+        if time := ban_registry.check_ban_time(user_id, group_id):
             if time == -1:
                 time_str = "∞"
             else:
@@ -74,3 +78,31 @@ async def _(
                 ).send()
             logger.debug("用户处于黑名单中...", "ban_hook")
             raise IgnoredException("用户处于黑名单中...")
+
+
+# 检查是否被ban
+@run_preprocessor
+async def _(
+    matcher: Matcher, bot: Bot, event: Event, state: T_State, session: EventSession
+):
+    if plugin := matcher.plugin:
+        if metadata := plugin.metadata:
+            extra = metadata.extra
+            if extra.get("plugin_type") in [PluginType.HIDDEN, PluginType.DEPENDANT]:
+                return
+    with metrics.timer("ban"):
+        await event_memo.run(event, ("ban",), lambda: _check_ban(bot, session))
+
+
+@scheduler.scheduled_job(
+    "interval",
+    minutes=1,
+)
+async def _():
+    if not ban_registry.loaded:
+        return
+    try:
+        if count := await ban_registry.sweep():
+            logger.debug(f"清理过期封禁数据 {count} 条", "定时任务")
+    except Exception as e:
+        logger.error("清理过期封禁数据", "定时任务", e=e)
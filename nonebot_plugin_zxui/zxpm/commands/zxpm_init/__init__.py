@@ -1,14 +1,22 @@
+import asyncio
+
 import nonebot
 from nonebot import get_loaded_plugins
 from nonebot.drivers import Driver
 from nonebot.plugin import Plugin, PluginMetadata
+from nonebot_plugin_apscheduler import scheduler
 from ruamel.yaml import YAML
 from zhenxun_utils.enum import PluginType
 from zhenxun_utils.log import logger
 
+from ....models.bot_console import BotConsole
+from ....models.group_console import GroupConsole
+from ....models.plugin_block import PluginBlock
 from ....models.plugin_info import PluginInfo
 from ....models.plugin_limit import PluginLimit
+from ...cache import auth_snapshot, ban_registry, limit_table
 from ...extra import PluginExtraData, PluginSetting
+from ...extra.limit import CountLimitBackend
 from .manager import manager
 
 _yaml = YAML(pure=True)
@@ -77,6 +85,7 @@ async def _handle_setting(
                 result=limit.result,
                 cd=getattr(limit, "cd", None),
                 max_count=getattr(limit, "max_count", None),
+                count_backend=getattr(limit, "backend", CountLimitBackend.MEMORY),
             )
             for limit in extra_data.limits
         )
@@ -125,3 +134,40 @@ async def _():
                 manager.add(limit.module_path, limit)
     manager.save_file()
     await manager.load_to_db()
+    limit_table.set_extra(manager.get_extra_blocks())
+    await limit_table.load()
+    if not await PluginBlock.exists():
+        """旧版禁用数据迁移至关系表"""
+        await GroupConsole.build_block()
+        await BotConsole.build_block()
+    await asyncio.gather(auth_snapshot.load(), ban_registry.load())
+
+
+@scheduler.scheduled_job(
+    "interval",
+    minutes=1,
+)
+async def _():
+    if not manager.is_file_changed():
+        return
+    try:
+        manager.init()
+        await manager.load_to_db()
+        limit_table.set_extra(manager.get_extra_blocks())
+        await limit_table.load()
+        logger.info("插件限制配置文件已修改，重新加载插件限制")
+    except Exception as e:
+        logger.error("重新加载插件限制配置文件", "定时任务", e=e)
+
+
+@scheduler.scheduled_job(
+    "interval",
+    seconds=30,
+)
+async def _():
+    await limit_table.flush()
+
+
+@driver.on_shutdown
+async def _():
+    await limit_table.flush()
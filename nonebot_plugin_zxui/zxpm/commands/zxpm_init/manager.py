@@ -1,4 +1,6 @@
 from copy import deepcopy
+from pathlib import Path
+from typing import TypeVar
 
 from ruamel.yaml import YAML
 from zhenxun_utils.enum import BlockType, LimitCheckType, PluginLimitType
@@ -7,7 +9,16 @@ from zhenxun_utils.log import logger
 from ....models.plugin_info import PluginInfo
 from ....models.plugin_limit import PluginLimit
 from ...config import zxpm_data_path
-from ...extra.limit import BaseBlock, PluginCdBlock, PluginCountBlock
+from ...extra.limit import (
+    BaseBlock,
+    CountLimitBackend,
+    PluginCdBlock,
+    PluginConcurrencyBlock,
+    PluginCountBlock,
+    PluginRateBlock,
+)
+
+_B = TypeVar("_B", PluginRateBlock, PluginConcurrencyBlock)
 
 _yaml = YAML(pure=True)
 _yaml.indent = 2
@@ -42,10 +53,14 @@ result回复："老色批你冲的太快了，欧尼酱先生，请稍后再冲@
 """
 
 COUNT_TEST = """命令每日次数限制
-即 用户/群聊 每日可调用命令的次数 [数据内存存储，重启将会重置]
+即 用户/群聊 每日可调用命令的次数
 每日调用直到 00:00 刷新
 key：模块名称
 max_count: 每日调用上限
+backend：计数存储方式
+        'MEMORY'：内存存储，重启将会重置
+        'DATABASE'：内存计数并定时写入数据库，重启后保留
+        'SHARED'：本地文件存储，多个Bot进程共享计数
 status：此限制的开关状态
 watch_type：监听对象，以user_id或group_id作为键来限制，'USER'：用户id，'GROUP'：群id
                                      示例：'USER'：用户上限，'group'：群聊上限
@@ -54,6 +69,34 @@ result示例："你冲的太快了，先生，请稍后再冲"
 result回复："老色批你冲的太快了，欧尼酱先生，请稍后再冲@老色批"
 """
 
+RATE_TEST = """命令调用频率限制
+即 用户/群聊 在周期内可调用命令的次数，不会持久化
+key：模块名称
+algorithm：'TOKEN_BUCKET'/'SLIDING_WINDOW'
+        'TOKEN_BUCKET'：令牌桶，次数按 max_count/period 的速度恢复，最多积攒 burst 次
+        'SLIDING_WINDOW'：滑动窗口，任意 period 秒内最多调用 max_count 次
+max_count：周期内最大调用次数
+period：周期（秒）
+burst：令牌桶容量，即允许连续调用的次数，为空时等于 max_count
+status：此限制的开关状态
+watch_type：监听对象，以user_id或group_id作为键来限制，'USER'：用户id，'GROUP'：群id
+result 为 "" 或 None 时则不回复
+示例：每分钟5次，最多连续3次
+    algorithm: TOKEN_BUCKET
+    max_count: 5
+    period: 60
+    burst: 3
+"""
+
+CONCURRENCY_TEST = """命令并发限制
+即 此功能同时正在执行的最大数量，所有用户和群聊共享，用于保护耗时较长的功能
+key：模块名称
+max_in_flight：同时执行的最大数量
+timeout：名额持有超时秒数，超时后回收名额，为空时不回收，应大于功能的最长执行时间
+status：此限制的开关状态
+result 为 "" 或 None 时则不回复
+"""
+
 
 class Manager:
     """
@@ -66,9 +109,15 @@ class Manager:
         self.cd_file = BASE_PATH / "plugins2cd.yaml"
         self.block_file = BASE_PATH / "plugins2block.yaml"
         self.count_file = BASE_PATH / "plugins2count.yaml"
+        self.rate_file = BASE_PATH / "plugins2rate.yaml"
+        self.concurrency_file = BASE_PATH / "plugins2concurrency.yaml"
         self.cd_data = {}
         self.block_data = {}
         self.count_data = {}
+        self.rate_data = {}
+        self.concurrency_data = {}
+        self.file_mtime: dict[str, float] = {}
+        """配置文件最后修改时间"""
 
     def add(
         self,
@@ -103,6 +152,7 @@ class Manager:
                     watch_type=data.watch_type,
                     result=data.result,
                     max_count=data.max_count,
+                    backend=data.count_backend,
                 )
         if isinstance(data, PluginCdBlock):
             self.cd_data[module] = data
@@ -127,18 +177,57 @@ class Manager:
             self.save_block_file()
         if not self.count_file.exists():
             self.save_count_file()
+        if not self.rate_file.exists():
+            self.save_rate_file()
+        if not self.concurrency_file.exists():
+            self.save_concurrency_file()
         self.__load_file()
 
     def __load_file(self):
+        self.__record_mtime()
         self.__load_block_file()
         self.__load_cd_file()
         self.__load_count_file()
+        self.rate_data = self.__load_extra_file(
+            self.rate_file, "PluginRateLimit", PluginRateBlock
+        )
+        self.concurrency_data = self.__load_extra_file(
+            self.concurrency_file, "PluginConcurrencyLimit", PluginConcurrencyBlock
+        )
+
+    def __get_mtime(self) -> dict[str, float]:
+        """获取配置文件修改时间"""
+        return {
+            file.name: file.stat().st_mtime
+            for file in [
+                self.cd_file,
+                self.block_file,
+                self.count_file,
+                self.rate_file,
+                self.concurrency_file,
+            ]
+            if file.exists()
+        }
+
+    def __record_mtime(self):
+        self.file_mtime = self.__get_mtime()
+
+    def is_file_changed(self) -> bool:
+        """配置文件是否在加载后被修改
+
+        返回:
+            bool: 是否被修改
+        """
+        return self.__get_mtime() != self.file_mtime
 
     def save_file(self):
         """保存文件"""
         self.save_cd_file()
         self.save_block_file()
         self.save_count_file()
+        self.save_rate_file()
+        self.save_concurrency_file()
+        self.__record_mtime()
 
     def save_cd_file(self):
         """保存文件"""
@@ -156,6 +245,29 @@ class Manager:
             "PluginCountLimit", COUNT_TEST, self.count_data
         )
 
+    def save_rate_file(self):
+        """保存文件"""
+        self._extracted_from_save_file_3("PluginRateLimit", RATE_TEST, self.rate_data)
+
+    def save_concurrency_file(self):
+        """保存文件"""
+        self._extracted_from_save_file_3(
+            "PluginConcurrencyLimit", CONCURRENCY_TEST, self.concurrency_data
+        )
+
+    def get_extra_blocks(self) -> dict[str, list[BaseBlock]]:
+        """获取只在配置文件中生效的限制（频率/并发）
+
+        返回:
+            dict[str, list[BaseBlock]]: 模块名与限制配置
+        """
+        module2block: dict[str, list[BaseBlock]] = {}
+        for data in [self.rate_data, self.concurrency_data]:
+            for module, block in data.items():
+                if module != "test":
+                    module2block.setdefault(module, []).append(block)
+        return module2block
+
     def _extracted_from_save_file_3(self, type_: str, after: str, data: dict):
         """保存文件
 
@@ -177,7 +289,15 @@ class Manager:
                 temp_data["test"]["cd"] = 5
             elif type_ == "PluginCountLimit":
                 temp_data["test"]["max_count"] = 5
+                temp_data["test"]["backend"] = "MEMORY"
                 del temp_data["test"]["check_type"]
+            elif type_ == "PluginRateLimit":
+                temp_data["test"]["algorithm"] = "TOKEN_BUCKET"
+                temp_data["test"]["max_count"] = 5
+                temp_data["test"]["period"] = 60
+                temp_data["test"]["burst"] = 3
+            elif type_ == "PluginConcurrencyLimit":
+                temp_data["test"]["max_in_flight"] = 1
         else:
             for v in temp_data:
                 temp_data[v] = temp_data[v].dict()
@@ -185,6 +305,10 @@ class Manager:
                     temp_data[v]["check_type"] = str(check_type)
                 if watch_type := temp_data[v].get("watch_type"):
                     temp_data[v]["watch_type"] = str(watch_type)
+                if backend := temp_data[v].get("backend"):
+                    temp_data[v]["backend"] = str(backend)
+                if algorithm := temp_data[v].get("algorithm"):
+                    temp_data[v]["algorithm"] = str(algorithm)
                 if type_ == "PluginCountLimit":
                     del temp_data[v]["check_type"]
         file = self.block_file
@@ -192,6 +316,10 @@ class Manager:
             file = self.cd_file
         elif type_ == "PluginCountLimit":
             file = self.count_file
+        elif type_ == "PluginRateLimit":
+            file = self.rate_file
+        elif type_ == "PluginConcurrencyLimit":
+            file = self.concurrency_file
         with open(file, "w", encoding="utf8") as f:
             _yaml.dump({type_: temp_data}, f)
         with open(file, encoding="utf8") as rf:
@@ -227,6 +355,28 @@ class Manager:
                     for k, v in temp["PluginCountLimit"].items():
                         self.count_data[k] = PluginCountBlock.parse_obj(v)
 
+    def __load_extra_file(
+        self, file: Path, type_: str, model: type[_B]
+    ) -> dict[str, _B]:
+        """读取扩展限制配置文件
+
+        参数:
+            file: 文件路径
+            type_: 类型参数
+            model: 限制配置类型
+
+        返回:
+            dict[str, _B]: 模块名与限制配置
+        """
+        data: dict[str, _B] = {}
+        if file.exists():
+            with open(file, encoding="utf8") as f:
+                temp = _yaml.load(f)
+                if temp and type_ in temp:
+                    for k, v in temp[type_].items():
+                        data[k] = model.parse_obj(v)
+        return data
+
     def __replace_data(
         self,
         db_data: PluginLimit | None,
@@ -275,6 +425,7 @@ class Manager:
                     plugin=module2plugin[k],
                     cd=getattr(limit, "cd", None),
                     max_count=getattr(limit, "max_count", None),
+                    count_backend=getattr(limit, "backend", CountLimitBackend.MEMORY),
                     status=limit.status,
                     check_type=limit.check_type,
                     watch_type=limit.watch_type,
@@ -287,6 +438,7 @@ class Manager:
             db_data.cd = limit.cd  # type: ignore
         if limit_type == PluginLimitType.COUNT:
             db_data.max_count = limit.max_count  # type: ignore
+            db_data.count_backend = limit.backend  # type: ignore
         return db_data, False
 
     def __get_file_data(self, limit_type: PluginLimitType) -> dict:
@@ -398,6 +550,7 @@ class Manager:
                         "result",
                         "cd",
                         "max_count",
+                        "count_backend",
                     ]
                 )
             # TODO: tortoise.exceptions.OperationalError:syntax error at or near "GROUP"
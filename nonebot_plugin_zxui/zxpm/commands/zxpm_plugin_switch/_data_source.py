@@ -3,6 +3,7 @@ from zhenxun_utils.enum import BlockType, PluginType
 
 from ....models.group_console import GroupConsole
 from ....models.plugin_info import PluginInfo
+from ...cache import auth_snapshot
 
 
 class GroupInfoNotFound(Exception):
@@ -130,6 +131,7 @@ class PluginManage:
             await PluginInfo.filter(plugin_type=PluginType.NORMAL).update(
                 default_status=status
             )
+            await auth_snapshot.refresh_plugins()
             return f'成功将所有功能进群默认状态修改为: {"开启" if status else "关闭"}'
         if group_id:
             if group := await GroupConsole.get_or_none(
@@ -152,8 +154,39 @@ class PluginManage:
         await PluginInfo.filter(plugin_type=PluginType.NORMAL).update(
             status=status, block_type=None if status else BlockType.ALL
         )
+        await auth_snapshot.refresh_plugins()
         return f'成功将所有功能全局状态修改为: {"开启" if status else "关闭"}'
 
+    @classmethod
+    async def set_all_group_plugin_status(
+        cls, plugin_name: str, status: bool, is_superuser: bool = False
+    ) -> str:
+        """修改所有群组的插件状态
+
+        参数:
+            plugin_name: 插件名称
+            status: 插件状态
+            is_superuser: 是否为超级用户
+
+        返回:
+            str: 返回信息
+        """
+        if plugin_name.isdigit():
+            plugin = await PluginInfo.get_or_none(id=int(plugin_name))
+        else:
+            plugin = await PluginInfo.get_or_none(
+                name=plugin_name, load_status=True, plugin_type__not=PluginType.PARENT
+            )
+        if not plugin:
+            return "没有找到这个功能喔..."
+        if status:
+            await GroupConsole.set_unblock_plugin_all(plugin.module, is_superuser)
+        else:
+            await GroupConsole.set_block_plugin_all(plugin.module, is_superuser)
+        await auth_snapshot.refresh_groups()
+        status_str = "开启" if status else "关闭"
+        return f"成功将所有群组 {plugin.name} 功能状态修改为: {status_str}"
+
     @classmethod
     async def is_wake(cls, group_id: str) -> bool:
         """是否醒来
@@ -180,6 +213,7 @@ class PluginManage:
         await GroupConsole.filter(group_id=group_id, channel_id__isnull=True).update(
             status=False
         )
+        await auth_snapshot.refresh_group(group_id)
 
     @classmethod
     async def wake(cls, group_id: str):
@@ -191,6 +225,7 @@ class PluginManage:
         await GroupConsole.filter(group_id=group_id, channel_id__isnull=True).update(
             status=True
         )
+        await auth_snapshot.refresh_group(group_id)
 
     @classmethod
     async def block(cls, module: str):
@@ -200,6 +235,7 @@ class PluginManage:
             module: 模块名
         """
         await PluginInfo.filter(module=module).update(status=False)
+        await auth_snapshot.refresh_plugins()
 
     @classmethod
     async def unblock(cls, module: str):
@@ -209,6 +245,7 @@ class PluginManage:
             module: 模块名
         """
         await PluginInfo.filter(module=module).update(status=True)
+        await auth_snapshot.refresh_plugins()
 
     @classmethod
     async def block_group_plugin(cls, plugin_name: str, group_id: str) -> str:
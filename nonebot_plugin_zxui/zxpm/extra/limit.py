@@ -1,12 +1,41 @@
-from collections import defaultdict
-from datetime import datetime
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import date, datetime, timedelta
+import heapq
+import itertools
 import time
 from typing import Any
 
 from pydantic import BaseModel
 import pytz
+from strenum import StrEnum
 from zhenxun_utils.enum import BlockType, LimitWatchType, PluginLimitType
 
+TZ = pytz.timezone("Asia/Shanghai")
+"""每日次数限制使用的时区"""
+
+
+class CountLimitBackend(StrEnum):
+    """次数限制存储方式"""
+
+    MEMORY = "MEMORY"
+    """内存，重启后重置"""
+    DATABASE = "DATABASE"
+    """内存计数，定时批量写入数据库，重启后保留"""
+    SHARED = "SHARED"
+    """本地共享存储，多个Bot进程共享计数"""
+
+
+class ExtraLimitType(StrEnum):
+    """PluginLimitType 之外的限制类型，只通过配置文件配置"""
+
+    TOKEN_BUCKET = "TOKEN_BUCKET"
+    """令牌桶，允许突发调用"""
+    SLIDING_WINDOW = "SLIDING_WINDOW"
+    """滑动窗口，周期内最大调用次数"""
+    CONCURRENCY = "CONCURRENCY"
+    """插件同时执行的最大数量"""
+
 
 class BaseBlock(BaseModel):
     """
@@ -43,37 +72,267 @@ class PluginCountBlock(BaseBlock):
 
     max_count: int
     """最大调用次数"""
+    backend: CountLimitBackend = CountLimitBackend.MEMORY
+    """计数存储方式"""
     _type: PluginLimitType = PluginLimitType.COUNT
     """类型"""
 
 
+class PluginRateBlock(BaseBlock):
+    """
+    插件频率限制（令牌桶/滑动窗口）
+    """
+
+    algorithm: ExtraLimitType = ExtraLimitType.TOKEN_BUCKET
+    """限制算法，TOKEN_BUCKET 或 SLIDING_WINDOW"""
+    max_count: int = 5
+    """周期内最大调用次数"""
+    period: int = 60
+    """周期（秒）"""
+    burst: int | None = None
+    """令牌桶容量，即允许的突发调用次数，为空时等于 max_count"""
+    _type: ExtraLimitType = ExtraLimitType.TOKEN_BUCKET
+    """类型"""
+
+
+class PluginConcurrencyBlock(BaseBlock):
+    """
+    插件并发限制，所有用户/群组共享
+    """
+
+    max_in_flight: int = 1
+    """同时执行的最大数量"""
+    timeout: int | None = None
+    """名额持有超时秒数，超时后回收，为空时不回收，应大于功能的最长执行时间"""
+    _type: ExtraLimitType = ExtraLimitType.CONCURRENCY
+    """类型"""
+
+
+class TTLStore:
+    """
+    带过期时间的限制器存储
+
+    读取不会写入数据，过期数据通过最小堆在写入时惰性清理，
+    同一key过期时间不变时不会重复入堆
+    """
+
+    def __init__(self):
+        self._data: dict[Any, tuple[Any, float]] = {}
+        self._heap: list[tuple[float, int, Any]] = []
+        self._seq = itertools.count()
+        self.evicted = 0
+        """已清理的过期数量"""
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """获取未过期的值
+
+        参数:
+            key: key
+            default: 不存在或已过期时的默认值
+
+        返回:
+            Any: 值
+        """
+        item = self._data.get(key)
+        if item is None or item[1] <= time.time():
+            return default
+        return item[0]
+
+    def set(self, key: Any, value: Any, expire_time: float):
+        """写入值
+
+        参数:
+            key: key
+            value: 值
+            expire_time: 过期时间戳
+        """
+        now = time.time()
+        if self._heap and self._heap[0][0] <= now:
+            self.evict(now)
+        item = self._data.get(key)
+        self._data[key] = (value, expire_time)
+        if item is None or item[1] != expire_time:
+            heapq.heappush(self._heap, (expire_time, next(self._seq), key))
+
+    def pop(self, key: Any):
+        """删除值，堆中的记录在过期时一并丢弃
+
+        参数:
+            key: key
+        """
+        self._data.pop(key, None)
+
+    def clear(self):
+        """清空数据"""
+        self._data.clear()
+        self._heap.clear()
+
+    def evict(self, now: float | None = None) -> int:
+        """清理已过期的数据
+
+        参数:
+            now: 当前时间戳
+
+        返回:
+            int: 清理数量
+        """
+        now = now or time.time()
+        count = 0
+        while self._heap and self._heap[0][0] <= now:
+            expire_time, _, key = heapq.heappop(self._heap)
+            item = self._data.get(key)
+            if item is not None and item[1] == expire_time:
+                del self._data[key]
+                count += 1
+        self.evicted += count
+        return count
+
+    def stats(self) -> dict[str, int]:
+        """存储统计
+
+        返回:
+            dict[str, int]: 当前数量，待清理堆大小，已清理数量
+        """
+        return {
+            "size": len(self._data),
+            "heap_size": len(self._heap),
+            "evicted": self.evicted,
+        }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def day_end(day: date) -> float:
+    """指定日期结束（次日 00:00）的时间戳
+
+    参数:
+        day: 日期
+
+    返回:
+        float: 时间戳
+    """
+    return TZ.localize(
+        datetime.combine(day + timedelta(days=1), datetime.min.time())
+    ).timestamp()
+
+
+class BaseCountStore(ABC):
+    """
+    每日次数计数存储
+    """
+
+    backend: CountLimitBackend = CountLimitBackend.MEMORY
+    """存储方式"""
+
+    @abstractmethod
+    async def get(self, key: Any, day: date) -> int:
+        """获取计数"""
+
+    @abstractmethod
+    async def acquire(self, key: Any, day: date, max_num: int, num: int = 1) -> bool:
+        """计数增加后不超过 max_num 时增加计数，检测与增加为原子操作
+
+        参数:
+            key: key
+            day: 日期
+            max_num: 最大次数
+            num: 增加次数
+
+        返回:
+            bool: 是否增加成功
+        """
+
+    @abstractmethod
+    async def increase(self, key: Any, day: date, num: int = 1):
+        """增加计数"""
+
+    @abstractmethod
+    async def reset(self, key: Any, day: date):
+        """清空计数"""
+
+    async def load(self):
+        """读取已持久化的计数"""
+
+    async def flush(self):
+        """写入未持久化的计数"""
+
+    def stats(self) -> dict[str, int]:
+        return {}
+
+
+class MemoryCountStore(BaseCountStore):
+    """
+    内存计数，次日 00:00 过期
+    """
+
+    def __init__(self):
+        self.data = TTLStore()
+
+    async def get(self, key: Any, day: date) -> int:
+        return self.data.get((day, key), 0)
+
+    async def acquire(self, key: Any, day: date, max_num: int, num: int = 1) -> bool:
+        count = self.data.get((day, key), 0) + num
+        if count > max_num:
+            return False
+        self.data.set((day, key), count, day_end(day))
+        return True
+
+    async def increase(self, key: Any, day: date, num: int = 1):
+        self.data.set((day, key), self.data.get((day, key), 0) + num, day_end(day))
+
+    async def reset(self, key: Any, day: date):
+        self.data.pop((day, key))
+
+    def stats(self) -> dict[str, int]:
+        return self.data.stats()
+
+
 class CountLimiter:
     """
     每日调用命令次数限制
     """
 
-    tz = pytz.timezone("Asia/Shanghai")
+    tz = TZ
 
-    def __init__(self, max_num):
-        self.today = -1
-        self.count = defaultdict(int)
+    def __init__(self, max_num, store: BaseCountStore | None = None):
+        self.count = store or MemoryCountStore()
         self.max = max_num
 
-    def check(self, key) -> bool:
-        day = datetime.now(self.tz).day
-        if day != self.today:
-            self.today = day
-            self.count.clear()
-        return self.count[key] < self.max
+    @property
+    def backend(self) -> CountLimitBackend:
+        return self.count.backend
+
+    def today(self) -> date:
+        return datetime.now(self.tz).date()
+
+    async def check(self, key) -> bool:
+        return await self.count.get(key, self.today()) < self.max
+
+    async def acquire(self, key, num=1) -> bool:
+        """未达到次数限制时增加次数
+
+        参数:
+            key: key
+            num: 增加次数
 
-    def get_num(self, key):
-        return self.count[key]
+        返回:
+            bool: 是否未达到限制
+        """
+        return await self.count.acquire(key, self.today(), self.max, num)
 
-    def increase(self, key, num=1):
-        self.count[key] += num
+    async def get_num(self, key):
+        return await self.count.get(key, self.today())
 
-    def reset(self, key):
-        self.count[key] = 0
+    async def increase(self, key, num=1):
+        await self.count.increase(key, self.today(), num)
+
+    async def reset(self, key):
+        await self.count.reset(key, self.today())
+
+    def stats(self) -> dict[str, int]:
+        return self.count.stats()
 
 
 class UserBlockLimiter:
@@ -81,21 +340,23 @@ class UserBlockLimiter:
     检测用户是否正在调用命令
     """
 
+    timeout = 30
+    """阻塞超时时间，超时后自动解除"""
+
     def __init__(self):
-        self.flag_data = defaultdict(bool)
-        self.time = time.time()
+        self.flag_data = TTLStore()
 
     def set_true(self, key: Any):
-        self.time = time.time()
-        self.flag_data[key] = True
+        self.flag_data.set(key, True, time.time() + self.timeout)
 
     def set_false(self, key: Any):
-        self.flag_data[key] = False
+        self.flag_data.pop(key)
 
     def check(self, key: Any) -> bool:
-        if time.time() - self.time > 30:
-            self.set_false(key)
-        return not self.flag_data[key]
+        return not self.flag_data.get(key, False)
+
+    def stats(self) -> dict[str, int]:
+        return self.flag_data.stats()
 
 
 class FreqLimiter:
@@ -104,16 +365,154 @@ class FreqLimiter:
     """
 
     def __init__(self, default_cd_seconds: int):
-        self.next_time = defaultdict(float)
+        self.next_time = TTLStore()
         self.default_cd = default_cd_seconds
 
     def check(self, key: Any) -> bool:
-        return time.time() >= self.next_time[key]
+        return time.time() >= self.next_time.get(key, 0.0)
 
     def start_cd(self, key: Any, cd_time: int = 0):
-        self.next_time[key] = time.time() + (
-            cd_time if cd_time > 0 else self.default_cd
-        )
+        next_time = time.time() + (cd_time if cd_time > 0 else self.default_cd)
+        self.next_time.set(key, next_time, next_time)
 
     def left_time(self, key: Any) -> float:
-        return self.next_time[key] - time.time()
+        return self.next_time.get(key, 0.0) - time.time()
+
+    def stats(self) -> dict[str, int]:
+        return self.next_time.stats()
+
+
+class TokenBucketLimiter:
+    """
+    令牌桶，令牌按 max_count/period 的速度恢复，最多存放 burst 个
+    """
+
+    def __init__(self, max_count: int, period: int, burst: int | None = None):
+        self.tokens = TTLStore()
+        self.rate = max_count / period if period > 0 else float(max_count)
+        self.burst = burst or max_count
+
+    def _get_tokens(self, key: Any, now: float) -> float:
+        if item := self.tokens.get(key):
+            tokens, last_time = item
+            return min(self.burst, tokens + (now - last_time) * self.rate)
+        return float(self.burst)
+
+    def check(self, key: Any) -> bool:
+        return self._get_tokens(key, time.time()) >= 1
+
+    def consume(self, key: Any):
+        now = time.time()
+        tokens = self._get_tokens(key, now) - 1
+        # 令牌补满后与不存在等价，到时即可清理
+        full_time = now + (self.burst - tokens) / self.rate if self.rate else now
+        self.tokens.set(key, (tokens, now), full_time)
+
+    def stats(self) -> dict[str, int]:
+        return self.tokens.stats()
+
+
+class SlidingWindowLimiter:
+    """
+    滑动窗口，记录周期内每次调用的时间
+    """
+
+    def __init__(self, max_count: int, period: int):
+        self.calls = TTLStore()
+        self.max = max_count
+        self.period = period
+
+    def check(self, key: Any) -> bool:
+        calls: deque[float] | None = self.calls.get(key)
+        if not calls:
+            return True
+        start = time.time() - self.period
+        return sum(t > start for t in calls) < self.max
+
+    def add(self, key: Any):
+        now = time.time()
+        calls: deque[float] = self.calls.get(key) or deque(maxlen=self.max or 1)
+        while calls and calls[0] <= now - self.period:
+            calls.popleft()
+        calls.append(now)
+        self.calls.set(key, calls, now + self.period)
+
+    def stats(self) -> dict[str, int]:
+        return self.calls.stats()
+
+
+class ConcurrencyLimiter:
+    """
+    插件并发限制，所有调用共享同一计数
+
+    acquire 返回名额凭证，插件执行结束时按凭证释放，重复释放无效，
+    设置 timeout 时持有超时的名额在检测时回收，用于兜底未能释放的名额
+    """
+
+    def __init__(self, max_in_flight: int, timeout: int | None = None):
+        self.max = max_in_flight
+        self.timeout = timeout
+        """名额持有超时秒数，为空时不回收"""
+        self._slots: dict[int, float] = {}
+        """凭证 -> 获取名额的时间，按获取顺序"""
+        self._token = itertools.count(1)
+        self.expired = 0
+        """超时回收的名额数量"""
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._slots)
+
+    def evict(self, now: float | None = None) -> int:
+        """回收超时的名额
+
+        参数:
+            now: 当前时间戳
+
+        返回:
+            int: 回收数量
+        """
+        if not self.timeout:
+            return 0
+        deadline = (now or time.time()) - self.timeout
+        count = 0
+        while self._slots:
+            token = next(iter(self._slots))
+            if self._slots[token] > deadline:
+                break
+            del self._slots[token]
+            count += 1
+        self.expired += count
+        return count
+
+    def check(self, key: Any) -> bool:
+        if self.in_flight >= self.max:
+            self.evict()
+        return self.in_flight < self.max
+
+    def acquire(self, key: Any) -> int:
+        """获取名额
+
+        参数:
+            key: key，并发限制共享计数，不区分key
+
+        返回:
+            int: 名额凭证
+        """
+        token = next(self._token)
+        self._slots[token] = time.time()
+        return token
+
+    def release(self, token: int) -> bool:
+        """释放名额
+
+        参数:
+            token: 名额凭证
+
+        返回:
+            bool: 名额是否仍被持有，已释放或已超时回收时为False
+        """
+        return self._slots.pop(token, None) is not None
+
+    def stats(self) -> dict[str, int]:
+        return {"in_flight": self.in_flight, "expired": self.expired}
@@ -0,0 +1,240 @@
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from nonebot.exception import IgnoredException
+from pydantic import BaseModel
+
+SUB_BUCKET_BITS = 3
+"""每个2的幂区间内的子桶位数，相对误差不超过 1/8"""
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+BUCKET_SIZE = 24 * SUB_BUCKET_COUNT
+"""桶数量，最大可记录约 67 秒，超出的记入最后一个桶"""
+MAX_REASON_SIZE = 32
+"""每个阶段保留的最多阻断原因数量，超出时记入 OTHER_REASON"""
+OTHER_REASON = "其他"
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def _bucket_index(value: int) -> int:
+    if value < SUB_BUCKET_COUNT << 1:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    index = (shift + 1) * SUB_BUCKET_COUNT + (value >> shift) - SUB_BUCKET_COUNT
+    return min(index, BUCKET_SIZE - 1)
+
+
+def _bucket_upper(index: int) -> int:
+    if index < SUB_BUCKET_COUNT << 1:
+        return index
+    shift = index // SUB_BUCKET_COUNT - 1
+    sub = index % SUB_BUCKET_COUNT + SUB_BUCKET_COUNT
+    return ((sub + 1) << shift) - 1
+
+
+class Histogram:
+    """
+    对数-线性分桶的耗时直方图（单位: 微秒）
+
+    与 HdrHistogram 相同，按2的幂划分区间，区间内再线性细分，
+    记录为一次下标计算与自增，内存固定，分位数误差不超过 12.5%
+    """
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_SIZE
+        self.total = 0
+        """记录次数"""
+        self.sum = 0
+        """耗时总和"""
+        self.max = 0
+        """最大耗时"""
+
+    def record(self, value: int):
+        """记录一次耗时
+
+        参数:
+            value: 耗时，单位微秒
+        """
+        self.counts[_bucket_index(value)] += 1
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, percent: float) -> int:
+        """获取分位数，返回所在桶的上界
+
+        参数:
+            percent: 百分位，如 99.9
+
+        返回:
+            int: 耗时，单位微秒
+        """
+        if not self.total:
+            return 0
+        target = max(1, round(self.total * percent / 100))
+        current = 0
+        for index, count in enumerate(self.counts):
+            current += count
+            if current >= target:
+                return min(_bucket_upper(index), self.max)
+        return self.max
+
+    def reset(self):
+        self.counts = [0] * BUCKET_SIZE
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+
+class StageStats(BaseModel):
+    """
+    单个阶段的统计数据
+    """
+
+    stage: str
+    """阶段名称"""
+    allow: int
+    """通过次数"""
+    deny: int
+    """阻断次数"""
+    error: int
+    """异常次数"""
+    deny_reason: dict[str, int]
+    """阻断原因与次数"""
+    error_reason: dict[str, int]
+    """异常类型与次数"""
+    mean: float
+    """平均耗时，单位毫秒"""
+    max: float
+    """最大耗时，单位毫秒"""
+    percentile: dict[str, float]
+    """分位数耗时，单位毫秒，如 {"p99": 0.5}"""
+
+
+class StageMetrics:
+    """
+    单个阶段的耗时与结果计数
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.histogram = Histogram()
+        self.allow = 0
+        self.deny_reason: dict[str, int] = {}
+        self.error_reason: dict[str, int] = {}
+
+    @staticmethod
+    def _incr(data: dict[str, int], reason: str):
+        if reason not in data and len(data) >= MAX_REASON_SIZE:
+            reason = OTHER_REASON
+        data[reason] = data.get(reason, 0) + 1
+
+    def record(self, value: int, deny: str | None = None, error: str | None = None):
+        """记录一次检测
+
+        参数:
+            value: 耗时，单位微秒
+            deny: 阻断原因
+            error: 异常类型
+        """
+        self.histogram.record(value)
+        if deny is not None:
+            self._incr(self.deny_reason, deny)
+        elif error is not None:
+            self._incr(self.error_reason, error)
+        else:
+            self.allow += 1
+
+    def stats(self) -> StageStats:
+        histogram = self.histogram
+        return StageStats(
+            stage=self.stage,
+            allow=self.allow,
+            deny=sum(self.deny_reason.values()),
+            error=sum(self.error_reason.values()),
+            deny_reason=dict(self.deny_reason),
+            error_reason=dict(self.error_reason),
+            mean=round(histogram.sum / histogram.total / 1000, 3)
+            if histogram.total
+            else 0,
+            max=histogram.max / 1000,
+            percentile={f"p{p}": histogram.percentile(p) / 1000 for p in PERCENTILES},
+        )
+
+    def reset(self):
+        self.histogram.reset()
+        self.allow = 0
+        self.deny_reason = {}
+        self.error_reason = {}
+
+
+class Metrics:
+    """
+    钩子耗时统计
+
+    各检测阶段以 `with metrics.timer(阶段):` 包裹，
+    IgnoredException 记为阻断，其他异常记为异常，异常会继续抛出
+    """
+
+    def __init__(self):
+        self._data: dict[str, StageMetrics] = {}
+        self.start_time = time.time()
+        """开始统计的时间"""
+
+    def get(self, stage: str) -> StageMetrics:
+        """获取阶段统计，不存在时创建
+
+        参数:
+            stage: 阶段名称
+
+        返回:
+            StageMetrics: 阶段统计
+        """
+        if not (stage_metrics := self._data.get(stage)):
+            stage_metrics = self._data[stage] = StageMetrics(stage)
+        return stage_metrics
+
+    @contextmanager
+    def timer(
+        self, stage: str, allow: tuple[type[BaseException], ...] = ()
+    ) -> Iterator[None]:
+        """记录代码块耗时与结果
+
+        参数:
+            stage: 阶段名称
+            allow: 视为通过的异常类型
+        """
+        start = time.perf_counter_ns()
+        try:
+            yield
+        except allow:
+            self.get(stage).record((time.perf_counter_ns() - start) // 1000)
+            raise
+        except IgnoredException as e:
+            self.get(stage).record(
+                (time.perf_counter_ns() - start) // 1000, deny=str(e.reason)
+            )
+            raise
+        except BaseException as e:
+            self.get(stage).record(
+                (time.perf_counter_ns() - start) // 1000, error=type(e).__name__
+            )
+            raise
+        self.get(stage).record((time.perf_counter_ns() - start) // 1000)
+
+    def stats(self) -> list[StageStats]:
+        """全部阶段统计数据
+
+        返回:
+            list[StageStats]: 统计数据
+        """
+        return [self._data[stage].stats() for stage in sorted(self._data)]
+
+    def reset(self):
+        """清空统计数据"""
+        for stage_metrics in self._data.values():
+            stage_metrics.reset()
+        self.start_time = time.time()
+
+
+metrics = Metrics()
@@ -0,0 +1,85 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+LIMIT_PATH = (
+    Path(__file__).resolve().parent.parent
+    / "nonebot_plugin_zxui"
+    / "zxpm"
+    / "extra"
+    / "limit.py"
+)
+
+
+def load_limit():
+    """直接加载 limit.py，避免导入插件时初始化 nonebot"""
+    spec = importlib.util.spec_from_file_location("zxpm_extra_limit", LIMIT_PATH)
+    assert spec
+    assert spec.loader
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+limit = load_limit()
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(limit.time, "time", clock)
+    return clock
+
+
+def test_release(clock: Clock):
+    limiter = limit.ConcurrencyLimiter(1)
+    assert limiter.check("user")
+    token = limiter.acquire("user")
+    assert not limiter.check("other")
+    assert limiter.release(token)
+    assert limiter.check("other")
+    assert limiter.stats() == {"in_flight": 0, "expired": 0}
+
+
+def test_long_running_slot_is_kept_without_timeout(clock: Clock):
+    """未设置超时时长时间执行的功能不会丢失名额"""
+    limiter = limit.ConcurrencyLimiter(1)
+    limiter.acquire("a")
+    clock.now += 3600
+    assert not limiter.check("b")
+    assert limiter.stats() == {"in_flight": 1, "expired": 0}
+
+
+def test_expired_slot_is_reclaimed(clock: Clock):
+    limiter = limit.ConcurrencyLimiter(2, timeout=60)
+    limiter.acquire("a")
+    limiter.acquire("b")
+    assert not limiter.check("c")
+    clock.now += 59
+    assert not limiter.check("c")
+    clock.now += 1
+    assert limiter.check("c")
+    assert limiter.stats() == {"in_flight": 0, "expired": 2}
+
+
+def test_late_release_does_not_free_newer_slot(clock: Clock):
+    """超时回收后迟到的释放不会释放同一key之后获取的名额"""
+    limiter = limit.ConcurrencyLimiter(2, timeout=60)
+    old = limiter.acquire("a")
+    clock.now += 60
+    limiter.evict()
+    new = limiter.acquire("a")
+    assert not limiter.release(old)
+    assert limiter.in_flight == 1
+    assert limiter.release(new)
+    assert not limiter.release(new)
+    assert limiter.in_flight == 0